@@ -119,12 +119,17 @@ import shutil
 import sys
 import html
 import re
+import heapq
+from array import array
+from functools import lru_cache
+from collections import OrderedDict, deque
 from mutagen.mp4 import MP4
 from PIL import Image
 import io
 from pathlib import Path
 from datetime import datetime, timedelta
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
 from typing import Dict, List, Optional, Tuple, Any
 import socket
 import errno
@@ -139,7 +144,7 @@ logging.getLogger('http.server').setLevel(logging.WARNING)
 # MODUL-ABHÄNGIGKEITEN & IMPORT-FALLBACKS
 # -----------------------------------------------------------------------------
 try:
-    from PIL import Image, ImageDraw, ImageFont
+    from PIL import Image, ImageDraw, ImageFont, ImageStat, ImageOps
     HAS_PIL = True
 except ImportError:
     HAS_PIL = False
@@ -237,6 +242,12 @@ INCOMPATIBLE_VIDEO_EXTENSIONS = (
 
 FLV_COMPATIBLE_CODECS = ("h264", "aac")
 
+# Codecs, die Browser ohne Transcoding abspielen (Entscheidung in choose_stream_method)
+BROWSER_H264_PIX_FMTS = ("yuv420p", "yuvj420p")   # 10-Bit-H.264 kann kein Browser
+BROWSER_MP4_AUDIO_CODECS = ("aac", "mp3")
+BROWSER_WEBM_VIDEO_CODECS = ("vp8", "vp9", "av1")
+BROWSER_WEBM_AUDIO_CODECS = ("opus", "vorbis")
+
 # MP4-Dateien die möglicherweise Probleme haben (werden geprüft)
 POTENTIALLY_PROBLEMATIC_MP4 = (".mp4",)
 
@@ -249,6 +260,10 @@ VIDEO_EXTENSIONS = {
 # Native Browser-Formate (kein Transcoding benötigt)
 NATIVE_BROWSER_EXTENSIONS = (".mp4", ".webm")
 
+# Größe der Memo-Caches für Kategorie-Funktionen (normalize_category & Co.)
+# Reine String-Funktionen, die pro Pfadteil mit wiederkehrenden Werten aufgerufen werden
+CATEGORY_CACHE_SIZE = 20000
+
 # Kategorie-Mapping: Normalisierung von Benutzereingaben zu standardisierten Kategorien
 CATEGORY_MAPPING = {
     'filme': 'Film', 'movies': 'Film', 'movie': 'Film', 'film': 'Film', 
@@ -348,6 +363,200 @@ if not FFPROBE_EXECUTABLE:
 else:
     print(f"✅ FFprobe gefunden: {FFPROBE_EXECUTABLE}")
 
+# -----------------------------------------------------------------------------
+# MEDIEN-PROBE-CACHE (FFPROBE)
+# -----------------------------------------------------------------------------
+
+# Ein ffprobe-Aufruf liefert Dauer und Codecs auf einmal; das Ergebnis gilt
+# solange Größe und mtime der Datei gleich bleiben.
+PROBE_CACHE_MAX = 2000
+PROBE_TIMEOUT = 10
+
+probe_cache = OrderedDict()  # {filepath: ((size, mtime), info)}
+probe_cache_lock = threading.Lock()
+
+def probe_media(filepath, timeout=PROBE_TIMEOUT):
+    """
+    Liest Dauer und Codecs einer Mediendatei (gecacht).
+    
+    Args:
+        filepath (str): Pfad zur Mediendatei
+        timeout (float): Max. Laufzeit von ffprobe
+    
+    Returns:
+        dict: duration, video_codec, video_index, pix_fmt, audio_codec, width,
+              height, fps, audio_languages, audio_codecs (leer wenn nicht ermittelbar)
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return {}
+    identity = (st.st_size, st.st_mtime)
+    
+    with probe_cache_lock:
+        entry = probe_cache.get(filepath)
+        if entry and entry[0] == identity:
+            probe_cache.move_to_end(filepath)
+            return entry[1]
+    
+    if not FFPROBE_EXECUTABLE:
+        return {}
+    
+    cmd = [
+        FFPROBE_EXECUTABLE,
+        '-v', 'error',
+        '-show_entries', 'format=duration:stream=codec_type,codec_name,width,height,pix_fmt,avg_frame_rate'
+                         ':stream_tags=language:stream_disposition=attached_pic',
+        '-of', 'json',
+        filepath
+    ]
+    try:
+        _, output = run_ffmpeg_capture(cmd, timeout)
+        data = json.loads(output.decode('utf-8', errors='replace') or '{}')
+    except (ValueError, OSError) as e:
+        print(f"⚠️ FFprobe fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+        return {}
+    
+    info = {'duration': 0.0, 'video_codec': None, 'video_index': 0, 'pix_fmt': None, 'audio_codec': None,
+            'width': 0, 'height': 0, 'fps': 0.0, 'audio_languages': [], 'audio_codecs': []}
+    video_streams = 0
+    try:
+        info['duration'] = float(data.get('format', {}).get('duration', 0) or 0)
+    except ValueError:
+        pass
+    for stream in data.get('streams', []):
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video' and info['video_codec'] is None:
+            video_streams += 1
+            if stream.get('disposition', {}).get('attached_pic'):
+                continue  # Eingebettetes Cover, kein Video
+            info['video_index'] = video_streams - 1  # für -map 0:v:N
+            info['video_codec'] = stream.get('codec_name')
+            info['pix_fmt'] = stream.get('pix_fmt')
+            info['width'] = stream.get('width', 0)
+            info['height'] = stream.get('height', 0)
+            num, _, den = (stream.get('avg_frame_rate') or '').partition('/')
+            try:
+                info['fps'] = float(num) / float(den or 1)
+            except (ValueError, ZeroDivisionError):
+                pass
+        elif codec_type == 'audio':
+            if info['audio_codec'] is None:
+                info['audio_codec'] = stream.get('codec_name')
+            # Pro Audio-Stream (Index wie 0:a:N), Sprache leer wenn ohne Tag
+            info['audio_codecs'].append(stream.get('codec_name'))
+            info['audio_languages'].append(stream.get('tags', {}).get('language', ''))
+    
+    with probe_cache_lock:
+        probe_cache[filepath] = (identity, info)
+        while len(probe_cache) > PROBE_CACHE_MAX:
+            probe_cache.popitem(last=False)
+    return info
+
+def get_media_duration(filepath):
+    """Dauer einer Mediendatei in Sekunden (0.0 wenn unbekannt)."""
+    return probe_media(filepath).get('duration', 0.0)
+
+# Startpunkte (Resume) werden auf den Keyframe davor gelegt: FFmpeg springt mit
+# Input-seitigem -ss ohnehin dorthin, und bei -c:v copy beginnt das Video genau
+# dort. Mit der bekannten Keyframe-Zeit stimmt die Uhr des Players exakt.
+KEYFRAME_SEARCH_WINDOW = 20  # Sekunden vor der Zielposition
+KEYFRAME_CACHE_MAX = 2000
+
+keyframe_cache = OrderedDict()  # {(filepath, position auf ms): ((size, mtime), keyframe)}
+
+def find_keyframe_before(filepath, position, timeout=PROBE_TIMEOUT):
+    """
+    Zeit des letzten Video-Keyframes bei oder vor position (gecacht).
+    
+    Args:
+        filepath (str): Mediendatei
+        position (float): Gewünschte Startposition in Sekunden
+        timeout (float): Max. Laufzeit von ffprobe
+    
+    Returns:
+        float: Keyframe-Zeit, oder position wenn nicht ermittelbar
+    """
+    info = probe_media(filepath)
+    if position <= 0 or not info.get('video_codec') or not FFPROBE_EXECUTABLE:
+        return position
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return position
+    identity = (st.st_size, st.st_mtime)
+    # Nur der Schlüssel wird gerundet: ein bereits ausgerichteter Start (aus
+    # /api/playback, erneut von /media angefragt) muss auf sich selbst fallen
+    cache_key = (filepath, round(position, 3))
+    
+    with probe_cache_lock:
+        entry = keyframe_cache.get(cache_key)
+        if entry and entry[0] == identity:
+            keyframe_cache.move_to_end(cache_key)
+            return entry[1]
+    
+    # Nur die Pakete im Fenster vor der Zielposition lesen, nicht die ganze Datei
+    cmd = [
+        FFPROBE_EXECUTABLE,
+        '-v', 'error',
+        '-select_streams', f"v:{info.get('video_index', 0)}",
+        '-read_intervals', f'{max(0.0, position - KEYFRAME_SEARCH_WINDOW):.3f}%{position + 0.5:.3f}',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        filepath
+    ]
+    try:
+        _, output = run_ffmpeg_capture(cmd, timeout)
+    except OSError as e:
+        print(f"⚠️ Keyframe-Suche fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+        return position
+    
+    keyframe = None
+    for line in output.decode('utf-8', errors='replace').splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' not in flags:
+            continue
+        try:
+            pts = float(pts)
+        except ValueError:
+            continue
+        if pts <= position + 0.001 and (keyframe is None or pts > keyframe):
+            keyframe = pts
+    if keyframe is None:
+        return position
+    
+    with probe_cache_lock:
+        keyframe_cache[cache_key] = (identity, keyframe)
+        while len(keyframe_cache) > KEYFRAME_CACHE_MAX:
+            keyframe_cache.popitem(last=False)
+    return keyframe
+
+def get_bandwidth_hint(query_params):
+    """Bandbreiten-Hinweis des Clients (bw=kbit/s, z.B. aus navigator.connection) oder None."""
+    try:
+        bandwidth = int(float(query_params.get('bw', ['0'])[0] or 0))
+    except ValueError:
+        return None
+    return bandwidth if bandwidth > 0 else None
+
+def get_stream_start(filepath, query_params):
+    """
+    Liest den start-Parameter (Sekunden) und legt ihn auf den Keyframe davor.
+    
+    Returns:
+        float: Startposition (0 = Anfang)
+    """
+    try:
+        start = float(query_params.get('start', ['0'])[0] or 0)
+    except ValueError:
+        return 0.0
+    if not start > 0:   # auch NaN
+        return 0.0
+    duration = get_media_duration(filepath)
+    if duration > 0 and start >= duration - 1:
+        return 0.0      # Hinter dem Ende: von vorne
+    return find_keyframe_before(filepath, start)
+
 # -----------------------------------------------------------------------------
 # THUMBNAIL-SYSTEM KONFIGURATION
 # -----------------------------------------------------------------------------
@@ -388,7 +597,21 @@ DEFAULT_SETTINGS = {
     'history_limit': 10,              # Maximale Anzahl History-Einträge
     'volume_level': 0.7,              # Default-Lautstärke (70%)
     'audio_language': 'ger',          # Bevorzugte Audio-Sprache für MKV
-    'autoplay_enabled': False         # Autoplay standardmäßig deaktiviert
+    'autoplay_enabled': False,        # Autoplay standardmäßig deaktiviert
+    'rebuild_existence_check': 'parallel',  # 'off', 'parallel' oder 'sequential'
+    'stat_workers_per_volume': 4,     # Parallele Existenz-Prüfungen pro Laufwerk/Share
+    'media_catalog_enabled': True,    # In-Memory-Katalog für /api/media
+    'catalog_memory_mb': 64,          # Speicher-Budget des Katalogs
+    'store_hierarchy_json': False,    # hierarchy_json nur zum Debuggen speichern
+    'thumbnail_pregen_enabled': True, # Thumbnails im Hintergrund vorgenerieren
+    'thumbnail_pregen_budget': 0.5,   # Anteil der Zeit für die Vorgenerierung (0.05-1.0)
+    'thumbnail_store_mb': 1024,       # Byte-Budget des Thumbnail-Speichers (LRU-Verdrängung)
+    'thumbnail_memory_mb': 64,        # RAM-Cache für häufig abgerufene Thumbnails
+    'thumbnail_atlas_enabled': True,  # Ein Sammelbild pro Grid-Seite statt Einzel-Thumbnails
+    'max_transcodes': 2,              # Max. gleichzeitig laufende FFmpeg-Encoder (Streams)
+    'hls_cache_mb': 2048,             # Plattenbudget für HLS-Segmente (LRU-Verdrängung)
+    'transcode_cache_mb': 20480,      # Plattenbudget für fertig transcodierte Videos
+    'zero_copy_streaming': True       # Linux: FFmpeg-Ausgabe per splice() direkt in den Socket
 }
 
 # Client-Tracking für Multi-User-Support
@@ -653,21 +876,9 @@ def add_to_history(filepath, filename, category, position=0, duration=0, complet
             # Versuche Dauer mit FFprobe zu ermitteln (für Video/Audio)
             ext = os.path.splitext(filepath)[1].lower()
             if ext in VIDEO_EXTENSIONS or ext in ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a']:
-                try:
-                    if FFPROBE_EXECUTABLE:
-                        cmd = [
-                            FFPROBE_EXECUTABLE,
-                            '-v', 'error',
-                            '-show_entries', 'format=duration',
-                            '-of', 'default=noprint_wrappers=1:nokey=1',
-                            filepath
-                        ]
-                        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-                        if result.returncode == 0 and result.stdout.strip():
-                            duration = float(result.stdout.strip())
-                            print(f"📊 Dauer ermittelt für {os.path.basename(filepath)}: {duration:.1f}s")
-                except Exception as e:
-                    print(f"⚠️ Dauer-Erkennung fehlgeschlagen: {e}")
+                duration = get_media_duration(filepath)
+                if duration > 0:
+                    print(f"📊 Dauer ermittelt für {os.path.basename(filepath)}: {duration:.1f}s")
         
         # Mindestens 1 Sekunde Dauer, um Division durch 0 zu vermeiden
         duration = max(duration, 1.0)
@@ -1134,6 +1345,7 @@ def extract_season_episode(filename):
     
     return None, None
 
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
 def normalize_category(category):
     """
     Normalisiert Kategorie-Strings zu standardisierten Bezeichnungen.
@@ -1260,10 +1472,12 @@ def detect_category_from_filepath(filepath):
     
     return 'Unbekannt'
 
+@lru_cache(maxsize=CATEGORY_CACHE_SIZE)
 def get_category_variants(normalized_category):
     """
     Generiert alle möglichen Schreibweisen einer Kategorie.
     Wird für flexible Pfad-Erkennung verwendet.
+    Ergebnis ist gecacht und wird geteilt - nicht verändern!
     
     Args:
         normalized_category (str): Normalisierte Kategorie
@@ -1358,36 +1572,24 @@ def find_markers_in_path(path_parts):
 # KATEGORIE-SPEZIFISCHE HIERARCHIE-PARSER
 # -----------------------------------------------------------------------------
 
-def parse_series_hierarchy_multipass(filepath_parts):
+def find_season_folder(path_parts):
     """
-    Ultra-einfache und robuste Hierarchie-Erkennung für Serien.
-    Extrahiert Serie, Staffel, Episode, Genre und Franchise.
+    Sucht den ersten Staffel-Teil im Pfad und leitet Serie, Genre und
+    Franchise aus den davorliegenden Ordnern ab.
     
     Args:
-        filepath_parts (list): Aufgeteilte Pfad-Komponenten (ohne Datei)
-        
+        path_parts (list): Aufgeteilte Pfad-Komponenten
+    
     Returns:
-        dict: Strukturierte Hierarchie-Informationen
+        dict|None: Staffel-Hierarchie oder None wenn kein Staffel-Teil gefunden
     """
-    hierarchy = {}
-    
-    if not filepath_parts:
-        return hierarchy
-    
-    # 1. Dateinamen analysieren
-    filename = filepath_parts[-1]
-    season_num, episode_num = extract_season_episode(filename)
-    
-    if episode_num:
-        hierarchy['episode'] = episode_num
-        hierarchy['episode_number'] = episode_num
-    
-    # 2. Durch Pfad gehen und Struktur erkennen
-    for i, part in enumerate(filepath_parts):
+    for i, part in enumerate(path_parts):
         part_lower = part.lower()
         
         # Staffel-Ordner finden
         if 'staffel' in part_lower or 'season' in part_lower:
+            hierarchy = {}
+            
             # Staffelnummer extrahieren
             num = extract_number(part)
             hierarchy['season_number'] = num if num else 1
@@ -1395,20 +1597,60 @@ def parse_series_hierarchy_multipass(filepath_parts):
             
             # Serie ist der vorherige Ordner
             if i > 0:
-                hierarchy['series'] = filepath_parts[i - 1]
+                hierarchy['series'] = path_parts[i - 1]
             
             # Genre ist der erste Ordner
             if i >= 2:
-                hierarchy['genre'] = filepath_parts[0]
+                hierarchy['genre'] = path_parts[0]
             
             # Franchise könnte dazwischen sein
             if i >= 3:
                 # Ordner zwischen Genre und Serie ist wahrscheinlich Franchise
-                potential_franchise = filepath_parts[i - 2]
+                potential_franchise = path_parts[i - 2]
                 if potential_franchise != hierarchy.get('genre'):
                     hierarchy['franchise'] = potential_franchise
             
-            break
+            return hierarchy
+    
+    return None
+
+def parse_series_hierarchy_multipass(filepath_parts, season_folder=False):
+    """
+    Ultra-einfache und robuste Hierarchie-Erkennung für Serien.
+    Extrahiert Serie, Staffel, Episode, Genre und Franchise.
+    
+    Args:
+        filepath_parts (list): Aufgeteilte Pfad-Komponenten (mit Datei)
+        season_folder (dict|None): Bereits ermitteltes find_season_folder()-Ergebnis
+            für die Ordner (aus dem Verzeichnis-Cache), False = selbst suchen
+    
+    Returns:
+        dict: Strukturierte Hierarchie-Informationen
+    """
+    hierarchy = {}
+    
+    if not filepath_parts:
+        return hierarchy
+    
+    # 1. Dateinamen analysieren
+    filename = filepath_parts[-1]
+    season_num, episode_num = extract_season_episode(filename)
+    
+    if episode_num:
+        hierarchy['episode'] = episode_num
+        hierarchy['episode_number'] = episode_num
+    
+    # 2. Durch Pfad gehen und Struktur erkennen (Ordner zuerst, dann Dateiname)
+    if season_folder is False:
+        season_folder = find_season_folder(filepath_parts[:-1])
+    
+    if season_folder is None:
+        filename_lower = filename.lower()
+        if 'staffel' in filename_lower or 'season' in filename_lower:
+            season_folder = find_season_folder(filepath_parts)
+    
+    if season_folder:
+        hierarchy.update(season_folder)
     
     # 3. Fallback wenn keine Staffel gefunden
     if 'series' not in hierarchy and len(filepath_parts) >= 2:
@@ -1425,32 +1667,19 @@ def parse_series_hierarchy_multipass(filepath_parts):
     
     return hierarchy
 
-def parse_film_hierarchy_multipass(filepath_parts):
+def find_film_franchise(folders):
     """
-    Erweiterte Film-Hierarchie-Erkennung mit Franchise- und Reihen-Erkennung.
-    Erkennt Film-Reihen auch an Nummerierung und speziellen Markern.
+    Franchise-Erkennung (Marvel, DC, etc.) über die Ordner eines Film-Pfads.
     
     Args:
-        filepath_parts (list): Aufgeteilte Pfad-Komponenten (ohne Datei)
+        folders (list): Ordner-Komponenten (ohne Datei)
         
     Returns:
-        dict: Strukturierte Hierarchie-Informationen
+        dict: franchise/series/sub_franchise (leer wenn kein Franchise erkannt)
     """
-    markers = find_markers_in_path(filepath_parts)
     hierarchy = {}
     
-    ordner = filepath_parts[:-1]
-    datei = filepath_parts[-1] if filepath_parts else ""
-    
-    hierarchy['filename'] = datei
-    
-    # Jahr-Erkennung aus Dateinamen
-    year_match = re.search(r'\((\d{4})\)', datei)
-    if year_match:
-        hierarchy['year'] = year_match.group(1)
-    
-    # Franchise-Erkennung (Marvel, DC, etc.)
-    for i, part in enumerate(ordner):
+    for i, part in enumerate(folders):
         part_lower = part.lower()
         
         # Marvel-Franchise
@@ -1458,8 +1687,8 @@ def parse_film_hierarchy_multipass(filepath_parts):
             hierarchy['franchise'] = 'Marvel'
             
             # Der nächste Ordner könnte die spezifische Reihe sein
-            if i + 1 < len(ordner):
-                next_part = ordner[i + 1]
+            if i + 1 < len(folders):
+                next_part = folders[i + 1]
                 # Prüfe ob nächster Ordner eine bekannte Reihe ist
                 known_series = ['avengers', 'iron man', 'captain america', 'thor', 
                                'guardians of the galaxy', 'black panther', 'spider-man']
@@ -1474,10 +1703,58 @@ def parse_film_hierarchy_multipass(filepath_parts):
         # DC-Franchise
         elif 'dc' in part_lower:
             hierarchy['franchise'] = 'DC'
-            if i + 1 < len(ordner):
-                hierarchy['sub_franchise'] = ordner[i + 1]
+            if i + 1 < len(folders):
+                hierarchy['sub_franchise'] = folders[i + 1]
             break
     
+    return hierarchy
+
+def get_film_folder_context(folders):
+    """
+    Dateinamen-unabhängiger Teil der Film-Analyse (pro Ordner cachebar).
+    
+    Args:
+        folders (list): Ordner-Komponenten (ohne Datei)
+    
+    Returns:
+        dict: {'franchise': dict, 'franchise_indicators': bool}
+    """
+    return {
+        'franchise': find_film_franchise(folders),
+        'franchise_indicators': bool(find_markers_in_path(folders)['franchise_indicators'])
+    }
+
+def parse_film_hierarchy_multipass(filepath_parts, folder_context=None):
+    """
+    Erweiterte Film-Hierarchie-Erkennung mit Franchise- und Reihen-Erkennung.
+    Erkennt Film-Reihen auch an Nummerierung und speziellen Markern.
+    
+    Args:
+        filepath_parts (list): Aufgeteilte Pfad-Komponenten (mit Datei)
+        folder_context (dict|None): Ergebnis von get_film_folder_context() für die
+            Ordner (aus dem Verzeichnis-Cache), None = selbst ermitteln
+    
+    Returns:
+        dict: Strukturierte Hierarchie-Informationen
+    """
+    hierarchy = {}
+    
+    ordner = filepath_parts[:-1]
+    datei = filepath_parts[-1] if filepath_parts else ""
+    
+    if folder_context is None:
+        folder_context = get_film_folder_context(ordner)
+    
+    hierarchy['filename'] = datei
+    
+    # Jahr-Erkennung aus Dateinamen
+    year_match = re.search(r'\((\d{4})\)', datei)
+    if year_match:
+        hierarchy['year'] = year_match.group(1)
+    
+    # Franchise-Erkennung (Marvel, DC, etc.)
+    hierarchy.update(folder_context['franchise'])
+    
     # Teil/Reihen-Erkennung aus Dateinamen
     part_patterns = [
         r'\b(teil|part|vol\.?|chapter|\d+)\s*(\d+)',  # "Teil 2", "Part 2"
@@ -1525,7 +1802,8 @@ def parse_film_hierarchy_multipass(filepath_parts):
         if hierarchy.get('franchise'):
             # Franchise bereits erkannt
             pass
-        elif markers['franchise_indicators'] or hierarchy.get('part'):
+        elif (folder_context['franchise_indicators'] or hierarchy.get('part')
+              or find_markers_in_path([datei])['franchise_indicators']):
             hierarchy['franchise'] = ordner[1]
             hierarchy['series'] = ordner[2]
             hierarchy['type'] = 'franchise_series'
@@ -1569,35 +1847,34 @@ def parse_film_hierarchy_multipass(filepath_parts):
     
     return hierarchy
 
-def parse_music_hierarchy(filepath_parts):
+def get_music_folder_hierarchy(folders):
     """
-    Hierarchie-Erkennung für Musik-Dateien.
-    Extrahiert Genre, Artist, Album und Disc-Informationen.
+    Dateinamen-unabhängiger Teil der Musik-Analyse (pro Album-Ordner cachebar).
     
     Args:
-        filepath_parts (list): Aufgeteilte Pfad-Komponenten
+        folders (list): Ordner-Komponenten nach der Kategorie (ohne Datei)
         
     Returns:
-        dict: Strukturierte Musik-Hierarchie
+        dict: Genre, Artist, Album und Disc aus den Ordnern
     """
     hierarchy = {}
     
     # Genre ist immer der erste Ordner nach Kategorie
-    if len(filepath_parts) >= 2:
-        hierarchy['genre'] = filepath_parts[0]
+    if len(folders) >= 1:
+        hierarchy['genre'] = folders[0]
     
     # Artist ist der zweite Ordner (wird auch als "Subgenre" verwendet im UI)
-    if len(filepath_parts) >= 3:
-        hierarchy['artist'] = filepath_parts[1]
-        hierarchy['subgenre'] = filepath_parts[1]  # Für UI-Konsistenz
+    if len(folders) >= 2:
+        hierarchy['artist'] = folders[1]
+        hierarchy['subgenre'] = folders[1]  # Für UI-Konsistenz
     
     # Album ist der dritte Ordner (wird als "Serie/Reihe" verwendet)
-    if len(filepath_parts) >= 4:
-        hierarchy['album'] = filepath_parts[2]
-        hierarchy['series'] = filepath_parts[2]  # Für UI-Konsistenz
+    if len(folders) >= 3:
+        hierarchy['album'] = folders[2]
+        hierarchy['series'] = folders[2]  # Für UI-Konsistenz
     
     # Disc-Erkennung für mehrteilige Alben
-    for i, part in enumerate(filepath_parts):
+    for i, part in enumerate(folders):
         part_lower = part.lower()
         if 'cd' in part_lower or 'disc' in part_lower or 'disk' in part_lower:
             hierarchy['disc'] = part
@@ -1606,9 +1883,39 @@ def parse_music_hierarchy(filepath_parts):
                 hierarchy['disc_number'] = int(disc_match.group(1))
             
             # Das Album ist der Ordner VOR dem Disc-Ordner
-            if i > 0 and i < len(filepath_parts) - 1:
-                hierarchy['album'] = filepath_parts[i-1]
-                hierarchy['series'] = filepath_parts[i-1]
+            if i > 0:
+                hierarchy['album'] = folders[i-1]
+                hierarchy['series'] = folders[i-1]
+    
+    return hierarchy
+
+def parse_music_hierarchy(filepath_parts, folder_hierarchy=None):
+    """
+    Hierarchie-Erkennung für Musik-Dateien.
+    Extrahiert Genre, Artist, Album und Disc-Informationen.
+    
+    Args:
+        filepath_parts (list): Aufgeteilte Pfad-Komponenten
+        folder_hierarchy (dict|None): Ergebnis von get_music_folder_hierarchy()
+            (aus dem Verzeichnis-Cache), None = selbst ermitteln
+    
+    Returns:
+        dict: Strukturierte Musik-Hierarchie
+    """
+    if folder_hierarchy is None:
+        folder_hierarchy = get_music_folder_hierarchy(filepath_parts[:-1])
+    
+    hierarchy = dict(folder_hierarchy)
+    
+    # Disc-Angabe im Dateinamen (kein Album-Wechsel, da kein Ordner)
+    if filepath_parts:
+        filename = filepath_parts[-1]
+        filename_lower = filename.lower()
+        if 'cd' in filename_lower or 'disc' in filename_lower or 'disk' in filename_lower:
+            hierarchy['disc'] = filename
+            disc_match = re.search(r'(\d+)', filename)
+            if disc_match:
+                hierarchy['disc_number'] = int(disc_match.group(1))
     
     hierarchy['type'] = 'music'
     hierarchy['strategy'] = 'music_hierarchy'
@@ -1644,6 +1951,92 @@ def natural_sort_key(s):
 # HAUPT-HIERARCHIE-PARSER (MULTI-PASS)
 # -----------------------------------------------------------------------------
 
+# Verzeichnis-Cache: Episoden einer Staffel und Tracks eines Albums teilen alle
+# Pfadteile außer dem Dateinamen. Der ordnerabhängige Teil des Parsers
+# (Kategorie-Index, Genre, Serie/Staffel/Franchise, Artist/Album) wird daher
+# nur einmal pro Ordner berechnet.
+DIRECTORY_PARSE_CACHE_MAX = 5000  # Maximale Anzahl gecachter Ordner
+directory_parse_cache = {}        # {(ordner_tupel, kategorie): kontext}
+
+def clear_directory_parse_cache():
+    """Leert den Verzeichnis-Cache des Hierarchie-Parsers."""
+    directory_parse_cache.clear()
+
+def get_directory_parse_context(folder_parts, norm_cat):
+    """
+    Liefert den ordnerabhängigen Teil der Hierarchie-Erkennung (gecacht).
+    
+    Args:
+        folder_parts (tuple): Pfad-Komponenten ohne Dateiname
+        norm_cat (str): Normalisierte Kategorie
+    
+    Returns:
+        dict: Kategorie-Index, Ordner nach der Kategorie und kategorie-
+              spezifische Ordner-Analyse (Staffel, Film-Franchise, Musik)
+    """
+    key = (tuple(folder_parts), norm_cat)
+    context = directory_parse_cache.get(key)
+    if context is not None:
+        return context
+    
+    # Kategorie-Index in den Ordnern finden
+    cat_index = -1
+    category_variants = get_category_variants(norm_cat) if norm_cat != 'Unbekannt' else []
+    
+    for i, part in enumerate(folder_parts):
+        part_norm = normalize_category(part)
+        if part_norm == norm_cat or part_norm in category_variants:
+            cat_index = i
+            break
+    
+    # Ordner NACH der Kategorie (ohne Treffer: alle Ordner)
+    remaining_folders = list(folder_parts[cat_index + 1:])
+    
+    context = {
+        'cat_index': cat_index,
+        'category_variants': category_variants,
+        'remaining_folders': remaining_folders
+    }
+    
+    if norm_cat == 'Serie':
+        context['season_folder'] = find_season_folder(remaining_folders)
+    elif norm_cat == 'Film':
+        context['film'] = get_film_folder_context(remaining_folders)
+    elif norm_cat == 'Musik':
+        context['music'] = get_music_folder_hierarchy(remaining_folders)
+    
+    if len(directory_parse_cache) >= DIRECTORY_PARSE_CACHE_MAX:
+        directory_parse_cache.clear()
+    directory_parse_cache[key] = context
+    
+    return context
+
+def get_folder_genre(folder_parts, category):
+    """
+    Genre = erster Ordner nach dem Kategorie-Ordner (gecacht pro Ordner).
+    
+    Args:
+        folder_parts (tuple): Pfad-Komponenten ohne Dateiname
+        category (str): Normalisierte Kategorie
+    
+    Returns:
+        str|None: Genre-Ordner oder None
+    """
+    context = get_directory_parse_context(folder_parts, category)
+    
+    if 'folder_genre' not in context:
+        folder_genre = None
+        category_variants = [variant.lower() for variant in get_category_variants(category)]
+        for i, part in enumerate(folder_parts):
+            part_lower = part.lower()
+            if any(variant in part_lower for variant in category_variants):
+                if i + 1 < len(folder_parts):
+                    folder_genre = folder_parts[i + 1]
+                break
+        context['folder_genre'] = folder_genre
+    
+    return context['folder_genre']
+
 def parse_filepath_hierarchy_multipass(filepath, category):
     """
     Haupt-Parser für Dateipfad-Hierarchien.
@@ -1667,15 +2060,15 @@ def parse_filepath_hierarchy_multipass(filepath, category):
         if not norm_cat or norm_cat == 'Unbekannt':
             norm_cat = detect_category_from_path(filepath)
         
-        # Kategorie-Index im Pfad finden
-        cat_index = -1
-        category_variants = get_category_variants(norm_cat) if norm_cat != 'Unbekannt' else []
+        # Ordnerabhängiger Teil aus dem Verzeichnis-Cache
+        context = get_directory_parse_context(parts[:-1], norm_cat)
+        cat_index = context['cat_index']
         
-        for i, part in enumerate(parts):
-            part_norm = normalize_category(part)
-            if part_norm == norm_cat or part_norm in category_variants:
-                cat_index = i
-                break
+        # Kein Kategorie-Ordner: Dateiname selbst prüfen
+        if cat_index == -1 and parts:
+            part_norm = normalize_category(parts[-1])
+            if part_norm == norm_cat or part_norm in context['category_variants']:
+                cat_index = len(parts) - 1
         
         # Pfadteile NACH der Kategorie extrahieren
         if cat_index == -1:
@@ -1683,7 +2076,7 @@ def parse_filepath_hierarchy_multipass(filepath, category):
         elif cat_index >= len(parts) - 1:
             remaining = []  # Kategorie ist letzter Teil
         else:
-            remaining = list(parts[cat_index + 1:])  # Pfad nach Kategorie
+            remaining = context['remaining_folders'] + [parts[-1]]  # Pfad nach Kategorie
         
         # Basis-Resultat
         result = {
@@ -1696,23 +2089,12 @@ def parse_filepath_hierarchy_multipass(filepath, category):
             'sort_key': natural_sort_key(path.name)
         }
         
-        # Marker für erweiterte Analyse
-        markers = find_markers_in_path(remaining) if remaining else {
-            'staffel_index': -1,
-            'season_index': -1,
-            'episode_markers': [],
-            'year_markers': [],
-            'part_markers': [],
-            'disc_markers': [],
-            'franchise_indicators': []
-        }
-        
         strategies_result = None
         
         # KATEGORIE-SPEZIFISCHE PARSING-STRATEGIEN
         if norm_cat == 'Serie':
             if remaining and len(remaining) >= 2:
-                strategies_result = parse_series_hierarchy_multipass(remaining)
+                strategies_result = parse_series_hierarchy_multipass(remaining, context['season_folder'])
                 strategies_result['strategy'] = 'marker_based'
             else:
                 strategies_result = {
@@ -1724,7 +2106,7 @@ def parse_filepath_hierarchy_multipass(filepath, category):
         
         elif norm_cat == 'Film':
             if remaining:
-                strategies_result = parse_film_hierarchy_multipass(remaining)
+                strategies_result = parse_film_hierarchy_multipass(remaining, context['film'])
                 strategies_result['strategy'] = 'pattern_based'
             else:
                 strategies_result = {
@@ -1736,7 +2118,7 @@ def parse_filepath_hierarchy_multipass(filepath, category):
         
         elif norm_cat == 'Musik':
             if remaining and len(remaining) >= 2:
-                strategies_result = parse_music_hierarchy(remaining)
+                strategies_result = parse_music_hierarchy(remaining, context['music'])
                 strategies_result['strategy'] = 'music_simple'
             else:
                 strategies_result = {
@@ -1857,6 +2239,35 @@ def detect_category_from_path(filepath):
     
     return 'Unbekannt'
 
+def get_category_cache_stats():
+    """
+    Liefert Hit/Miss-Zähler der Kategorie-Caches (Diagnose).
+    
+    Returns:
+        dict: {funktionsname: {hits, misses, size, maxsize, hit_rate}}
+    """
+    stats = {}
+    # Nur Funktionen mit wiederkehrenden Argumenten - volle Dateipfade sind
+    # praktisch immer einmalig und würden den Cache nur mit toten Einträgen füllen
+    for func in (normalize_category, get_category_variants):
+        info = func.cache_info()
+        total = info.hits + info.misses
+        stats[func.__name__] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+            'hit_rate': round(info.hits / total * 100, 1) if total else 0.0
+        }
+    return stats
+
+def print_category_cache_stats():
+    """Gibt die Kategorie-Cache-Statistik auf der Konsole aus."""
+    print("   🧠 Kategorie-Caches:")
+    for name, info in get_category_cache_stats().items():
+        print(f"      {name}: {info['hits']} Hits / {info['misses']} Misses "
+              f"({info['hit_rate']}%, {info['size']}/{info['maxsize']} Einträge)")
+
 # -----------------------------------------------------------------------------
 # METADATA-EXTRACTION & MEDIA-ENRICHMENT
 # -----------------------------------------------------------------------------
@@ -1903,7 +2314,7 @@ def extract_metadata_from_tags(filepath):
     
     return {}
 
-def enrich_media_data(media_dict, use_cache=True):
+def enrich_media_data(media_dict, use_cache=True, hierarchies=None):
     """
     Bereichert Medien-Daten mit Hierarchie-Informationen.
     Nutzt Cache für Performance und konsistente Kategorisierung.
@@ -1911,6 +2322,8 @@ def enrich_media_data(media_dict, use_cache=True):
     Args:
         media_dict (dict): Basis-Medien-Daten
         use_cache (bool): Ob Cache verwendet werden soll
+        hierarchies (dict): Vorab geladene Cache-Einträge (load_cached_hierarchies),
+                            spart die Einzel-Abfrage pro Medium
         
     Returns:
         dict: Angereicherte Medien-Daten
@@ -1936,22 +2349,15 @@ def enrich_media_data(media_dict, use_cache=True):
         category = detected_category
     
     # Cache-Lookup
-    if use_cache and os.path.exists(HIERARCHY_DB_PATH):
-        try:
-            with HierarchyDBConnection() as cursor:
-                cursor.execute(
-                    "SELECT hierarchy_json FROM hierarchy_cache WHERE filepath = ?",
-                    (filepath,)
-                )
-                result = cursor.fetchone()
-                
-                if result:
-                    hierarchy = json.loads(result[0])
-                    media_dict['hierarchy'] = hierarchy
-                    media_dict['normalized_category'] = category
-                    return media_dict
-        except Exception as e:
-            print(f"⚠️ Hierarchie-Cache-Fehler: {e}")
+    if use_cache:
+        if hierarchies is None:
+            hierarchies = load_cached_hierarchies([filepath])
+        
+        hierarchy = hierarchies.get(filepath)
+        if hierarchy is not None:
+            media_dict['hierarchy'] = hierarchy
+            media_dict['normalized_category'] = category
+            return media_dict
     
     # Weiteres Parsing
     hierarchy = parse_filepath_hierarchy_multipass(filepath, category)
@@ -2038,6 +2444,8 @@ def init_hierarchy_database():
                 filepath TEXT PRIMARY KEY,
                 normalized_category TEXT,
                 hierarchy_json TEXT,
+                hierarchy_type TEXT,
+                hierarchy_strategy TEXT,
                 genre TEXT,
                 subgenre TEXT,
                 franchise TEXT,
@@ -2048,10 +2456,21 @@ def init_hierarchy_database():
                 episode_number INTEGER,
                 artist TEXT,
                 album TEXT,
+                year TEXT,
+                part INTEGER,
+                disc TEXT,
+                disc_number INTEGER,
                 last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # Migration: Spalten ergänzen, die ältere Datenbanken noch nicht haben
+        cursor.execute("PRAGMA table_info(hierarchy_cache)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        for column, column_type in HIERARCHY_MIGRATION_COLUMNS:
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE hierarchy_cache ADD COLUMN {column} {column_type}")
+        
         # Kategorie-Statistiken
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS category_stats (
@@ -2073,6 +2492,14 @@ def init_hierarchy_database():
             )
         ''')
         
+        # Fehlende Dateien (vom Existenz-Check oder beim Abspielen erkannt)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS missing_files (
+                filepath TEXT PRIMARY KEY,
+                checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         # Performance-Indizes
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_category ON hierarchy_cache(normalized_category)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_genre ON hierarchy_cache(genre)')
@@ -2095,6 +2522,117 @@ def init_hierarchy_database():
             print(f"❌ Kritischer Fehler: Konnte Hierarchie-DB nicht erstellen")
             raise
 
+# Hierarchie-Felder mit eigener Spalte in hierarchy_cache (Reihenfolge = SQL)
+HIERARCHY_COLUMNS = ('genre', 'subgenre', 'franchise', 'sub_franchise', 'series',
+                     'season', 'season_number', 'episode_number', 'artist', 'album',
+                     'year', 'part', 'disc', 'disc_number')
+
+# Spalten, die nach der ersten Version hinzugekommen sind
+HIERARCHY_MIGRATION_COLUMNS = (
+    ('hierarchy_type', 'TEXT'),
+    ('hierarchy_strategy', 'TEXT'),
+    ('year', 'TEXT'),
+    ('part', 'INTEGER'),
+    ('disc', 'TEXT'),
+    ('disc_number', 'INTEGER')
+)
+
+HIERARCHY_CACHE_INSERT_SQL = f'''
+    INSERT OR REPLACE INTO hierarchy_cache
+    (filepath, normalized_category, hierarchy_json, hierarchy_type, hierarchy_strategy,
+     {', '.join(HIERARCHY_COLUMNS)})
+    VALUES ({', '.join(['?'] * (len(HIERARCHY_COLUMNS) + 5))})
+'''
+
+HIERARCHY_CACHE_SELECT_SQL = f'''
+    SELECT filepath, normalized_category, hierarchy_type, hierarchy_strategy,
+           {', '.join(HIERARCHY_COLUMNS)}, hierarchy_json
+    FROM hierarchy_cache
+'''
+
+def hierarchy_cache_values(filepath, category, hierarchy, genre=None, store_json=False):
+    """
+    Werte-Tupel für HIERARCHY_CACHE_INSERT_SQL.
+    
+    Args:
+        filepath (str): Dateipfad
+        category (str): Normalisierte Kategorie
+        hierarchy (dict): Ergebnis von parse_filepath_hierarchy_multipass
+        genre (str): Abweichendes Genre (z.B. aus der Ordnerstruktur)
+        store_json (bool): hierarchy_json zusätzlich speichern (Debugging)
+    
+    Returns:
+        tuple: Werte in Spalten-Reihenfolge
+    """
+    values = [filepath, category,
+              json.dumps(hierarchy, ensure_ascii=False) if store_json else None,
+              hierarchy.get('type'), hierarchy.get('strategy')]
+    values.extend(hierarchy.get(column) for column in HIERARCHY_COLUMNS)
+    if genre:
+        values[5] = genre
+    return tuple(values)
+
+def hierarchy_from_row(row):
+    """
+    Baut das Hierarchie-Dict aus den typisierten Spalten einer Cache-Zeile.
+    Alte Zeilen ohne typisierte Spalten fallen auf hierarchy_json zurück.
+    
+    Args:
+        row (tuple): Zeile aus HIERARCHY_CACHE_SELECT_SQL
+    
+    Returns:
+        dict: Hierarchie-Informationen
+    """
+    filepath, category, hierarchy_type, strategy = row[:4]
+    hierarchy_json = row[-1]
+    
+    if hierarchy_type is None and hierarchy_json:
+        return json.loads(hierarchy_json)
+    
+    hierarchy = {
+        'filename': os.path.basename(filepath),
+        'extension': os.path.splitext(filepath)[1].lower(),
+        'detected_category': category,
+        'type': hierarchy_type,
+        'strategy': strategy
+    }
+    for column, value in zip(HIERARCHY_COLUMNS, row[4:-1]):
+        if value is not None:
+            hierarchy[column] = value
+    if 'episode_number' in hierarchy:
+        hierarchy['episode'] = hierarchy['episode_number']
+    
+    return hierarchy
+
+def load_cached_hierarchies(filepaths, chunk_size=500):
+    """
+    Lädt Cache-Einträge für viele Dateien mit wenigen Abfragen.
+    
+    Args:
+        filepaths (list): Dateipfade (z.B. alle Medien einer Seite)
+        chunk_size (int): Pfade pro IN-Abfrage
+    
+    Returns:
+        dict: {filepath: hierarchy}
+    """
+    hierarchies = {}
+    if not os.path.exists(HIERARCHY_DB_PATH):
+        return hierarchies
+    
+    try:
+        with HierarchyDBConnection() as cursor:
+            filepaths = list(dict.fromkeys(filepaths))
+            for start in range(0, len(filepaths), chunk_size):
+                chunk = filepaths[start:start + chunk_size]
+                placeholders = ','.join(['?'] * len(chunk))
+                cursor.execute(f"{HIERARCHY_CACHE_SELECT_SQL} WHERE filepath IN ({placeholders})", chunk)
+                for row in cursor.fetchall():
+                    hierarchies[row[0]] = hierarchy_from_row(row)
+    except Exception as e:
+        print(f"⚠️ Hierarchie-Cache-Fehler: {e}")
+    
+    return hierarchies
+
 def update_hierarchy_cache(media_dict):
     """
     Aktualisiert oder erstellt einen Cache-Eintrag für ein Medium.
@@ -2110,35 +2648,276 @@ def update_hierarchy_cache(media_dict):
         hierarchy = media_dict.get('hierarchy', {})
         category = media_dict.get('normalized_category', '')
         
+        store_json = get_setting('store_hierarchy_json', False)
+        
         with HierarchyDBConnection() as cursor:
-            cursor.execute('''
-                INSERT OR REPLACE INTO hierarchy_cache 
-                (filepath, normalized_category, hierarchy_json, genre, subgenre, 
-                 franchise, sub_franchise, series, season, season_number, episode_number, artist, album)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                filepath,
-                category,
-                json.dumps(hierarchy, ensure_ascii=False),
-                hierarchy.get('genre'),
-                hierarchy.get('subgenre'),
-                hierarchy.get('franchise'),
-                hierarchy.get('sub_franchise'),
-                hierarchy.get('series'),
-                hierarchy.get('season'),
-                hierarchy.get('season_number'),
-                hierarchy.get('episode_number'),
-                hierarchy.get('artist'),
-                hierarchy.get('album')
-            ))
+            cursor.execute(
+                HIERARCHY_CACHE_INSERT_SQL,
+                hierarchy_cache_values(filepath, category, hierarchy, store_json=store_json)
+            )
         
     except Exception as e:
         print(f"⚠️ Fehler beim Aktualisieren des Cache: {e}")
 
-def rebuild_hierarchy_cache():
+# -----------------------------------------------------------------------------
+# EXISTENZ-PRÜFUNG (STAT-FREIER REBUILD)
+# -----------------------------------------------------------------------------
+
+# Auf SMB/NFS-Shares und schlafenden USB-Platten dominiert os.path.exists()
+# pro Datei die Rebuild-Zeit. Der Rebuild vertraut daher media_files; die
+# Existenz wird optional parallel (begrenzt pro Laufwerk) im Hintergrund
+# geprüft und fehlende Dateien landen in der Tabelle missing_files.
+EXISTENCE_CHECK_MODES = ('off', 'parallel', 'sequential')
+STAT_MAX_VOLUMES = 16  # Maximale Anzahl parallel geprüfter Laufwerke/Shares
+# Fehlt auf einem Laufwerk jede Datei (ab dieser Anzahl), ist es offline bzw.
+# nicht eingehängt - dann wird nichts als fehlend markiert
+OFFLINE_VOLUME_MIN_FILES = 20
+MISSING_RECHECK_INTERVAL = 600  # Sekunden zwischen Nachprüfungen fehlender Dateien
+
+existence_check_lock = threading.Lock()
+missing_files_known = None      # RAM-Spiegel von missing_files (None = noch nicht geladen)
+missing_files_lock = threading.Lock()
+
+def get_existence_check_mode():
     """
-    Baut den gesamten Hierarchie-Cache neu auf.
-    KRITISCHER FIX: Kategorie-Normalisierung + Genre-Extraktion aus Ordnern
+    Liest den Modus für Existenz-Prüfungen beim Rebuild.
+    
+    Returns:
+        str: 'off' (media_files vertrauen), 'parallel' (Hintergrund-Prüfung)
+             oder 'sequential' (os.path.exists pro Datei während des Rebuilds)
+    """
+    mode = str(get_setting('rebuild_existence_check', 'parallel')).lower()
+    return mode if mode in EXISTENCE_CHECK_MODES else 'parallel'
+
+def get_volume_key(filepath):
+    """
+    Ermittelt das Laufwerk bzw. den Share eines Pfads.
+    
+    Args:
+        filepath (str): Dateipfad
+    
+    Returns:
+        str: 'C:', '\\\\server\\share', die ersten zwei Ebenen ('/mnt/nas') oder
+             bei flachen Pfaden ('/media/x.mkv') der Ordner der Datei
+    """
+    drive, _ = os.path.splitdrive(filepath)
+    if drive:
+        return drive.lower()
+    
+    parts = Path(filepath).parts
+    if len(parts) <= 3:
+        # Sonst wäre die Datei selbst das "Laufwerk" (nie ein Verzeichnis)
+        return os.path.dirname(filepath) or os.curdir
+    return os.path.join(*parts[:3])
+
+def is_volume_reachable(volume):
+    """
+    Prüft ob Laufwerk bzw. Share erreichbar ist (NAS aus, USB-Platte abgezogen).
+    
+    Args:
+        volume (str): Ergebnis von get_volume_key
+    
+    Returns:
+        bool: True wenn das Wurzelverzeichnis existiert
+    """
+    return bool(volume) and os.path.isdir(os.path.join(volume, ''))
+
+def check_files_exist_parallel(filepaths, workers_per_volume=None):
+    """
+    Prüft die Existenz vieler Dateien parallel mit Limit pro Laufwerk.
+    Jedes Laufwerk bekommt einen eigenen Thread-Pool, damit eine langsame
+    Netzwerk-Freigabe die lokalen Platten nicht blockiert.
+    
+    Args:
+        filepaths (iterable): Zu prüfende Pfade
+        workers_per_volume (int): Parallele Prüfungen pro Laufwerk
+    
+    Returns:
+        list: Pfade die nicht existieren (ohne Dateien nicht erreichbarer Laufwerke)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if workers_per_volume is None:
+        workers_per_volume = get_setting('stat_workers_per_volume', 4)
+    workers_per_volume = max(1, int(workers_per_volume))
+    
+    # Nach Laufwerk gruppieren
+    volumes = {}
+    for filepath in filepaths:
+        volumes.setdefault(get_volume_key(filepath), []).append(filepath)
+    
+    missing = []
+    volume_items = []
+    for volume, paths in volumes.items():
+        if is_volume_reachable(volume):
+            volume_items.append((volume, paths))
+        else:
+            print(f"⚠️ Laufwerk nicht erreichbar, übersprungen: {volume} ({len(paths)} Dateien)")
+    
+    # Laufwerke in Blöcken abarbeiten (begrenzt die Gesamtzahl an Threads)
+    for start in range(0, len(volume_items), STAT_MAX_VOLUMES):
+        executors = []
+        results = []
+        try:
+            for volume, paths in volume_items[start:start + STAT_MAX_VOLUMES]:
+                executor = ThreadPoolExecutor(max_workers=workers_per_volume,
+                                              thread_name_prefix='stat')
+                executors.append(executor)
+                results.append((paths, executor.map(os.path.exists, paths)))
+            
+            for paths, exists_flags in results:
+                volume_missing = [path for path, exists in zip(paths, exists_flags) if not exists]
+                if len(paths) >= OFFLINE_VOLUME_MIN_FILES and len(volume_missing) == len(paths):
+                    # Leerer Mountpunkt statt gelöschter Bibliothek
+                    print(f"⚠️ Keine Datei auf {get_volume_key(paths[0])} gefunden - "
+                          f"Laufwerk vermutlich offline, übersprungen")
+                    continue
+                missing.extend(volume_missing)
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+    
+    return missing
+
+def record_missing_files(missing_paths, replace=True):
+    """
+    Speichert fehlende Dateien in der Tabelle missing_files.
+    
+    Args:
+        missing_paths (list): Pfade fehlender Dateien
+        replace (bool): Bestehende Einträge vorher löschen (vollständiger Check)
+    """
+    global missing_files_known
+    
+    try:
+        with HierarchyDBConnection() as cursor:
+            if replace:
+                cursor.execute("DELETE FROM missing_files")
+            cursor.executemany(
+                "INSERT OR REPLACE INTO missing_files (filepath) VALUES (?)",
+                [(filepath,) for filepath in missing_paths]
+            )
+        with missing_files_lock:
+            if replace:
+                missing_files_known = set(missing_paths)
+            elif missing_files_known is not None:
+                missing_files_known.update(missing_paths)
+    except Exception as e:
+        print(f"⚠️ Fehler beim Speichern fehlender Dateien: {e}")
+
+def is_file_marked_missing(filepath):
+    """Prüft gegen den RAM-Spiegel von missing_files (beim ersten Aufruf geladen)."""
+    global missing_files_known
+    
+    with missing_files_lock:
+        if missing_files_known is None:
+            try:
+                with HierarchyDBConnection() as cursor:
+                    cursor.execute("SELECT filepath FROM missing_files")
+                    missing_files_known = {row[0] for row in cursor.fetchall()}
+            except Exception as e:
+                print(f"⚠️ Fehlende Dateien nicht lesbar: {e}")
+                return False
+        return filepath in missing_files_known
+
+def forget_missing_files(filepaths):
+    """Entfernt wieder gefundene Dateien aus missing_files und dem RAM-Spiegel."""
+    with HierarchyDBConnection() as cursor:
+        cursor.executemany("DELETE FROM missing_files WHERE filepath = ?",
+                           [(filepath,) for filepath in filepaths])
+    with missing_files_lock:
+        if missing_files_known is not None:
+            missing_files_known.difference_update(filepaths)
+
+def mark_file_missing(filepath):
+    """
+    Markiert eine beim Abspielen nicht gefundene Datei als fehlend - nur wenn
+    ihr Ordner noch existiert. Fehlt auch der Ordner, ist eher das Laufwerk
+    offline; dann bleibt die Datei sichtbar.
+    """
+    if not os.path.isdir(os.path.dirname(filepath)):
+        print(f"⚠️ Ordner nicht erreichbar, Datei nicht als fehlend markiert: {filepath}")
+        return
+    record_missing_files([filepath], replace=False)
+    thumbnail_memory_invalidate(filepaths={filepath})
+
+def clear_file_missing(filepath):
+    """Hebt die Markierung einer wieder gefundenen Datei auf (DB nur wenn markiert)."""
+    if not is_file_marked_missing(filepath):
+        return
+    try:
+        forget_missing_files([filepath])
+    except Exception as e:
+        print(f"⚠️ Fehler beim Aktualisieren fehlender Dateien: {e}")
+
+def recheck_missing_files():
+    """
+    Prüft nur die als fehlend markierten Dateien erneut und blendet wieder
+    vorhandene ein (läuft auch bei rebuild_existence_check='off').
+    
+    Returns:
+        int: Anzahl wieder gefundener Dateien
+    """
+    try:
+        with HierarchyDBConnection() as cursor:
+            cursor.execute("SELECT filepath FROM missing_files")
+            filepaths = [row[0] for row in cursor.fetchall()]
+        found = [filepath for filepath in filepaths if os.path.exists(filepath)]
+        if found:
+            forget_missing_files(found)
+            print(f"🔍 {len(found)} als fehlend markierte Dateien wieder gefunden")
+        return len(found)
+    except Exception as e:
+        print(f"⚠️ Nachprüfung fehlender Dateien fehlgeschlagen: {e}")
+        return 0
+
+def missing_files_recheck_worker():
+    """Prüft fehlende Dateien periodisch nach (z.B. NAS wieder online)."""
+    while True:
+        time.sleep(MISSING_RECHECK_INTERVAL)
+        recheck_missing_files()
+
+def start_missing_files_recheck():
+    """Startet die periodische Nachprüfung fehlender Dateien."""
+    threading.Thread(target=missing_files_recheck_worker, daemon=True).start()
+
+def run_existence_check():
+    """
+    Prüft alle Dateien im Hierarchie-Cache parallel und aktualisiert missing_files.
+    
+    Returns:
+        int: Anzahl fehlender Dateien (-1 bei Fehler oder laufendem Check)
+    """
+    if not existence_check_lock.acquire(blocking=False):
+        print("ℹ️ Existenz-Prüfung läuft bereits")
+        return -1
+    
+    try:
+        start_time = time.time()
+        with HierarchyDBConnection() as cursor:
+            cursor.execute("SELECT filepath FROM hierarchy_cache")
+            filepaths = [row[0] for row in cursor.fetchall()]
+        
+        missing = check_files_exist_parallel(filepaths)
+        record_missing_files(missing)
+        
+        print(f"🔍 Existenz-Prüfung: {len(filepaths)} Dateien, {len(missing)} fehlen "
+              f"({time.time() - start_time:.1f}s)")
+        return len(missing)
+    except Exception as e:
+        print(f"⚠️ Existenz-Prüfung fehlgeschlagen: {e}")
+        return -1
+    finally:
+        existence_check_lock.release()
+
+def start_existence_check():
+    """Startet die parallele Existenz-Prüfung im Hintergrund."""
+    threading.Thread(target=run_existence_check, daemon=True).start()
+
+def rebuild_hierarchy_cache():
+    """
+    Baut den gesamten Hierarchie-Cache neu auf.
+    KRITISCHER FIX: Kategorie-Normalisierung + Genre-Extraktion aus Ordnern
     
     Returns:
         bool: Erfolg des Neuaufbaus
@@ -2166,6 +2945,7 @@ def rebuild_hierarchy_cache():
         # Neue DB erstellen
         print("📁 Erstelle neue Hierarchie-Datenbank...")
         init_hierarchy_database()
+        clear_directory_parse_cache()
         
         time.sleep(0.5)
         
@@ -2194,6 +2974,10 @@ def rebuild_hierarchy_cache():
         
         print(f"📊 Verarbeite {total_count} Medien MIT KATEGORIE-KORREKTUR...")
         
+        existence_check = get_existence_check_mode()
+        print(f"   🔍 Existenz-Prüfung: {existence_check}")
+        store_json = get_setting('store_hierarchy_json', False)
+        
         processed = 0
         errors = 0
         
@@ -2216,7 +3000,8 @@ def rebuild_hierarchy_cache():
                     for media in batch:
                         try:
                             filepath = media.get('filepath', '')
-                            if not filepath or not os.path.exists(filepath):
+                            if not filepath or (existence_check == 'sequential'
+                                                and not os.path.exists(filepath)):
                                 errors += 1
                                 continue
                             
@@ -2239,49 +3024,20 @@ def rebuild_hierarchy_cache():
                             
                             # 🔧 FIX 3: Genre DIREKT aus Ordnerstruktur extrahieren
                             # Genre = Erster Ordner nach Kategorie-Ordner
-                            path_obj = Path(filepath)
-                            parts = path_obj.parts
-                            
-                            # Finde Kategorie-Index (case-insensitive)
-                            cat_index = -1
-                            category_variants = get_category_variants(corrected_category)
-                            for i, part in enumerate(parts):
-                                part_lower = part.lower()
-                                if any(variant.lower() in part_lower for variant in category_variants):
-                                    cat_index = i
-                                    break
-                            
-                            # Genre = Ordner nach Kategorie
-                            actual_genre = None
-                            if cat_index >= 0 and cat_index + 1 < len(parts) - 1:  # -1 weil letzter ist Datei
-                                actual_genre = parts[cat_index + 1]
+                            # (pro Ordner gecacht - Geschwister-Dateien teilen das Ergebnis)
+                            actual_genre = get_folder_genre(Path(filepath).parts[:-1], corrected_category)
+                            if actual_genre:
                                 print(f"   🎯 Genre aus Pfad: {actual_genre} (aus: {filepath})")
                             
                             # Verwende Ordner-Genre wenn vorhanden, sonst Hierarchie-Genre
                             final_genre = actual_genre if actual_genre else hierarchy.get('genre')
                             
-                            # In Cache schreiben mit KORRIGIERTEM Genre
-                            cursor_hierarchy.execute('''
-                                INSERT OR REPLACE INTO hierarchy_cache 
-                                (filepath, normalized_category, hierarchy_json, genre, subgenre, 
-                                 franchise, sub_franchise, series, season, season_number, 
-                                 episode_number, artist, album)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                filepath,
-                                corrected_category,  # Normalisierte Kategorie
-                                json.dumps(hierarchy, ensure_ascii=False),
-                                final_genre,  # 🔧 Korrigiertes Genre aus Ordner!
-                                hierarchy.get('subgenre'),
-                                hierarchy.get('franchise'),
-                                hierarchy.get('sub_franchise'),
-                                hierarchy.get('series'),
-                                hierarchy.get('season'),
-                                hierarchy.get('season_number'),
-                                hierarchy.get('episode_number'),
-                                hierarchy.get('artist'),
-                                hierarchy.get('album')
-                            ))
+                            # In Cache schreiben mit KORRIGIERTEM Genre (🔧 aus Ordner!)
+                            cursor_hierarchy.execute(
+                                HIERARCHY_CACHE_INSERT_SQL,
+                                hierarchy_cache_values(filepath, corrected_category, hierarchy,
+                                                       genre=final_genre, store_json=store_json)
+                            )
                             
                         except Exception as e:
                             errors += 1
@@ -2319,6 +3075,9 @@ def rebuild_hierarchy_cache():
         except Exception as e:
             print(f"⚠️ Fehler beim Aktualisieren der Statistiken: {e}")
         
+        if existence_check == 'parallel':
+            start_existence_check()
+        
         # Cache-Inhalt anzeigen MIT GENRE-VERTEILUNG
         print("\n🔍 CACHE-DATENBANK INHALT:")
         try:
@@ -2353,6 +3112,7 @@ def rebuild_hierarchy_cache():
         print(f"   📈 Verarbeitet: {processed} Medien")
         print(f"   ⚠️ Fehler: {errors}")
         print(f"   📊 Kategorien im Cache: {len(categories_in_cache) if 'categories_in_cache' in locals() else 'unbekannt'}")
+        print_category_cache_stats()
         
         return True
         
@@ -2422,6 +3182,362 @@ def update_category_stats():
         import traceback
         traceback.print_exc()
 
+# -----------------------------------------------------------------------------
+# IN-MEMORY-KATALOG (SPALTEN + BITMAPS)
+# -----------------------------------------------------------------------------
+
+# Optionaler Spalten-Katalog für /api/media: statt Hierarchie-DB → Pfadliste →
+# Haupt-DB werden Filter über Posting-Listen pro Facetten-Wert aufgelöst.
+# Dichte Werte (z.B. Kategorie) als Bitmap, seltene (z.B. Serie) als
+# sortiertes ID-Array. Item-IDs entsprechen der Sortierung (last_modified DESC),
+# Treffer kommen also bereits sortiert heraus.
+CATALOG_FACETS = ('normalized_category', 'genre', 'subgenre', 'franchise',
+                  'sub_franchise', 'series', 'album', 'year')
+
+# Bitmap ab 1/32 Trefferdichte (Bitmap n/8 Bytes < Array 4 Bytes pro ID)
+CATALOG_DENSE_RATIO = 32
+
+# Bits pro Byte (für das Überspringen bei der Paginierung)
+BYTE_POPCOUNT = bytes(bin(i).count('1') for i in range(256))
+
+media_catalog = None             # Aktueller MediaCatalog
+media_catalog_rejected = None    # Quell-Version, für die kein Katalog gebaut werden konnte
+media_catalog_building = False   # Build-Thread läuft
+media_catalog_lock = threading.Lock()
+
+class MediaCatalog:
+    """
+    Spaltenorientierter In-Memory-Katalog aller gefilterten Medien.
+    
+    Spalten (typed arrays, eine Zeile pro Medium in Sortier-Reihenfolge):
+    - rowids: rowid in media_files (für den Seiten-Abruf)
+    - Facetten: String-IDs (interniert) bzw. -1 für NULL
+    - season_number / episode_number: Integer, -1 für NULL
+    
+    Postings: {facette: {wert_id: bytes-Bitmap oder array('I')}}
+    """
+    def __init__(self, version):
+        self.version = version
+        self.count = 0
+        self.rowids = array('q')
+        self.strings = []
+        self.string_ids = {}
+        self.columns = {facet: array('i') for facet in CATALOG_FACETS}
+        self.season_numbers = array('i')
+        self.episode_numbers = array('i')
+        self.postings = {}
+        self.memory_bytes = 0
+    
+    def intern(self, value):
+        """Interniert einen Facetten-Wert und liefert seine ID (-1 für leer)."""
+        if value is None or value == '':
+            return -1
+        value = str(value)
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self.string_ids[value] = string_id
+        return string_id
+    
+    def build_postings(self, column):
+        """Baut Posting-Listen (Bitmap oder ID-Array) für eine Spalte."""
+        ids_by_value = {}
+        for item_id, value_id in enumerate(column):
+            if value_id >= 0:
+                ids_by_value.setdefault(value_id, []).append(item_id)
+        
+        postings = {}
+        nbytes = (self.count + 7) // 8
+        for value_id, item_ids in ids_by_value.items():
+            if len(item_ids) * CATALOG_DENSE_RATIO >= self.count:
+                bitmap = bytearray(nbytes)
+                for item_id in item_ids:
+                    bitmap[item_id >> 3] |= 1 << (item_id & 7)
+                postings[value_id] = bytes(bitmap)
+            else:
+                postings[value_id] = array('I', item_ids)
+        return postings
+    
+    def estimate_memory(self):
+        """Schätzt den Speicherbedarf in Bytes."""
+        total = sys.getsizeof(self.rowids) + sys.getsizeof(self.strings) + sys.getsizeof(self.string_ids)
+        total += sum(sys.getsizeof(s) for s in self.strings)
+        total += sys.getsizeof(self.season_numbers) + sys.getsizeof(self.episode_numbers)
+        total += sum(sys.getsizeof(column) for column in self.columns.values())
+        for postings in self.postings.values():
+            total += sys.getsizeof(postings)
+            total += sum(sys.getsizeof(posting) for posting in postings.values())
+        return total
+    
+    @classmethod
+    def build(cls, version):
+        """
+        Lädt Hierarchie-Cache und Haupt-DB in einen neuen Katalog.
+        
+        Args:
+            version: Quell-Version (siehe get_catalog_source_version)
+        
+        Returns:
+            MediaCatalog: Fertiger Katalog
+        """
+        catalog = cls(version)
+        
+        hierarchy_rows = {}
+        with HierarchyDBConnection() as cursor:
+            cursor.execute("""
+                SELECT filepath, normalized_category, genre, subgenre, franchise,
+                       sub_franchise, series, album, season_number, episode_number
+                FROM hierarchy_cache
+                WHERE filepath NOT IN (SELECT filepath FROM missing_files)
+            """)
+            for row in cursor.fetchall():
+                hierarchy_rows[row[0]] = row[1:]
+        
+        hierarchy_facets = CATALOG_FACETS[:-1]
+        with DBConnection(DB_PATH) as cursor:
+            cursor.execute("""
+                SELECT rowid, filepath, year
+                FROM media_files
+                WHERE filepath != ''
+                ORDER BY last_modified DESC
+            """)
+            for rowid, filepath, year in cursor:
+                hierarchy = hierarchy_rows.get(filepath)
+                if hierarchy is None:
+                    continue
+                
+                catalog.rowids.append(rowid)
+                for facet, value in zip(hierarchy_facets, hierarchy):
+                    catalog.columns[facet].append(catalog.intern(value))
+                catalog.columns['year'].append(catalog.intern(year))
+                catalog.season_numbers.append(hierarchy[7] if isinstance(hierarchy[7], int) else -1)
+                catalog.episode_numbers.append(hierarchy[8] if isinstance(hierarchy[8], int) else -1)
+        
+        catalog.count = len(catalog.rowids)
+        for facet in CATALOG_FACETS:
+            catalog.postings[facet] = catalog.build_postings(catalog.columns[facet])
+        catalog.postings['season_number'] = catalog.build_postings(catalog.season_numbers)
+        catalog.memory_bytes = catalog.estimate_memory()
+        
+        return catalog
+    
+    def get_posting(self, facet, value):
+        """Posting-Liste für facet = value (None wenn kein Treffer)."""
+        if facet == 'season_number':
+            value_id = value
+        else:
+            value_id = self.string_ids.get(str(value))
+        return self.postings[facet].get(value_id)
+    
+    def union(self, facets, value):
+        """
+        ODER-Verknüpfung mehrerer Spalten für denselben Wert.
+        
+        Returns:
+            bytes|list: Bitmap (falls eine Spalte dicht ist) oder sortierte IDs
+        """
+        postings = [p for p in (self.get_posting(facet, value) for facet in facets) if p is not None]
+        if len(postings) == 1:
+            return postings[0]
+        if any(isinstance(p, bytes) for p in postings):
+            bits = 0
+            for posting in postings:
+                bits |= self.to_int(posting)
+            return bits.to_bytes((self.count + 7) // 8, 'little')
+        return sorted(set().union(*postings))
+    
+    def to_int(self, posting):
+        """Wandelt eine Posting-Liste in eine Integer-Bitmap."""
+        if isinstance(posting, bytes):
+            return int.from_bytes(posting, 'little')
+        bitmap = bytearray((self.count + 7) // 8)
+        for item_id in posting:
+            bitmap[item_id >> 3] |= 1 << (item_id & 7)
+        return int.from_bytes(bitmap, 'little')
+    
+    def filter(self, groups):
+        """
+        UND-Verknüpfung aller Filter-Gruppen.
+        
+        Args:
+            groups (list): Posting-Listen (bytes-Bitmap oder sortierte IDs)
+        
+        Returns:
+            tuple: (anzahl, funktion(offset, limit) -> item-IDs)
+        """
+        if not groups:
+            return self.count, lambda offset, limit: range(self.count)[offset:offset + limit]
+        
+        sparse = [g for g in groups if not isinstance(g, bytes)]
+        if sparse:
+            # Kleinste ID-Liste gegen die restlichen Gruppen prüfen
+            base = min(sparse, key=len)
+            item_ids = list(base)
+            for group in groups:
+                if group is base:
+                    continue
+                if isinstance(group, bytes):
+                    item_ids = [i for i in item_ids if group[i >> 3] >> (i & 7) & 1]
+                else:
+                    members = set(group)
+                    item_ids = [i for i in item_ids if i in members]
+            return len(item_ids), lambda offset, limit: item_ids[offset:offset + limit]
+        
+        # Nur Bitmaps: Schnittmenge als Integer-AND
+        bits = self.to_int(groups[0])
+        for group in groups[1:]:
+            bits &= self.to_int(group)
+        bitmap = bits.to_bytes((self.count + 7) // 8, 'little')
+        return bin(bits).count('1'), lambda offset, limit: self.bitmap_slice(bitmap, offset, limit)
+    
+    def bitmap_slice(self, bitmap, offset, limit):
+        """Liefert die item-IDs Nr. offset..offset+limit einer Bitmap."""
+        result = []
+        skipped = 0
+        for byte_index, byte in enumerate(bitmap):
+            if not byte:
+                continue
+            bits_in_byte = BYTE_POPCOUNT[byte]
+            if skipped + bits_in_byte <= offset:
+                skipped += bits_in_byte
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    result.append((byte_index << 3) | bit)
+                    if len(result) >= limit:
+                        return result
+        return result
+    
+    def get_page(self, cursor_main, category=None, genre=None, subgenre=None,
+                 series=None, season=None, year=None, page=1, page_size=50):
+        """
+        Gleiche Filter-Semantik wie get_media_paginated (ohne Text-Suche).
+        
+        Returns:
+            tuple: (medien_liste, gesamt_anzahl, seiten_anzahl)
+        """
+        groups = []
+        
+        if category:
+            groups.append(self.union(('normalized_category',), category))
+        
+        if genre:
+            groups.append(self.union(('genre',), genre))
+        
+        if subgenre and not series:
+            groups.append(self.union(('series', 'subgenre', 'sub_franchise', 'franchise', 'album'), subgenre))
+        
+        if series:
+            groups.append(self.union(('series', 'sub_franchise', 'franchise'), series))
+        
+        if season:
+            groups.append(self.union(('season_number',), int(season)))
+        
+        if year:
+            groups.append(self.union(('year',), year))
+        
+        if any(not group for group in groups):
+            return [], 0, 0
+        
+        total_count, get_slice = self.filter(groups)
+        if total_count == 0:
+            return [], 0, 0
+        
+        # Pagination
+        total_pages = max(1, (total_count + page_size - 1) // page_size)
+        offset = (page - 1) * page_size
+        item_ids = get_slice(max(0, offset), page_size)
+        if not item_ids:
+            return [], total_count, total_pages
+        
+        rowids = [self.rowids[i] for i in item_ids]
+        placeholders = ','.join(['?'] * len(rowids))
+        cursor_main.execute(f"SELECT * FROM media_files WHERE rowid IN ({placeholders})", rowids)
+        
+        media_list = [dict(row) for row in cursor_main.fetchall()]
+        media_list.sort(key=lambda x: natural_sort_key(x.get('filename', '')))
+        
+        return media_list, total_count, total_pages
+
+def get_catalog_source_version():
+    """
+    Version der Quell-Datenbanken (mtime + Größe beider DB-Dateien).
+    Jede Änderung an Hierarchie-Cache oder media_files ändert die Version.
+    """
+    try:
+        version = []
+        for path in (DB_PATH, HIERARCHY_DB_PATH):
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+    except OSError:
+        return None
+
+def build_media_catalog_worker():
+    """Baut den Katalog im Hintergrund (wiederholt, falls sich die Quelle ändert)."""
+    global media_catalog, media_catalog_rejected, media_catalog_building
+    
+    try:
+        while True:
+            version = get_catalog_source_version()
+            if version is None:
+                return
+            
+            start_time = time.time()
+            budget = get_setting('catalog_memory_mb', 64) * 1024 * 1024
+            try:
+                catalog = MediaCatalog.build(version)
+            except Exception as e:
+                print(f"⚠️ Medien-Katalog konnte nicht gebaut werden: {e}")
+                media_catalog = None
+                media_catalog_rejected = version
+                return
+            
+            if catalog.memory_bytes > budget:
+                print(f"⚠️ Medien-Katalog überschreitet Budget "
+                      f"({catalog.memory_bytes / 1024 / 1024:.1f} MB) - nutze SQL-Filterung")
+                media_catalog = None
+                media_catalog_rejected = version
+            else:
+                media_catalog = catalog
+                print(f"🗂️ Medien-Katalog: {catalog.count} Medien, "
+                      f"{catalog.memory_bytes / 1024 / 1024:.1f} MB, {time.time() - start_time:.2f}s")
+            
+            if get_catalog_source_version() == version:
+                return
+    finally:
+        with media_catalog_lock:
+            media_catalog_building = False
+
+def get_media_catalog():
+    """
+    Liefert den aktuellen Katalog oder None (dann SQL-Filterung).
+    Ist der Katalog veraltet, wird im Hintergrund neu gebaut.
+    """
+    global media_catalog_building
+    
+    if not get_setting('media_catalog_enabled', True):
+        return None
+    
+    version = get_catalog_source_version()
+    if version is None:
+        return None
+    
+    catalog = media_catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    
+    with media_catalog_lock:
+        if not media_catalog_building and media_catalog_rejected != version:
+            media_catalog_building = True
+            threading.Thread(target=build_media_catalog_worker, daemon=True).start()
+    
+    return None
+
 # -----------------------------------------------------------------------------
 # MEDIEN-FILTERUNG & PAGINIERUNG
 # -----------------------------------------------------------------------------
@@ -2454,6 +3570,13 @@ def get_media_paginated(cursor_main, category=None, genre=None, subgenre=None,
         print("⚠️ Hierarchie-DB fehlt, kann nicht filtern!")
         return [], 0, 0
     
+    # Schneller Pfad: In-Memory-Katalog (Text-Suche läuft weiter über SQL)
+    if not search:
+        catalog = get_media_catalog()
+        if catalog is not None:
+            return catalog.get_page(cursor_main, category, genre, subgenre, series,
+                                    season, year, page, page_size)
+    
     # WHERE-Clauses für Hierarchie-DB aufbauen
     where_clauses = []
     params = []
@@ -2488,7 +3611,10 @@ def get_media_paginated(cursor_main, category=None, genre=None, subgenre=None,
         where_clauses.append("season_number = ?")
         params.append(int(season))
     
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+    # Als fehlend markierte Dateien ausblenden
+    where_clauses.append("filepath NOT IN (SELECT filepath FROM missing_files)")
+    
+    where_sql = " AND ".join(where_clauses)
     
     # Hierarchie-DB Query mit Context Manager
     try:
@@ -2652,9 +3778,14 @@ def extract_audio_thumbnail(audio_path, output_path):
         print(f"❌ Audio-Thumbnail fehlgeschlagen für {os.path.basename(audio_path)}: {e}")
         return False
 
+IMAGE_THUMBNAIL_SIZE = (320, 240)
+IMAGE_THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
 def extract_image_thumbnail(image_path, output_path):
     """
     Erstellt Thumbnail aus Bild-Dateien.
+    JPEGs werden per Draft-Modus direkt in reduzierter Auflösung dekodiert
+    (DCT-Skalierung 1/2 bis 1/8), die EXIF-Ausrichtung wird übernommen.
     
     Args:
         image_path (str): Pfad zum Bild
@@ -2666,18 +3797,21 @@ def extract_image_thumbnail(image_path, output_path):
     try:
         if not HAS_PIL:
             return False
-            
-        img = Image.open(image_path)
-        img.thumbnail((320, 240))
+        
+        width, height = IMAGE_THUMBNAIL_SIZE
+        with Image.open(image_path) as img:
+            # Draft vor dem ersten Laden: quadratisch, damit es auch für
+            # gedrehte (EXIF) Bilder groß genug bleibt
+            img.draft('RGB', (width, width))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail(IMAGE_THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
         
         # Hochformat-Bilder zentrieren
         if img.height > img.width:
-            new_img = Image.new('RGB', (320, 240), color='black')
-            scale = 240 / img.height
-            new_width = int(img.width * scale)
-            img_resized = img.resize((new_width, 240), Image.Resampling.LANCZOS)
-            x_offset = (320 - new_width) // 2
-            new_img.paste(img_resized, (x_offset, 0))
+            new_img = Image.new('RGB', IMAGE_THUMBNAIL_SIZE, color='black')
+            new_img.paste(img, ((width - img.width) // 2, (height - img.height) // 2))
             new_img.save(output_path, 'JPEG', quality=85)
         else:
             img.save(output_path, 'JPEG', quality=85)
@@ -2749,44 +3883,162 @@ def create_color_thumbnail(filepath, output_path):
         print(f"❌ Color-Thumbnail fehlgeschlagen: {e}")
         return False
 
-def generate_or_get_thumbnail(filepath):
-    """Haupt-Funktion für Thumbnail-Management."""
-    thumb_hash = hashlib.md5(filepath.encode('utf-8')).hexdigest()
-    thumb_path = os.path.join(THUMBNAIL_DIR, f"{thumb_hash}.jpg")
-    lock_path = thumb_path + ".lock"
+# -----------------------------------------------------------------------------
+# THUMBNAIL-SERVICE (WORKER-POOL)
+# -----------------------------------------------------------------------------
 
-    # Thumbnail existiert bereits
-    if os.path.exists(thumb_path):
-        # Prüfe ob Thumbnail gültig ist (> 100 Bytes)
-        try:
-            if os.path.getsize(thumb_path) > 100:
-                return thumb_path
-            else:
-                # Korrupter Thumbnail, neu generieren
-                os.remove(thumb_path)
-                print(f"🔄 Korrupter Thumbnail, neu generieren: {os.path.basename(filepath)}")
-        except:
-            pass
+# Thumbnails werden in einem begrenzten Worker-Pool erzeugt. Pro Datei gibt es
+# höchstens eine laufende Generierung (Future); doppelte Anfragen warten auf
+# dasselbe Ergebnis statt einen Platzhalter zu bekommen.
+THUMBNAIL_WORKERS = max(2, min(8, os.cpu_count() or 2))  # Parallele Generierungen
+THUMBNAIL_WAIT_TIMEOUT = 30                              # Max. Wartezeit im Request (Sekunden)
+# Die Vorgenerierung hat einen eigenen, kleineren Pool mit gesenkter Priorität:
+# Anfragen aus dem Grid warten nie hinter einem Hintergrund-Bündel
+THUMBNAIL_PREGEN_WORKERS = max(2, THUMBNAIL_WORKERS // 2)
+
+thumbnail_executor = None
+thumbnail_pregen_executor = None
+thumbnail_futures = {}  # {filepath: Future}
+thumbnail_futures_lock = threading.Lock()
+
+def get_thumbnail_executor():
+    """Liefert den (lazy erstellten) Thumbnail-Worker-Pool."""
+    global thumbnail_executor
+    
+    with thumbnail_futures_lock:
+        if thumbnail_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS,
+                                                    thread_name_prefix='thumbnail')
+        return thumbnail_executor
+
+def get_thumbnail_pregen_executor():
+    """Liefert den (lazy erstellten) Worker-Pool der Vorgenerierung."""
+    global thumbnail_pregen_executor
+    
+    with thumbnail_futures_lock:
+        if thumbnail_pregen_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            thumbnail_pregen_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_PREGEN_WORKERS,
+                                                           thread_name_prefix='thumbnail-pregen',
+                                                           initializer=lower_thread_priority)
+        return thumbnail_pregen_executor
+
+def lower_thread_priority():
+    """Senkt die Priorität des aufrufenden Threads (Linux: nice gilt pro Thread)."""
+    if platform.system() == "Linux":
+        with contextlib.suppress(OSError, AttributeError):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), FFMPEG_NICE['background'])
+
+def submit_thumbnail(filepath, background=False):
+    """
+    Reiht eine Thumbnail-Generierung ein (oder liefert die bereits laufende).
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        background (bool): Im Pool der Vorgenerierung statt im Request-Pool
+    
+    Returns:
+        Future: Ergebnis ist der Thumbnail-Pfad oder None
+    """
+    executor = get_thumbnail_pregen_executor() if background else get_thumbnail_executor()
+    
+    with thumbnail_futures_lock:
+        future = thumbnail_futures.get(filepath)
+        if future is None:
+            future = executor.submit(create_thumbnail, filepath)
+            thumbnail_futures[filepath] = future
+            future.add_done_callback(lambda done: release_thumbnail_future(filepath, done))
+        return future
+
+def release_thumbnail_future(filepath, future):
+    """Entfernt eine abgeschlossene Generierung aus der Future-Map."""
+    with thumbnail_futures_lock:
+        if thumbnail_futures.get(filepath) is future:
+            del thumbnail_futures[filepath]
+
+def is_thumbnail_pending(filepath):
+    """Prüft ob für eine Datei gerade ein Thumbnail erzeugt wird."""
+    with thumbnail_futures_lock:
+        return filepath in thumbnail_futures
+
+def generate_or_get_thumbnail(filepath, timeout=THUMBNAIL_WAIT_TIMEOUT, version=None):
+    """
+    Haupt-Funktion für Thumbnail-Management.
+    Liefert vorhandene Thumbnails sofort, sonst wird auf den Worker-Pool gewartet.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        timeout (float): Max. Wartezeit auf die Generierung
+        version (str): Aktuelle Dateiversion (None = nicht prüfen)
+    
+    Returns:
+        bytes|None: Thumbnail-Daten oder None (fehlgeschlagen/Timeout)
+    """
+    # Thumbnail existiert bereits im Speicher (und passt zur Datei)
+    data = thumbnail_store_get(filepath, version=version)
+    if data:
+        return data
 
-    # Prüfe ob andere Generierung läuft
-    if os.path.exists(lock_path):
-        try:
-            # Prüfe Lock-Alter
-            lock_age = time.time() - os.path.getmtime(lock_path)
-            if lock_age < 30:  # 30 Sekunden warten
-                return None  # Andere Generierung läuft noch
-            else:
-                # Veralteter Lock, entfernen
-                os.remove(lock_path)
-                print(f"⚠️ Veralteter Lock entfernt: {os.path.basename(filepath)}")
-        except:
+    from concurrent.futures import TimeoutError as FutureTimeoutError
+    try:
+        return submit_thumbnail(filepath).result(timeout=timeout)
+    except FutureTimeoutError:
+        print(f"⏳ Thumbnail-Timeout ({timeout}s): {os.path.basename(filepath)}")
+        return None
+
+def create_thumbnail(filepath):
+    """
+    Erzeugt das Thumbnail für eine Datei (läuft im Worker-Pool) und legt es
+    im Thumbnail-Speicher ab. Die Extraktoren schreiben in eine Arbeitsdatei,
+    die danach wieder entfernt wird.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+    
+    Returns:
+        bytes|None: Thumbnail-Daten oder None
+    """
+    work_path = os.path.join(THUMBNAIL_DIR, f'{get_thumbnail_key(filepath)}.work.jpg')
+    version = get_file_thumbnail_version(filepath)
+    is_music = os.path.splitext(filepath)[1].lower() in COVER_EXTENSIONS
+    
+    try:
+        # Musik: ein gemeinsames Cover pro Album statt einer Kopie pro Track
+        if is_music:
+            cover_hash, data = get_shared_cover(filepath)
+            if cover_hash:
+                thumbnail_store_link_cover(filepath, cover_hash, version=version)
+                return data
+        
+        if not render_thumbnail(filepath, work_path, covers_checked=is_music):
             return None
+        with open(work_path, 'rb') as f:
+            data = f.read()
+        thumbnail_store_put(filepath, data, version=version)
+        return data
+    except Exception as e:
+        print(f"⚠️ Thumbnail konnte nicht gespeichert werden für {os.path.basename(filepath)}: {e}")
+        return None
+    finally:
+        try:
+            os.remove(work_path)
+        except OSError:
+            pass
 
+def render_thumbnail(filepath, thumb_path, covers_checked=False):
+    """
+    Schreibt das Thumbnail für eine Datei nach thumb_path.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        thumb_path (str): Zieldatei
+        covers_checked (bool): Cover-Art wurde bereits gesucht (nicht erneut lesen)
+    
+    Returns:
+        str|None: Thumbnail-Pfad oder None
+    """
     try:
-        # Lock setzen
-        with open(lock_path, 'w') as f:
-            f.write(str(time.time()))
-        
         ext = os.path.splitext(filepath)[1].lower()
         
         print(f"🔄 Generiere Thumbnail für: {os.path.basename(filepath)}")
@@ -2818,7 +4070,7 @@ def generate_or_get_thumbnail(filepath):
             print(f"🎵 Audio-Datei: Suche Cover-Art...")
             
             # 1. PRIORITÄT: Cover-Art aus ID3-Tags
-            if extract_audio_cover(filepath, thumb_path):
+            if not covers_checked and extract_audio_cover(filepath, thumb_path):
                 return thumb_path
             
             # 2. PRIORITÄT: Audio-Thumbnail (mit Musik-Icon)
@@ -2830,7 +4082,7 @@ def generate_or_get_thumbnail(filepath):
             create_color_thumbnail(filepath, thumb_path)
         
         # === BILDER ===
-        elif ext in ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'):
+        elif ext in IMAGE_THUMBNAIL_EXTENSIONS:
             if extract_image_thumbnail(filepath, thumb_path):
                 return thumb_path
             else:
@@ -2851,173 +4103,107 @@ def generate_or_get_thumbnail(filepath):
     except Exception as e:
         print(f"⚠️ Thumbnail-Generierung fehlgeschlagen für {os.path.basename(filepath)}: {e}")
         return None
-        
-    finally:
-        # Lock immer entfernen
-        try:
-            if os.path.exists(lock_path):
-                os.remove(lock_path)
-        except:
-            pass
 
-def extract_audio_cover(filepath, thumbnail_path):
+def read_embedded_cover(filepath):
     """
-    Extrahiert Cover-Art aus verschiedenen Audio-Formaten.
+    Liest die eingebettete Cover-Art (Rohbytes) einer Audio-Datei.
     Priorität: ID3-Tags > APIC-Frames > Andere Metadaten
     
     Args:
         filepath (str): Pfad zur Audio-Datei
-        thumbnail_path (str): Ziel-Pfad
-        
+    
     Returns:
-        bool: Erfolg der Extraktion
+        bytes|None: Bilddaten oder None
     """
+    if not HAS_MUTAGEN:
+        return None
+    
+    ext = os.path.splitext(filepath)[1].lower()
+    
+    print(f"🔍 Suche Cover-Art in: {os.path.basename(filepath)}")
+    
     try:
-        if not HAS_MUTAGEN:
-            return False
-        
-        ext = os.path.splitext(filepath)[1].lower()
-        
-        print(f"🔍 Suche Cover-Art in: {os.path.basename(filepath)}")
-        
         # MP3: ID3 Tags (höchste Priorität)
         if ext == ".mp3":
-            try:
-                from mutagen.id3 import ID3
-                print(f"   📁 MP3 ID3-Tags prüfen...")
-                audio = ID3(filepath)
-                
-                # Suche nach APIC-Frames (Cover-Art)
-                for tag in audio.values():
-                    if hasattr(tag, 'FrameID') and tag.FrameID == "APIC":
-                        print(f"   ✅ APIC-Frame gefunden: {len(tag.data)} Bytes")
-                        if HAS_PIL:
-                            try:
-                                image = Image.open(io.BytesIO(tag.data))
-                                image = image.convert("RGB")
-                                image.thumbnail((512, 512))
-                                image.save(thumbnail_path, "JPEG", quality=90)
-                                print(f"   ✅ MP3-Cover gespeichert: {thumbnail_path}")
-                                return True
-                            except Exception as e:
-                                print(f"   ⚠️ PIL-Fehler: {e}")
-                                # Fallback: Rohdaten speichern
-                                with open(thumbnail_path, 'wb') as f:
-                                    f.write(tag.data)
-                                return True
-                        else:
-                            # Direktes Schreiben ohne PIL
-                            with open(thumbnail_path, 'wb') as f:
-                                f.write(tag.data)
-                            return True
-                
-                print(f"   ⚠️ Kein APIC-Frame gefunden")
-            except Exception as e:
-                print(f"   ⚠️ MP3 ID3-Fehler: {e}")
+            from mutagen.id3 import ID3
+            for tag in ID3(filepath).values():
+                if hasattr(tag, 'FrameID') and tag.FrameID == "APIC":
+                    print(f"   ✅ APIC-Frame gefunden: {len(tag.data)} Bytes")
+                    return tag.data
         
         # FLAC: Vorbis Comments
         elif ext == ".flac":
-            try:
-                from mutagen.flac import FLAC
-                print(f"   📁 FLAC Vorbis-Comments prüfen...")
-                audio = FLAC(filepath)
-                
-                if audio.pictures:
-                    pic = audio.pictures[0]
-                    print(f"   ✅ FLAC-Picture gefunden: {len(pic.data)} Bytes")
-                    
-                    if HAS_PIL:
-                        try:
-                            image = Image.open(io.BytesIO(pic.data))
-                            image = image.convert("RGB")
-                            image.thumbnail((512, 512))
-                            image.save(thumbnail_path, "JPEG", quality=90)
-                            print(f"   ✅ FLAC-Cover gespeichert")
-                            return True
-                        except Exception as e:
-                            print(f"   ⚠️ PIL-Fehler: {e}")
-                            with open(thumbnail_path, 'wb') as f:
-                                f.write(pic.data)
-                            return True
-                    else:
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(pic.data)
-                        return True
-                
-                print(f"   ⚠️ Keine Pictures in FLAC")
-            except Exception as e:
-                print(f"   ⚠️ FLAC-Fehler: {e}")
+            from mutagen.flac import FLAC
+            audio = FLAC(filepath)
+            if audio.pictures:
+                print(f"   ✅ FLAC-Picture gefunden: {len(audio.pictures[0].data)} Bytes")
+                return audio.pictures[0].data
         
         # M4A/AAC: MP4 Atoms
         elif ext in (".m4a", ".aac"):
-            try:
-                from mutagen.mp4 import MP4
-                print(f"   📁 MP4 Atoms prüfen...")
-                audio = MP4(filepath)
-                
-                if "covr" in audio:
-                    cover = audio["covr"][0]
-                    print(f"   ✅ MP4 'covr' Atom gefunden: {len(cover)} Bytes")
-                    
-                    if HAS_PIL:
-                        try:
-                            image = Image.open(io.BytesIO(cover))
-                            image = image.convert("RGB")
-                            image.thumbnail((512, 512))
-                            image.save(thumbnail_path, "JPEG", quality=90)
-                            print(f"   ✅ M4A-Cover gespeichert")
-                            return True
-                        except Exception as e:
-                            print(f"   ⚠️ PIL-Fehler: {e}")
-                            with open(thumbnail_path, 'wb') as f:
-                                f.write(cover)
-                            return True
-                    else:
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(cover)
-                        return True
-                
-                print(f"   ⚠️ Kein 'covr' Atom in MP4")
-            except Exception as e:
-                print(f"   ⚠️ MP4-Fehler: {e}")
+            audio = MP4(filepath)
+            if "covr" in audio:
+                cover = bytes(audio["covr"][0])
+                print(f"   ✅ MP4 'covr' Atom gefunden: {len(cover)} Bytes")
+                return cover
         
-        # OGG: Base64 encoded
+        # OGG: Base64-kodierter FLAC-Picture-Block
         elif ext == ".ogg":
-            try:
-                from mutagen.oggvorbis import OggVorbis
-                print(f"   📁 OGG Vorbis-Comments prüfen...")
-                audio = OggVorbis(filepath)
-                
-                if "metadata_block_picture" in audio:
-                    import base64
-                    pic_data = base64.b64decode(audio["metadata_block_picture"][0])
-                    print(f"   ✅ OGG Picture gefunden: {len(pic_data)} Bytes")
-                    
-                    if HAS_PIL:
-                        try:
-                            image = Image.open(io.BytesIO(pic_data))
-                            image = image.convert("RGB")
-                            image.thumbnail((512, 512))
-                            image.save(thumbnail_path, "JPEG", quality=90)
-                            print(f"   ✅ OGG-Cover gespeichert")
-                            return True
-                        except Exception as e:
-                            print(f"   ⚠️ PIL-Fehler: {e}")
-                            with open(thumbnail_path, 'wb') as f:
-                                f.write(pic_data)
-                            return True
-                    else:
-                        with open(thumbnail_path, 'wb') as f:
-                            f.write(pic_data)
-                        return True
-                
-                print(f"   ⚠️ Kein metadata_block_picture in OGG")
-            except Exception as e:
-                print(f"   ⚠️ OGG-Fehler: {e}")
-        
-        print(f"   ❌ Keine Cover-Art gefunden in {os.path.basename(filepath)}")
-        return False
+            from mutagen.oggvorbis import OggVorbis
+            audio = OggVorbis(filepath)
+            if "metadata_block_picture" in audio:
+                import base64
+                from mutagen.flac import Picture
+                picture = Picture(base64.b64decode(audio["metadata_block_picture"][0]))
+                print(f"   ✅ OGG Picture gefunden: {len(picture.data)} Bytes")
+                return picture.data
+    
+    except Exception as e:
+        print(f"   ⚠️ Cover-Metadaten nicht lesbar: {e}")
+    
+    print(f"   ❌ Keine Cover-Art gefunden in {os.path.basename(filepath)}")
+    return None
+
+def encode_cover_image(raw):
+    """
+    Skaliert Cover-Art auf max. 512px und kodiert sie als JPEG.
+    
+    Args:
+        raw (bytes): Original-Bilddaten
+    
+    Returns:
+        bytes: JPEG-Daten (ohne PIL oder bei Fehlern die Rohdaten)
+    """
+    if HAS_PIL:
+        try:
+            image = Image.open(io.BytesIO(raw))
+            image = image.convert("RGB")
+            image.thumbnail((512, 512))
+            output = io.BytesIO()
+            image.save(output, "JPEG", quality=90)
+            return output.getvalue()
+        except Exception as e:
+            print(f"   ⚠️ PIL-Fehler: {e}")
+    return raw
+
+def extract_audio_cover(filepath, thumbnail_path):
+    """
+    Extrahiert Cover-Art aus verschiedenen Audio-Formaten.
+    
+    Args:
+        filepath (str): Pfad zur Audio-Datei
+        thumbnail_path (str): Ziel-Pfad
         
+    Returns:
+        bool: Erfolg der Extraktion
+    """
+    try:
+        raw = read_embedded_cover(filepath)
+        if not raw:
+            return False
+        with open(thumbnail_path, 'wb') as f:
+            f.write(encode_cover_image(raw))
+        return True
     except Exception as e:
         print(f"⚠️ Audio-Cover-Extraktion fehlgeschlagen für {os.path.basename(filepath)}: {e}")
         return False
@@ -3071,10 +4257,68 @@ def extract_mp4_cover(filepath, thumbnail_path):
         print(f"⚠️ MP4 Cover-Extraktion fehlgeschlagen für {os.path.basename(filepath)}: {e}")
         return False
 
+# Kandidaten-Frames für Video-Thumbnails: ab VIDEO_FRAME_START Sekunden nur
+# Keyframes dekodieren, alle VIDEO_FRAME_SPACING Sekunden einen auswählen.
+VIDEO_FRAME_START = 5
+VIDEO_FRAME_WINDOW = 60
+VIDEO_FRAME_SPACING = 8
+VIDEO_FRAME_CANDIDATES = 6
+VIDEO_FRAME_TIMEOUT = 15
+
+def split_ppm_stream(data):
+    """
+    Zerlegt einen PPM-Stream (ffmpeg image2pipe, Codec ppm) in einzelne Bilder.
+    
+    Args:
+        data (bytes): Aneinandergehängte P6-Bilder
+    
+    Returns:
+        list: PIL-Images
+    """
+    images = []
+    pos = 0
+    while pos < len(data):
+        # Header: "P6" <breite> <höhe> <maxval> + ein Whitespace
+        fields = []
+        while len(fields) < 4 and pos < len(data):
+            while pos < len(data) and data[pos:pos + 1].isspace():
+                pos += 1
+            start = pos
+            while pos < len(data) and not data[pos:pos + 1].isspace():
+                pos += 1
+            fields.append(data[start:pos])
+        if len(fields) < 4 or fields[0] != b'P6':
+            break
+        
+        width, height = int(fields[1]), int(fields[2])
+        pos += 1
+        size = width * height * 3
+        if pos + size > len(data):
+            break
+        images.append(Image.frombuffer('RGB', (width, height), data[pos:pos + size], 'raw', 'RGB', 0, 1))
+        pos += size
+    return images
+
+def score_video_frame(img):
+    """
+    Bewertet ein Frame: None für (fast) schwarze Frames, sonst Kontrast.
+    
+    Args:
+        img (Image): Kandidaten-Frame
+    
+    Returns:
+        float|None: Score (Standardabweichung der Helligkeit)
+    """
+    stat = ImageStat.Stat(img.convert("L"))
+    if stat.mean[0] <= 5:
+        return None
+    return stat.stddev[0]
+
 def extract_non_black_video_frame(filepath, thumbnail_path):
     """
     Extrahiert nicht-schwarzes Frame aus Videos.
-    Probiert verschiedene Zeitpunkte bis helles Frame gefunden.
+    Ein einziger FFmpeg-Aufruf liefert mehrere Kandidaten über eine Pipe,
+    das kontrastreichste nicht-schwarze Frame wird gespeichert.
     
     Args:
         filepath (str): Pfad zur Video-Datei
@@ -3084,44 +4328,38 @@ def extract_non_black_video_frame(filepath, thumbnail_path):
         bool: Erfolg der Extraktion
     """
     try:
-        timestamps = [5, 10, 20, 30, 60]
-
-        for ts in timestamps:
-            cmd = [
-                FFMPEG_EXECUTABLE,
-                "-ss", str(ts),
-                "-i", filepath,
-                "-frames:v", "1",
-                "-vf", "scale=512:-1",
-                "-q:v", "2",
-                thumbnail_path,
-                "-y"
-            ]
-
-            with FFmpegProcess(cmd, timeout=10) as process:
-                try:
-                    process.wait(timeout=10)
-                except subprocess.TimeoutExpired:
-                    print(f"⚠️ FFmpeg Timeout bei Timestamp {ts}")
-                    continue
+        cmd = [
+            FFMPEG_EXECUTABLE,
+            "-skip_frame", "nokey",
+            "-ss", str(VIDEO_FRAME_START),
+            "-t", str(VIDEO_FRAME_WINDOW),
+            "-i", filepath,
+            "-an", "-sn",
+            "-vf", f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{VIDEO_FRAME_SPACING})',scale=512:-2",
+            "-vsync", "vfr",
+            "-frames:v", str(VIDEO_FRAME_CANDIDATES),
+            "-c:v", "ppm",
+            "-f", "image2pipe",
+            "pipe:1"
+        ]
 
-            if not os.path.exists(thumbnail_path):
-                continue
+        # Zeitlimit setzt der FFmpeg-Supervisor durch
+        with FFmpegProcess(cmd, timeout=VIDEO_FRAME_TIMEOUT) as process:
+            data = process.stdout.read()
 
-            # Helligkeit prüfen
-            try:
-                with Image.open(thumbnail_path) as img:
-                    img = img.convert("L")
-                    pixels = list(img.getdata())
-                    avg_brightness = sum(pixels) / len(pixels)
+        # Helligkeit/Kontrast prüfen
+        best_frame = None
+        best_score = None
+        for frame in split_ppm_stream(data):
+            score = score_video_frame(frame)
+            if score is not None and (best_score is None or score > best_score):
+                best_frame, best_score = frame, score
 
-                    if avg_brightness > 5:
-                        return True
-            except Exception as e:
-                print(f"⚠️ Bild-Analyse fehlgeschlagen: {e}")
-                continue
+        if best_frame is None:
+            return False
 
-        return False
+        best_frame.save(thumbnail_path, 'JPEG', quality=90)
+        return True
         
     except Exception as e:
         print(f"⚠️ Video-Frame-Extraktion fehlgeschlagen: {e}")
@@ -3197,124 +4435,297 @@ def get_seasons_for_series(category, genre, subgenre, series):
 # VIDEO-STREAMING MIT TRANSCODING
 # -----------------------------------------------------------------------------
 
-def stream_video_transcoded(handler, filepath):
+TRANSCODE_PROFILE = 'h264'            # Browser-kompatibles fMP4 (H.264 + AAC), Encoder-Profil siehe select_encoder_profile
+REMUX_PROFILE = 'remux'                # Nur Container-Wechsel
+AUDIO_TRANSCODE_PROFILE = 'copy-aac'   # Video kopiert, Audio nach AAC
+# Nur billige Kopier-Profile dürfen per splice (nicht teilbar) laufen; ein
+# zweiter Encoder für dieselbe Position kostet beim H.264-Transcode zu viel CPU
+SPLICE_PROFILES = (REMUX_PROFILE, AUDIO_TRANSCODE_PROFILE)
+
+def select_audio_stream(info):
+    """
+    Index (0:a:N) des Audio-Streams in der bevorzugten Sprache, sonst 0.
+    
+    Args:
+        info (dict): Ergebnis von probe_media
+    
+    Returns:
+        int: Audio-Stream-Index
+    """
+    audio_language = (get_setting('audio_language', 'ger') or '').strip()
+    languages = info.get('audio_languages', [])
+    if audio_language and audio_language in languages:
+        return languages.index(audio_language)
+    return 0
+
+def get_transcode_stream_maps(filepath):
+    """
+    Wählt Video- und Audio-Stream (bevorzugte Audio-Sprache aus dem Probe-Cache).
+    
+    Args:
+        filepath (str): Quelldatei
+    
+    Returns:
+        list: FFmpeg -map Argumente
+    """
+    info = probe_media(filepath)
+    index = select_audio_stream(info)
+    if index:
+        print(f"   🎵 Audio-Sprache '{info['audio_languages'][index]}' ausgewählt (Stream {index})")
+    # '?' = optional, Videos ohne Tonspur laufen trotzdem
+    return ["-map", f"0:v:{info.get('video_index', 0)}", "-map", f"0:a:{index}?"]
+
+def get_input_args(filepath, start=0):
+    """
+    FFmpeg-Eingabe mit optionalem Startpunkt.
+    
+    -ss steht vor -i: FFmpeg springt im Container direkt zum Keyframe statt
+    alles davor zu dekodieren. Die Ausgabe beginnt bei Zeitstempel 0, der
+    Player addiert den Startpunkt selbst (siehe /api/playback).
+    """
+    if start > 0:
+        return [FFMPEG_EXECUTABLE, "-ss", f"{start:.3f}", "-i", filepath]
+    return [FFMPEG_EXECUTABLE, "-i", filepath]
+
+def build_transcode_command(filepath, start=0, encoder=None):
+    """
+    Baut den FFmpeg-Befehl für das Live-Transcoding nach fragmentiertem MP4.
+    
+    Args:
+        filepath (str): Quelldatei
+        start (float): Startposition in Sekunden (Keyframe)
+        encoder (dict): Encoder-Profil (select_encoder_profile), None = jetzt wählen
+    
+    Returns:
+        list: FFmpeg-Argumente (Ausgabe auf pipe:1)
+    """
+    if encoder is None:
+        encoder = select_encoder_profile(filepath)
+    cmd = get_input_args(filepath, start)
+    cmd.extend(get_transcode_stream_maps(filepath))
+    if encoder['scale']:
+        cmd.extend(["-vf", f"scale=-2:{encoder['height']}"])
+    cmd.extend([
+        "-c:v", "libx264",
+        "-preset", encoder['preset'],
+        "-crf", str(encoder['crf']),
+        "-maxrate", f"{encoder['maxrate']}k",
+        "-bufsize", f"{encoder['maxrate'] * 2}k",
+        "-pix_fmt", "yuv420p",
+        "-profile:v", "main",
+        "-g", "30",
+        "-sc_threshold", "0",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-ar", "44100",
+        "-ac", "2",
+        "-f", "mp4",
+        "-vsync", "cfr",
+        "-async", "1",
+        "-max_muxing_queue_size", "1024",
+        "pipe:1"
+    ])
+    return cmd
+
+def build_remux_command(filepath, start=0):
+    """FFmpeg-Befehl für reinen Container-Wechsel nach fragmentiertem MP4 (kein Transcoding)."""
+    cmd = get_input_args(filepath, start)
+    cmd.extend(get_transcode_stream_maps(filepath))
+    cmd.extend([
+        '-c', 'copy',          # Keine Rekodierung
+        '-sn', '-dn',
+        '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4',
+        'pipe:1'
+    ])
+    return cmd
+
+def build_audio_transcode_command(filepath, start=0):
+    """FFmpeg-Befehl: Video unverändert kopieren, nur Audio nach AAC (z.B. AC3/DTS in MKV)."""
+    cmd = get_input_args(filepath, start)
+    cmd.extend(get_transcode_stream_maps(filepath))
+    cmd.extend([
+        '-c:v', 'copy',
+        '-c:a', 'aac',
+        '-b:a', '160k',
+        '-ac', '2',
+        '-sn', '-dn',
+        '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
+        '-f', 'mp4',
+        'pipe:1'
+    ])
+    return cmd
+
+def choose_stream_method(filepath):
+    """
+    Wählt anhand der Codecs (probe_media) den günstigsten Weg in den Browser.
+    
+    Args:
+        filepath (str): Quelldatei
+    
+    Returns:
+        tuple: (Methode, Begründung) mit Methode 'direct', 'remux', 'audio' oder 'transcode'
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    info = probe_media(filepath)
+    video = info.get('video_codec')
+    if not video:
+        return 'transcode', 'Codecs unbekannt'
+    
+    audio_codecs = info.get('audio_codecs', [])
+    default_audio = audio_codecs[0] if audio_codecs else None       # Spielt der Browser direkt
+    audio = audio_codecs[select_audio_stream(info)] if audio_codecs else None
+    h264_ok = video == 'h264' and info.get('pix_fmt') in (None,) + BROWSER_H264_PIX_FMTS
+    
+    if ext == '.webm' and video in BROWSER_WEBM_VIDEO_CODECS and default_audio in (None,) + BROWSER_WEBM_AUDIO_CODECS:
+        return 'direct', f'WebM {video}/{default_audio or "stumm"}'
+    if ext in POTENTIALLY_PROBLEMATIC_MP4 and h264_ok and default_audio in (None,) + BROWSER_MP4_AUDIO_CODECS:
+        return 'direct', f'MP4 H.264/{default_audio or "stumm"}'
+    if h264_ok and audio in (None,) + BROWSER_MP4_AUDIO_CODECS:
+        return 'remux', f'H.264/{audio or "stumm"} - nur Container-Wechsel'
+    if h264_ok:
+        return 'audio', f'H.264 wird kopiert, Audio {audio} → AAC'
+    if video == 'h264':
+        return 'transcode', f'H.264 {info.get("pix_fmt")} nicht browsertauglich'
+    return 'transcode', f'Video-Codec {video}'
+
+# Methode → (Profil, Befehls-Builder) für stream_transcode_session
+STREAM_METHOD_PROFILES = {
+    'remux': (REMUX_PROFILE, build_remux_command),
+    'audio': (AUDIO_TRANSCODE_PROFILE, build_audio_transcode_command),
+    'transcode': (TRANSCODE_PROFILE, build_transcode_command),
+}
+
+def use_zero_copy_streaming():
+    """splice() verfügbar (Linux) und nicht in den Einstellungen abgeschaltet."""
+    return SPLICE_AVAILABLE and bool(get_setting('zero_copy_streaming', True))
+
+def send_buffers(sock, parts):
+    """
+    Sendet mehrere Puffer vollständig (sendmsg = ein Systemaufruf für alle,
+    ohne sie zusammenzukopieren; Fallback sendall je Puffer).
+    
+    Returns:
+        int: Gesendete Bytes
+    """
+    total = sum(len(part) for part in parts)
+    if not hasattr(sock, 'sendmsg'):
+        for part in parts:
+            sock.sendall(part)
+        return total
+    parts = list(parts)
+    while parts:
+        sent = sock.sendmsg(parts)
+        # Teilweise gesendet: Rest der Puffer erneut
+        while sent and parts:
+            if sent >= len(parts[0]):
+                sent -= len(parts.pop(0))
+            else:
+                parts[0] = parts[0][sent:]
+                sent = 0
+    return total
+
+def get_encoder_session_profile(encoder):
+    """Sitzungs-Profil eines Live-Transcodes inkl. Encoder-Profil (z.B. 'h264-720p')."""
+    return f"{TRANSCODE_PROFILE}-{encoder['name']}"
+
+def is_encoder_session_profile(profile):
+    """True für Sitzungen mit libx264 (nicht Remux/Audio-Kopie)."""
+    return profile.startswith(f'{TRANSCODE_PROFILE}-')
+
+def stream_video_transcoded(handler, filepath, start=0, bandwidth=None):
     """Streamt Videos mit Live-Transcoding für inkompatible Formate."""
     print(f"🔄 Starte Transcoding für: {os.path.basename(filepath)}")
+    # Beitreten nur, wenn die laufende Sitzung das Profil hat, das dieser Client
+    # bei der jetzigen Last bekäme; gewählt (und geloggt) wird nur für neue Sitzungen
+    encoder = select_encoder_profile(filepath, bandwidth, joining=True)
+    if not has_joinable_transcode_session((filepath, get_encoder_session_profile(encoder), start)):
+        encoder = select_encoder_profile(filepath, bandwidth)
+    # Der Cache-Eintrag (TRANSCODE_PROFILE) entsteht nur aus voller Qualität
+    stream_transcode_session(handler, filepath, get_encoder_session_profile(encoder),
+                             lambda path, position: build_transcode_command(path, position, encoder),
+                             start=start, cache=encoder['full_quality'], cache_profile=TRANSCODE_PROFILE)
+
+def stream_transcode_session(handler, filepath, profile, build_command, start=0, cache=True, cache_profile=None):
+    """
+    Sendet die Ausgabe einer (ggf. bereits laufenden) Transcode-Sitzung an
+    einen Client. Mehrere Clients derselben Quelle teilen sich ein FFmpeg.
+    Remux/Audio-Kopie ohne Cache-Mitschnitt leitet eine neue Sitzung unter
+    Linux per splice() direkt von der FFmpeg-Pipe in den Socket.
     
+    Args:
+        handler: HTTP-Request-Handler
+        filepath (str): Quelldatei
+        profile (str): Sitzungs-Profil (REMUX_PROFILE, AUDIO_TRANSCODE_PROFILE
+                       oder get_encoder_session_profile)
+        build_command (callable): Erzeugt den FFmpeg-Befehl (nur für neue Sitzungen)
+        start (float): Startposition in Sekunden (Keyframe, siehe get_stream_start)
+        cache (bool): Vollständige Ausgabe in den Transcode-Cache übernehmen
+        cache_profile (str): Profil des Cache-Eintrags (None = profile)
+    """
+    cache_profile = cache_profile or profile
     try:
         if not os.path.exists(filepath):
             print(f"❌ Datei existiert nicht: {filepath}")
             handler.send_error(404, "Datei nicht gefunden")
             return
-
-        handler.send_response(200)
-        handler.send_header("Content-Type", "video/mp4")
-        handler.send_header("Cache-Control", "no-cache")
-        handler.send_header("X-Content-Type-Options", "nosniff")
-        handler.send_header("Accept-Ranges", "none")
-        handler.end_headers()
-        print("✅ Header gesendet")
-
-        audio_language = get_setting('audio_language', 'ger')
-        ext = os.path.splitext(filepath)[1].lower()
         
-        cmd = [
-            FFMPEG_EXECUTABLE,
-            "-i", filepath,
-        ]
+        # Schon einmal vollständig transcodiert: Datei mit Range-Support ausliefern
+        cached_path = get_cached_transcode(filepath, cache_profile) if start == 0 else None
+        if cached_path:
+            print(f"💾 Transcode-Cache-Treffer ({cache_profile}): {os.path.basename(filepath)}")
+            range_header = handler.headers.get('Range')
+            if range_header:
+                handler.handle_range_request(cached_path, 'video/mp4', range_header)
+            else:
+                handler.serve_file(cached_path, 'video/mp4')
+            return
         
-        # 🔧 KORREKTUR: Prüfe VORHER ob die Sprache existiert
-        if ext == '.mkv' and audio_language and audio_language.strip():
-            # Versuche die Sprache zu finden
-            audio_map = f"0:a:m:language:{audio_language}"
-            
-            # Teste ob Sprache existiert
-            test_cmd = [
-                FFPROBE_EXECUTABLE,
-                "-v", "error",
-                "-select_streams", "a",
-                "-show_entries", "stream_tags=language",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                filepath
-            ]
-            
-            try:
-                result = subprocess.run(test_cmd, capture_output=True, text=True, timeout=3)
-                available_languages = result.stdout.strip().split('\n')
-                
-                if audio_language in available_languages:
-                    # Sprache vorhanden → nutze sie
-                    cmd.extend(["-map", "0:v:0", "-map", audio_map])
-                    print(f"   🎵 Audio-Sprache '{audio_language}' gefunden und ausgewählt")
-                else:
-                    # Sprache nicht vorhanden → erster Audio-Stream
-                    cmd.extend(["-map", "0:v:0", "-map", "0:a:0"])
-                    print(f"   ℹ️ Audio-Sprache '{audio_language}' nicht gefunden, nutze ersten Stream")
-                    print(f"   📋 Verfügbare Sprachen: {', '.join(available_languages) if available_languages else 'keine Tags'}")
-                    
-            except Exception as e:
-                # Fallback bei Fehler
-                cmd.extend(["-map", "0:v:0", "-map", "0:a:0"])
-                print(f"   ⚠️ Sprach-Prüfung fehlgeschlagen: {e}")
-        else:
-            cmd.extend(["-map", "0:v:0", "-map", "0:a:0"])
-        
-        # Rest bleibt UNVERÄNDERT
-        cmd.extend([
-            "-c:v", "libx264",
-            "-preset", "ultrafast",
-            "-tune", "zerolatency",
-            "-pix_fmt", "yuv420p",
-            "-profile:v", "baseline",
-            "-level", "3.0",
-            "-g", "30",
-            "-sc_threshold", "0",
-            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-ar", "44100",
-            "-ac", "2",
-            "-f", "mp4",
-            "-vsync", "cfr",
-            "-async", "1",
-            "-max_muxing_queue_size", "1024",
-            "pipe:1"
-        ])
+        # Ohne Cache-Mitschnitt braucht niemand die Daten in Python: splice (Linux)
+        solo = profile in SPLICE_PROFILES and use_zero_copy_streaming() and not (start == 0 and cache)
+        session, consumer = acquire_transcode_session(filepath, profile, start, build_command, cache, solo,
+                                                      cache_profile)
+        if session is None:
+            handler.send_response(503)
+            handler.send_header("Retry-After", str(TRANSCODE_RETRY_AFTER))
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            print(f"⛔ Transcode-Limit erreicht ({get_transcode_limit()}) - Anfrage abgelehnt")
+            return
         
-        print(f"   🚀 FFmpeg Kommando: {' '.join(cmd[:10])}...")
-
-        with FFmpegProcess(cmd, timeout=300) as process:
-            bytes_sent = 0
-            chunks_sent = 0
-            first_chunk = True
-            
-            try:
-                while True:
-                    chunk_size = 8192 if first_chunk else 65536
-                    data = process.stdout.read(chunk_size)
-                    
-                    if not data:
-                        break
+        bytes_sent = 0
+        try:
+            handler.send_response(200)
+            handler.send_header("Content-Type", "video/mp4")
+            handler.send_header("Cache-Control", "no-cache")
+            handler.send_header("X-Content-Type-Options", "nosniff")
+            handler.send_header("Accept-Ranges", "none")
+            handler.send_header("X-Stream-Start", f"{start:.3f}")
+            handler.end_headers()
+            handler.wfile.flush()
+            
+            if session.solo:
+                bytes_sent = session.splice_to(handler.connection)
+            
+            while not session.solo:
+                parts = session.read(consumer)
+                if not parts:
+                    break
+                try:
+                    # Alle Puffer-Ausschnitte mit einem Systemaufruf, ohne Kopie
+                    size = send_buffers(handler.connection, parts)
+                    bytes_sent += size
+                    session.bytes_sent += size
                     
-                    try:
-                        handler.wfile.write(data)
-                        handler.wfile.flush()
-                        bytes_sent += len(data)
-                        chunks_sent += 1
-                        
-                        if first_chunk and chunks_sent >= 10:
-                            first_chunk = False
-                            print(f"   ⚡ Erste {bytes_sent / 1024:.1f} KB gesendet")
-                        
-                        if bytes_sent % (50 * 1024 * 1024) < 65536:
-                            print(f"   📊 Gesendet: {bytes_sent / (1024*1024):.1f} MB")
-                            
-                    except (ConnectionResetError, BrokenPipeError, OSError) as e:
-                        print(f"ℹ️ Client hat Verbindung getrennt nach {bytes_sent / (1024*1024):.1f} MB")
-                        break
-            
-            except Exception as e:
-                print(f"❌ Streaming-Fehler: {e}")
+                    if bytes_sent % (50 * 1024 * 1024) < size:
+                        print(f"   📊 Gesendet: {bytes_sent / (1024*1024):.1f} MB")
+                
+                except (ConnectionResetError, BrokenPipeError, OSError) as e:
+                    print(f"ℹ️ Client hat Verbindung getrennt nach {bytes_sent / (1024*1024):.1f} MB")
+                    break
+        finally:
+            session.detach(consumer)
         
         print(f"✅ Streaming beendet: {os.path.basename(filepath)} ({bytes_sent / (1024*1024):.1f} MB)")
 
@@ -3377,108 +4788,3002 @@ class SettingsDBConnection(DBConnection):
     def __init__(self, timeout=10):
         super().__init__(SETTINGS_DB_PATH, timeout=timeout)
 
+class ThumbnailDBConnection(DBConnection):
+    """Spezialisierter Context Manager für den Thumbnail-Speicher."""
+    def __init__(self, timeout=10):
+        super().__init__(THUMBNAIL_STORE_PATH, timeout=timeout)
+
 # -----------------------------------------------------------------------------
-# FFMPEG PROCESS MANAGEMENT - Zombie-Prozess Prevention
+# THUMBNAIL-SPEICHER (SQLITE-BLOBS + LRU)
 # -----------------------------------------------------------------------------
 
-import signal
-import contextlib
+# Alle Thumbnails liegen als Blobs in einer SQLite-Datei statt als einzelne
+# JPEGs im Verzeichnis. Das Byte-Budget wird per LRU (last_access) gehalten,
+# Invalidierung geht gezielt über Pfad-Präfix oder Kategorie.
+THUMBNAIL_STORE_PATH = os.path.join(THUMBNAIL_DIR, 'thumbnails.db')
+THUMBNAIL_ACCESS_RESOLUTION = 300   # last_access nur alle 5 Min. aktualisieren
+THUMBNAIL_EVICT_TARGET = 0.9        # Nach Verdrängung auf 90% des Budgets
 
-class FFmpegProcess:
-    """
-    Context Manager für sichere FFmpeg-Prozess-Verwaltung.
-    Garantiert Prozess-Cleanup auch bei Exceptions oder Client-Disconnect.
+thumbnail_store_ready = False
+thumbnail_store_bytes = None  # Laufende Summe, beim ersten Zugriff aus der DB
+thumbnail_store_lock = threading.Lock()
+
+def get_thumbnail_key(filepath, variant=None):
+    """Liefert den Speicher-Schlüssel (MD5 des Pfads, optional mit Variante) eines Thumbnails."""
+    key = hashlib.md5(filepath.encode('utf-8')).hexdigest()
+    return f'{key}_{variant}' if variant else key
+
+def get_thumbnail_version(file_size, last_modified):
     """
-    def __init__(self, cmd, timeout=300):
-        self.cmd = cmd
-        self.timeout = timeout
-        self.process = None
-        self.startupinfo = None
-        self.creationflags = 0
-        
-        # Windows-spezifische Konfiguration
-        if platform.system() == "Windows":
-            self.startupinfo = subprocess.STARTUPINFO()
-            self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            self.startupinfo.wShowWindow = subprocess.SW_HIDE
-            self.creationflags = subprocess.CREATE_NO_WINDOW
+    Versionskennung einer Mediendatei aus Größe und Änderungszeit.
+    Ersetzte Dateien bekommen so eine neue Thumbnail-URL.
     
-    def __enter__(self):
-        """Korrigierte Version: Keine manuellen Anführungszeichen um Argumente"""
-        print(f"🚀 Starte FFmpeg für Transcoding...")
-        
-        # Konvertiere alle Argumente zu Strings
-        cmd_strs = [str(arg) for arg in self.cmd]
-        
-        # Nur für Debugging: Zeige ersten Teil des Befehls
-        cmd_display = ' '.join(cmd_strs[:10]) + ('...' if len(cmd_strs) > 10 else '')
-        print(f"   FFmpeg Befehl: {cmd_display}")
-        
-        # WICHTIG: stderr=PIPE für Fehlererkennung
-        self.process = subprocess.Popen(
-            cmd_strs,  # Liste von Strings ohne extra Anführungszeichen
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,  # ÄNDERUNG: Fehlerausgabe lesbar
-            stdin=subprocess.DEVNULL,
-            startupinfo=self.startupinfo,
-            creationflags=self.creationflags,
-            bufsize=8192,
-            shell=False  # KEIN shell=True!
-        )
-        
-        # Starte einen Thread um stderr zu lesen (für Debugging)
-        def read_stderr():
-            try:
-                for line in iter(self.process.stderr.readline, b''):
-                    line_str = line.decode('utf-8', errors='ignore').strip()
-                    if line_str and 'error' in line_str.lower():
-                        print(f"   ⚠️ FFmpeg Fehler: {line_str[:100]}")
-            except:
-                pass
-        
-        threading.Thread(target=read_stderr, daemon=True).start()
-        
-        return self.process
+    Args:
+        file_size (int): Dateigröße in Bytes
+        last_modified (float): mtime
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.cleanup()
-        return False
+    Returns:
+        str: z.B. '1a2b3c-65f0a1b2' (None bei nicht-numerischen Werten)
+    """
+    try:
+        return f'{int(float(file_size or 0)):x}-{int(float(last_modified or 0)):x}'
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def get_file_thumbnail_version(filepath):
+    """Aktuelle Versionskennung einer Datei (None falls nicht lesbar)."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return get_thumbnail_version(st.st_size, st.st_mtime)
+
+def add_thumbnail_versions(media_list):
+    """
+    Setzt 'thumbnail_version' (für ?v= in Thumbnail-URLs) je Medium aus
+    os.stat - dieselbe Quelle wie handle_thumbnail_request. Die Werte in
+    media_files pflegt der externe Indexer; Typ und Rundung sind dort nicht
+    garantiert, die Versionen würden nie übereinstimmen.
     
-    def cleanup(self):
-        """Erzwingt Prozess-Beendigung mit Fallback auf SIGKILL."""
-        if not self.process:
+    Args:
+        media_list (list): Medien-Dicts (werden ergänzt)
+    
+    Returns:
+        list: Dieselbe Liste
+    """
+    for media in media_list:
+        filepath = media.get('filepath') or ''
+        media['thumbnail_version'] = get_file_thumbnail_version(filepath) if filepath else None
+    return media_list
+
+def get_image_mime_type(data):
+    """Erkennt den Bildtyp anhand der Signatur (Fallback-Thumbnails können PNG sein)."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data[4:12] == b'ftypavif':
+        return 'image/avif'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    return 'image/jpeg'
+
+def init_thumbnail_store():
+    """Legt die Thumbnail-Tabelle an und liest die belegten Bytes."""
+    global thumbnail_store_ready, thumbnail_store_bytes
+    
+    with thumbnail_store_lock:
+        if thumbnail_store_ready:
             return
-        
-        try:
-            # 1. Versuche graceful shutdown
-            if self.process.poll() is None:  # Prozess läuft noch
-                try:
-                    self.process.stdout.close()
-                except:
-                    pass
-                
-                self.process.terminate()
-                
-                try:
-                    self.process.wait(timeout=3)
-                except subprocess.TimeoutExpired:
-                    # 2. Force kill wenn terminate fehlschlägt
-                    print("⚠️ FFmpeg reagiert nicht, erzwinge Beendigung...")
-                    self.process.kill()
-                    
-                    try:
-                        self.process.wait(timeout=2)
-                    except subprocess.TimeoutExpired:
-                        # 3. Letzter Versuch mit OS-Signal (Unix)
-                        if platform.system() != "Windows":
-                            try:
-                                os.kill(self.process.pid, signal.SIGKILL)
-                            except:
-                                pass
-        except Exception as e:
-            print(f"⚠️ Fehler beim FFmpeg-Cleanup: {e}")
-        finally:
-            self.process = None
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS thumbnails (
+                    key TEXT PRIMARY KEY,
+                    filepath TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    version TEXT,
+                    cover_hash TEXT
+                )
+            """)
+            # Geteilte Cover (ein Eintrag pro Bild, Tracks verweisen per cover_hash)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS cover_images (
+                    hash TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            # Migration: neue Spalten für Speicher aus älteren Versionen
+            cursor.execute("PRAGMA table_info(thumbnails)")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column in ('version', 'cover_hash'):
+                if column not in existing_columns:
+                    cursor.execute(f"ALTER TABLE thumbnails ADD COLUMN {column} TEXT")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_access ON thumbnails(last_access)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_filepath ON thumbnails(filepath)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_cover ON thumbnails(cover_hash)")
+            thumbnail_store_bytes = get_thumbnail_store_bytes(cursor)
+        thumbnail_store_ready = True
+
+def get_thumbnail_store_bytes(cursor):
+    """Belegte Bytes (Thumbnails + geteilte Cover)."""
+    cursor.execute("""
+        SELECT (SELECT COALESCE(SUM(size), 0) FROM thumbnails)
+             + (SELECT COALESCE(SUM(size), 0) FROM cover_images)
+    """)
+    return cursor.fetchone()[0]
+
+def purge_orphan_covers(cursor):
+    """Löscht Cover, auf die kein Thumbnail mehr verweist."""
+    cursor.execute("""
+        DELETE FROM cover_images WHERE hash NOT IN
+            (SELECT cover_hash FROM thumbnails WHERE cover_hash IS NOT NULL)
+    """)
+
+def get_thumbnail_store_budget():
+    """Byte-Budget des Thumbnail-Speichers aus den Einstellungen."""
+    return max(16, int(get_setting('thumbnail_store_mb', 1024))) * 1024 * 1024
+
+def thumbnail_store_get(filepath, variant=None, version=None):
+    """
+    Liest ein Thumbnail aus dem Speicher. Alte Einzeldateien aus THUMBNAIL_DIR
+    werden beim ersten Zugriff übernommen.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        variant (str): Breite/Format-Variante (None = Original)
+        version (str): Erwartete Dateiversion (abweichend = veraltet)
+    
+    Returns:
+        bytes|None: Thumbnail-Daten oder None
+    """
+    if variant:
+        return thumbnail_store_get_by_key(get_thumbnail_key(filepath, variant), version=version)
+    return thumbnail_store_get_by_key(get_thumbnail_key(filepath), filepath, version)
+
+def thumbnail_store_get_by_key(key, filepath=None, version=None):
+    """Liest ein Thumbnail per Schlüssel (filepath nur für den Import alter Dateien)."""
+    init_thumbnail_store()
+    now = time.time()
+    
+    try:
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute("""
+                SELECT COALESCE(c.data, t.data), t.last_access, t.version
+                FROM thumbnails t LEFT JOIN cover_images c ON c.hash = t.cover_hash
+                WHERE t.key = ?
+            """, (key,))
+            row = cursor.fetchone()
+            if row and row[1] < now - THUMBNAIL_ACCESS_RESOLUTION:
+                cursor.execute("UPDATE thumbnails SET last_access = ? WHERE key = ?", (now, key))
+    except sqlite3.Error as e:
+        print(f"⚠️ Thumbnail-Speicher Lesefehler: {e}")
+        return None
+    
+    if row and row[0]:
+        # Datei wurde ersetzt: veraltetes Thumbnail wird beim Neuerzeugen überschrieben
+        if version and row[2] != version:
+            return None
+        return bytes(row[0])
+    
+    # Altes Einzel-JPEG übernehmen
+    legacy_path = os.path.join(THUMBNAIL_DIR, f'{key}.jpg')
+    if filepath and os.path.isfile(legacy_path):
+        try:
+            with open(legacy_path, 'rb') as f:
+                data = f.read()
+            os.remove(legacy_path)
+            if len(data) > 100:
+                thumbnail_store_put(filepath, data, version=version)
+                return data
+        except OSError:
+            pass
+    return None
+
+def thumbnail_store_contains(filepath, variant=None):
+    """Prüft ob ein Thumbnail (bzw. eine Variante) im Speicher liegt (ohne last_access zu ändern)."""
+    init_thumbnail_store()
+    try:
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute("SELECT 1 FROM thumbnails WHERE key = ?", (get_thumbnail_key(filepath, variant),))
+            return cursor.fetchone() is not None
+    except sqlite3.Error:
+        return False
+
+def thumbnail_store_cached_versions(filepaths):
+    """
+    Liefert für mehrere Dateien die Version des gespeicherten Original-Thumbnails.
+    
+    Args:
+        filepaths (list): Original-Dateipfade
+    
+    Returns:
+        dict: {filepath: version} nur für vorhandene Thumbnails
+    """
+    init_thumbnail_store()
+    keys = [get_thumbnail_key(fp) for fp in filepaths]
+    versions = {}
+    try:
+        with ThumbnailDBConnection() as cursor:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                cursor.execute(
+                    f"SELECT filepath, version FROM thumbnails WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                versions.update(cursor.fetchall())
+    except sqlite3.Error as e:
+        print(f"⚠️ Thumbnail-Speicher Lesefehler: {e}")
+    return versions
+
+def thumbnail_store_put(filepath, data, variant=None, version=None):
+    """
+    Speichert ein Thumbnail und verdrängt bei Überschreitung des Budgets
+    die am längsten nicht abgerufenen Einträge.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        data (bytes): Thumbnail-Daten
+        variant (str): Breite/Format-Variante (None = Original)
+        version (str): Dateiversion beim Erzeugen
+    """
+    global thumbnail_store_bytes
+    
+    init_thumbnail_store()
+    key = get_thumbnail_key(filepath, variant)
+    now = time.time()
+    
+    with thumbnail_store_lock:
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute("SELECT size FROM thumbnails WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            cursor.execute(
+                "INSERT OR REPLACE INTO thumbnails (key, filepath, data, size, created, last_access, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, filepath, sqlite3.Binary(data), len(data), now, now, version)
+            )
+        thumbnail_store_bytes += len(data) - (row[0] if row else 0)
+        
+        budget = get_thumbnail_store_budget()
+        if thumbnail_store_bytes > budget:
+            evict_thumbnails(int(budget * THUMBNAIL_EVICT_TARGET))
+
+def thumbnail_store_link_cover(filepath, cover_hash, variant=None, version=None):
+    """
+    Verknüpft ein Thumbnail mit einem geteilten Cover aus cover_images.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        cover_hash (str): Schlüssel des Covers
+        variant (str): Breite/Format-Variante (None = Original)
+        version (str): Dateiversion beim Erzeugen
+    """
+    global thumbnail_store_bytes
+    
+    init_thumbnail_store()
+    key = get_thumbnail_key(filepath, variant)
+    now = time.time()
+    
+    with thumbnail_store_lock:
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute("SELECT size FROM thumbnails WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            cursor.execute(
+                "INSERT OR REPLACE INTO thumbnails "
+                "(key, filepath, data, size, created, last_access, version, cover_hash) "
+                "VALUES (?, ?, X'', 0, ?, ?, ?, ?)",
+                (key, filepath, now, now, version, cover_hash)
+            )
+        thumbnail_store_bytes -= row[0] if row else 0
+        
+        budget = get_thumbnail_store_budget()
+        if thumbnail_store_bytes > budget:
+            evict_thumbnails(int(budget * THUMBNAIL_EVICT_TARGET))
+
+def thumbnail_store_cover_hash(filepath):
+    """Liefert den Cover-Schlüssel eines Thumbnails (None = eigenes Bild)."""
+    init_thumbnail_store()
+    with ThumbnailDBConnection() as cursor:
+        cursor.execute("SELECT cover_hash FROM thumbnails WHERE key = ?", (get_thumbnail_key(filepath),))
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+def cover_store_get(cover_hash):
+    """Liest ein geteiltes Cover (None falls nicht vorhanden)."""
+    init_thumbnail_store()
+    with ThumbnailDBConnection() as cursor:
+        cursor.execute("SELECT data FROM cover_images WHERE hash = ?", (cover_hash,))
+        row = cursor.fetchone()
+    return bytes(row[0]) if row else None
+
+def cover_store_put(cover_hash, data):
+    """
+    Speichert ein geteiltes Cover. Die Budget-Prüfung erfolgt beim
+    Verknüpfen, damit ein noch unverknüpftes Cover nicht sofort verdrängt wird.
+    """
+    global thumbnail_store_bytes
+    
+    init_thumbnail_store()
+    with thumbnail_store_lock:
+        with ThumbnailDBConnection() as cursor:
+            cursor.execute(
+                "INSERT OR IGNORE INTO cover_images (hash, data, size, created) VALUES (?, ?, ?, ?)",
+                (cover_hash, sqlite3.Binary(data), len(data), time.time())
+            )
+            if cursor.rowcount:
+                thumbnail_store_bytes += len(data)
+
+def evict_thumbnails(target_bytes):
+    """
+    Löscht Thumbnails nach last_access bis target_bytes erreicht ist.
+    Muss mit gehaltenem thumbnail_store_lock aufgerufen werden.
+    """
+    global thumbnail_store_bytes
+    
+    evicted = 0
+    with ThumbnailDBConnection() as cursor:
+        # Laufende Summe statt voller SUM-Abfragen pro Block
+        store_bytes = thumbnail_store_bytes
+        while store_bytes > target_bytes:
+            cursor.execute("SELECT key, size, cover_hash FROM thumbnails ORDER BY last_access LIMIT 50")
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            batch = []
+            cover_hashes = set()
+            for key, size, cover_hash in rows:
+                batch.append((key,))
+                store_bytes -= size or 0
+                if cover_hash:
+                    cover_hashes.add(cover_hash)
+                if store_bytes <= target_bytes:
+                    break
+            cursor.executemany("DELETE FROM thumbnails WHERE key = ?", batch)
+            evicted += len(batch)
+            # Verknüpfte Tracks belegen selbst 0 Bytes - Platz wird erst frei,
+            # wenn das letzte Thumbnail eines Covers verdrängt ist (Index-Abfrage
+            # nur für die Cover dieses Blocks)
+            for cover_hash in cover_hashes:
+                cursor.execute("SELECT 1 FROM thumbnails WHERE cover_hash = ? LIMIT 1", (cover_hash,))
+                if cursor.fetchone():
+                    continue
+                cursor.execute("SELECT size FROM cover_images WHERE hash = ?", (cover_hash,))
+                row = cursor.fetchone()
+                if row:
+                    cursor.execute("DELETE FROM cover_images WHERE hash = ?", (cover_hash,))
+                    store_bytes -= row[0] or 0
+        
+        if evicted:
+            # Einmal am Ende abgleichen (verwaiste Cover, exakte Summe)
+            purge_orphan_covers(cursor)
+            thumbnail_store_bytes = get_thumbnail_store_bytes(cursor)
+    
+    if evicted:
+        print(f"🗑️ Thumbnail-Speicher: {evicted} alte Thumbnails verdrängt")
+
+def invalidate_thumbnails(prefix=None, category=None):
+    """
+    Entfernt Thumbnails gezielt (ohne Argumente: alle).
+    
+    Args:
+        prefix (str): Nur Dateien unterhalb dieses Pfads
+        category (str): Nur Dateien dieser Kategorie (laut Hierarchie-Cache)
+    
+    Returns:
+        int: Anzahl gelöschter Thumbnails
+    """
+    global thumbnail_store_bytes
+    
+    init_thumbnail_store()
+    deleted = 0
+    
+    with thumbnail_store_lock:
+        with ThumbnailDBConnection() as cursor:
+            if category:
+                with HierarchyDBConnection() as hcursor:
+                    hcursor.execute(
+                        "SELECT filepath FROM hierarchy_cache WHERE normalized_category = ?",
+                        (normalize_category(category),)
+                    )
+                    filepaths = [(row[0],) for row in hcursor.fetchall()
+                                 if not prefix or row[0].startswith(prefix)]
+                # Über filepath löschen, damit auch alle Varianten entfallen
+                for i in range(0, len(filepaths), 500):
+                    cursor.executemany("DELETE FROM thumbnails WHERE filepath = ?", filepaths[i:i + 500])
+                    deleted += cursor.rowcount
+                thumbnail_memory_invalidate(filepaths={fp for (fp,) in filepaths})
+            elif prefix:
+                # Bereichsabfrage nutzt den filepath-Index
+                cursor.execute(
+                    "DELETE FROM thumbnails WHERE filepath >= ? AND filepath < ?",
+                    (prefix, prefix + '\U0010ffff')
+                )
+                deleted = cursor.rowcount
+                thumbnail_memory_invalidate(prefix=prefix)
+            else:
+                cursor.execute("DELETE FROM thumbnails")
+                deleted = cursor.rowcount
+                thumbnail_memory_invalidate()
+            
+            purge_orphan_covers(cursor)
+            thumbnail_store_bytes = get_thumbnail_store_bytes(cursor)
+    
+    # Ordner-Cover neu suchen (cover.jpg kann ersetzt oder entfernt worden sein)
+    folder_cover_cache.clear()
+    return deleted
+
+def get_thumbnail_store_stats():
+    """Liefert Anzahl, geteilte Cover, belegte Bytes und Budget des Thumbnail-Speichers."""
+    init_thumbnail_store()
+    with ThumbnailDBConnection() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM thumbnails")
+        count = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM cover_images")
+        covers = cursor.fetchone()[0]
+    return {
+        'count': count,
+        'covers': covers,
+        'bytes': thumbnail_store_bytes,
+        'budget': get_thumbnail_store_budget()
+    }
+
+# -----------------------------------------------------------------------------
+# THUMBNAIL-RAM-CACHE (HEISSE THUMBNAILS)
+# -----------------------------------------------------------------------------
+
+# Grid-Neuaufbau und Blättern fragen dieselben Thumbnails immer wieder an.
+# Ein Eintrag hier spart Blob-Lookup, Dekodieren und Skalieren. Neben den
+# Bytes wird das Ergebnis der Prüfung (Datei existiert, ist indexiert)
+# gespeichert: es gilt THUMBNAIL_MEMORY_VALIDATE_TTL Sekunden, solange sich
+# die Datenbanken nicht ändern (get_catalog_source_version) und die Anfrage
+# keine andere ?v= nennt. Danach wird wieder voll geprüft; mark_file_missing
+# und invalidate_thumbnails entfernen Einträge sofort.
+# Schlüssel ist der Dateipfad (Medien-Identität) plus die ausgelieferte
+# Variante; die Dateiversion (stat) wird mitgespeichert.
+THUMBNAIL_MEMORY_VALIDATE_TTL = 30   # Sekunden, die eine bestandene Prüfung gilt
+
+thumbnail_memory_cache = OrderedDict()  # {(filepath, variant): (version, bytes, (Katalogversion, Prüfzeit) | None)}
+thumbnail_memory_bytes = 0
+thumbnail_memory_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+thumbnail_memory_lock = threading.Lock()
+
+def get_thumbnail_memory_budget():
+    """Byte-Budget des RAM-Caches aus den Einstellungen."""
+    return max(0, int(get_setting('thumbnail_memory_mb', 64))) * 1024 * 1024
+
+def thumbnail_memory_get_validated(filepath, variant=None, url_version=None):
+    """
+    Liefert Thumbnail-Bytes ohne erneute Prüfung, solange die letzte
+    bestandene Prüfung gilt (TTL, unveränderte Datenbanken, gleiche ?v=).
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        variant (str): Breite/Format-Variante (None = Original)
+        url_version (str): ?v= der Anfrage (abweichend = Datei geändert)
+    
+    Returns:
+        tuple|None: (bytes, version) oder None (→ volle Prüfung)
+    """
+    catalog_version = get_catalog_source_version()
+    if catalog_version is None:
+        return None
+    with thumbnail_memory_lock:
+        entry = thumbnail_memory_cache.get((filepath, variant))
+        if entry is None or entry[2] is None:
+            return None
+        version, data, (checked_version, checked_at) = entry
+        if checked_version != catalog_version or time.time() - checked_at > THUMBNAIL_MEMORY_VALIDATE_TTL:
+            return None
+        if url_version and url_version != version:
+            return None
+        thumbnail_memory_cache.move_to_end((filepath, variant))
+        thumbnail_memory_stats['hits'] += 1
+        return data, version
+
+def thumbnail_memory_get(filepath, variant=None, version=None, checked=None):
+    """
+    Liefert geprüfte Thumbnail-Bytes aus dem RAM-Cache.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        variant (str): Breite/Format-Variante (None = Original)
+        version (str): Aktuelle Dateiversion (abweichend = veraltet)
+        checked: Katalogversion einer gerade bestandenen Prüfung (erneuert den Prüfstempel)
+    
+    Returns:
+        bytes|None: Thumbnail-Daten oder None
+    """
+    with thumbnail_memory_lock:
+        entry = thumbnail_memory_cache.get((filepath, variant))
+        if entry is None or (version and entry[0] != version):
+            thumbnail_memory_stats['misses'] += 1
+            return None
+        if checked is not None:
+            entry = thumbnail_memory_cache[(filepath, variant)] = (entry[0], entry[1], (checked, time.time()))
+        thumbnail_memory_cache.move_to_end((filepath, variant))
+        thumbnail_memory_stats['hits'] += 1
+        return entry[1]
+
+def thumbnail_memory_put(filepath, data, variant=None, version=None, checked=None):
+    """
+    Legt geprüfte Thumbnail-Bytes im RAM-Cache ab (LRU nach Bytes).
+    
+    Args:
+        filepath (str): Original-Dateipfad (bereits validiert)
+        data (bytes): Thumbnail-Daten
+        variant (str): Breite/Format-Variante (None = Original)
+        version (str): Dateiversion bei der Prüfung
+        checked: Katalogversion der Prüfung (None = bei jeder Anfrage neu prüfen)
+    """
+    global thumbnail_memory_bytes
+    
+    budget = get_thumbnail_memory_budget()
+    if len(data) > budget:
+        return
+    
+    with thumbnail_memory_lock:
+        old = thumbnail_memory_cache.pop((filepath, variant), None)
+        if old:
+            thumbnail_memory_bytes -= len(old[1])
+        thumbnail_memory_cache[(filepath, variant)] = (version, data, (checked, time.time()) if checked else None)
+        thumbnail_memory_bytes += len(data)
+        
+        while thumbnail_memory_bytes > budget:
+            _, (_, evicted, _) = thumbnail_memory_cache.popitem(last=False)
+            thumbnail_memory_bytes -= len(evicted)
+            thumbnail_memory_stats['evictions'] += 1
+
+def thumbnail_memory_invalidate(prefix=None, filepaths=None):
+    """
+    Entfernt Einträge aus dem RAM-Cache (ohne Argumente: alle).
+    
+    Args:
+        prefix (str): Nur Dateien unterhalb dieses Pfads
+        filepaths (set): Nur diese Dateien
+    """
+    global thumbnail_memory_bytes
+    
+    with thumbnail_memory_lock:
+        if prefix is None and filepaths is None:
+            thumbnail_memory_cache.clear()
+            thumbnail_memory_bytes = 0
+            return
+        for entry, (_, data, _) in list(thumbnail_memory_cache.items()):
+            filepath = entry[0]
+            if (prefix is not None and filepath.startswith(prefix)) or (filepaths is not None and filepath in filepaths):
+                del thumbnail_memory_cache[entry]
+                thumbnail_memory_bytes -= len(data)
+
+def get_thumbnail_memory_stats():
+    """
+    Kennzahlen des RAM-Caches.
+    
+    Returns:
+        dict: entries, bytes, budget, hits, misses, evictions, hit_rate
+    """
+    with thumbnail_memory_lock:
+        hits = thumbnail_memory_stats['hits']
+        misses = thumbnail_memory_stats['misses']
+        return {
+            'entries': len(thumbnail_memory_cache),
+            'bytes': thumbnail_memory_bytes,
+            'budget': get_thumbnail_memory_budget(),
+            'hits': hits,
+            'misses': misses,
+            'evictions': thumbnail_memory_stats['evictions'],
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+# -----------------------------------------------------------------------------
+# THUMBNAIL-VARIANTEN (BREITEN + FORMATE)
+# -----------------------------------------------------------------------------
+
+# Aus dem Original werden verkleinerte Varianten in wenigen festen Breiten
+# erzeugt und als WebP/AVIF ausgeliefert, wenn der Browser es laut Accept-Header
+# kann. Varianten liegen mit eigenem Schlüssel neben dem Original im Speicher.
+THUMBNAIL_WIDTHS = (160, 320, 480)
+THUMBNAIL_SIZES = '(max-width: 768px) 160px, 200px'  # Kartenbreite im Grid (für srcset)
+THUMBNAIL_VARIANT_QUALITY = {'jpeg': 82, 'webp': 78, 'avif': 55}
+
+@lru_cache(maxsize=None)
+def get_supported_thumbnail_formats():
+    """Moderne Formate, die das installierte Pillow schreiben kann (bevorzugte zuerst)."""
+    Image.init()
+    return tuple(fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE)
+
+def negotiate_thumbnail_format(accept_header):
+    """
+    Wählt das Ausgabeformat anhand des Accept-Headers.
+    
+    Args:
+        accept_header (str): Accept-Header der Anfrage
+    
+    Returns:
+        str: 'avif', 'webp' oder 'jpeg'
+    """
+    accept = (accept_header or '').lower()
+    for fmt in get_supported_thumbnail_formats():
+        if f'image/{fmt}' in accept:
+            return fmt
+    return 'jpeg'
+
+def snap_thumbnail_width(value):
+    """Rundet eine angefragte Breite auf die nächste feste Variante auf (None = Originalgröße)."""
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return None
+    if width <= 0:
+        return None
+    for candidate in THUMBNAIL_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+def get_thumbnail_variant_name(width, fmt):
+    """Name der Variante im Speicher, z.B. '320.webp' (None = unverändertes Original)."""
+    if not width and fmt == 'jpeg':
+        return None
+    return f'{width or 0}.{fmt}'
+
+def render_thumbnail_variant(data, width, fmt):
+    """
+    Skaliert ein Original-Thumbnail und kodiert es im Zielformat.
+    
+    Args:
+        data (bytes): Original-Thumbnail
+        width (int|None): Zielbreite (nur verkleinern)
+        fmt (str): 'jpeg', 'webp' oder 'avif'
+    
+    Returns:
+        bytes: Kodierte Variante
+    """
+    img = Image.open(io.BytesIO(data))
+    if width and img.width > width:
+        img.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+    elif fmt == 'jpeg':
+        return data
+    
+    if fmt == 'jpeg' or img.mode not in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+    else:
+        img = img.convert('RGBA')
+    
+    output = io.BytesIO()
+    img.save(output, fmt.upper(), quality=THUMBNAIL_VARIANT_QUALITY[fmt])
+    return output.getvalue()
+
+def get_thumbnail_variant(filepath, width, fmt, timeout=THUMBNAIL_WAIT_TIMEOUT, version=None):
+    """
+    Liefert ein Thumbnail in Breite/Format; Varianten werden bei Bedarf aus
+    dem Original erzeugt und gespeichert.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        width (int|None): Zielbreite aus THUMBNAIL_WIDTHS
+        fmt (str): 'jpeg', 'webp' oder 'avif'
+        timeout (float): Max. Wartezeit auf das Original
+        version (str): Aktuelle Dateiversion (veraltete Einträge neu erzeugen)
+    
+    Returns:
+        bytes|None: Thumbnail-Daten oder None
+    """
+    variant = get_thumbnail_variant_name(width, fmt)
+    if variant:
+        data = thumbnail_store_get(filepath, variant, version)
+        if data:
+            return data
+    
+    original = generate_or_get_thumbnail(filepath, timeout, version)
+    if not original or not variant:
+        return original
+    
+    # Varianten geteilter Cover werden ebenfalls nur einmal pro Bild erzeugt
+    cover_hash = thumbnail_store_cover_hash(filepath)
+    shared_hash = f'{cover_hash}_{variant}' if cover_hash else None
+    data = cover_store_get(shared_hash) if shared_hash else None
+    
+    if data is None:
+        try:
+            data = render_thumbnail_variant(original, width, fmt)
+        except Exception as e:
+            print(f"⚠️ Thumbnail-Variante {variant} fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+            return original
+        if shared_hash:
+            cover_store_put(shared_hash, data)
+    
+    if shared_hash:
+        thumbnail_store_link_cover(filepath, shared_hash, variant, version)
+    else:
+        thumbnail_store_put(filepath, data, variant, version)
+    return data
+
+# -----------------------------------------------------------------------------
+# THUMBNAIL-ATLAS (EIN BILD PRO GRID-SEITE)
+# -----------------------------------------------------------------------------
+
+# Eine Grid-Seite zeigt 50 Karten und löst damit 50 /thumbnail-Anfragen aus.
+# /api/media liefert stattdessen ein Atlas-Layout für alle bereits gespeicherten
+# Thumbnails der Seite; /thumbnail_atlas setzt sie zu einem Bild zusammen.
+# Der Hash über Pfade + Versionen identifiziert den Seiteninhalt, das fertige
+# Bild liegt unter diesem Hash im Thumbnail-Speicher.
+THUMBNAIL_ATLAS_TILE_WIDTH = 200    # Kartengröße im Grid (Desktop)
+THUMBNAIL_ATLAS_TILE_HEIGHT = 260
+THUMBNAIL_ATLAS_COLUMNS = 10
+THUMBNAIL_ATLAS_MIN_TILES = 4       # Darunter lohnt sich kein Atlas
+THUMBNAIL_ATLAS_LAYOUTS_MAX = 500
+
+thumbnail_atlas_layouts = OrderedDict()  # {hash: [(filepath, version), ...]}
+thumbnail_atlas_lock = threading.Lock()
+
+def get_thumbnail_atlas_layout(media_list):
+    """
+    Erstellt das Atlas-Layout einer Seite aus den bereits gespeicherten Thumbnails.
+    
+    Args:
+        media_list (list): Medien-Dicts der Seite (filepath, thumbnail_version aus
+                           add_thumbnail_versions)
+    
+    Returns:
+        dict|None: {'url', 'columns', 'rows', 'tiles': {filepath: index}} oder None
+    """
+    if not get_setting('thumbnail_atlas_enabled', True):
+        return None
+    
+    cached = thumbnail_store_cached_versions([m.get('filepath', '') for m in media_list])
+    entries = []
+    for media in media_list:
+        filepath = media.get('filepath', '')
+        # Gleiche Versionsquelle (stat) wie handle_thumbnail_request
+        version = (media['thumbnail_version'] if 'thumbnail_version' in media
+                   else get_file_thumbnail_version(filepath))
+        if version and filepath in cached and cached[filepath] in (version, None):
+            entries.append((filepath, version))
+    if len(entries) < THUMBNAIL_ATLAS_MIN_TILES:
+        return None
+    
+    digest = hashlib.sha1()
+    digest.update(f'{THUMBNAIL_ATLAS_TILE_WIDTH}x{THUMBNAIL_ATLAS_TILE_HEIGHT}'.encode('utf-8'))
+    for filepath, version in entries:
+        digest.update(f'\0{filepath}\0{version}'.encode('utf-8'))
+    atlas_hash = digest.hexdigest()[:20]
+    
+    with thumbnail_atlas_lock:
+        thumbnail_atlas_layouts[atlas_hash] = entries
+        thumbnail_atlas_layouts.move_to_end(atlas_hash)
+        while len(thumbnail_atlas_layouts) > THUMBNAIL_ATLAS_LAYOUTS_MAX:
+            thumbnail_atlas_layouts.popitem(last=False)
+    
+    columns = min(THUMBNAIL_ATLAS_COLUMNS, len(entries))
+    return {
+        'url': f'/thumbnail_atlas?h={atlas_hash}',
+        'columns': columns,
+        'rows': (len(entries) + columns - 1) // columns,
+        'tiles': {filepath: index for index, (filepath, _) in enumerate(entries)}
+    }
+
+def render_thumbnail_atlas(entries, fmt):
+    """
+    Setzt die Thumbnails einer Seite zu einem Bild zusammen (zugeschnitten wie
+    object-fit: cover). Fehlende Thumbnails bleiben als graue Kachel frei.
+    
+    Args:
+        entries (list): [(filepath, version), ...] in Kachel-Reihenfolge
+        fmt (str): 'jpeg', 'webp' oder 'avif'
+    
+    Returns:
+        bytes: Kodierter Atlas
+    """
+    columns = min(THUMBNAIL_ATLAS_COLUMNS, len(entries))
+    rows = (len(entries) + columns - 1) // columns
+    tile_size = (THUMBNAIL_ATLAS_TILE_WIDTH, THUMBNAIL_ATLAS_TILE_HEIGHT)
+    atlas = Image.new('RGB', (columns * tile_size[0], rows * tile_size[1]), (34, 34, 34))
+    
+    for index, (filepath, version) in enumerate(entries):
+        data = thumbnail_store_get(filepath, None, version)
+        if not data:
+            continue
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.draft('RGB', tile_size)
+                tile = ImageOps.fit(img.convert('RGB'), tile_size, Image.Resampling.LANCZOS)
+            atlas.paste(tile, ((index % columns) * tile_size[0], (index // columns) * tile_size[1]))
+        except Exception as e:
+            print(f"⚠️ Atlas-Kachel fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+    
+    output = io.BytesIO()
+    atlas.save(output, fmt.upper(), quality=THUMBNAIL_VARIANT_QUALITY[fmt])
+    return output.getvalue()
+
+def get_thumbnail_atlas(atlas_hash, fmt):
+    """
+    Liefert den Atlas einer Seite (RAM-Cache → Speicher → neu zusammensetzen).
+    
+    Args:
+        atlas_hash (str): Hash aus get_thumbnail_atlas_layout
+        fmt (str): 'jpeg', 'webp' oder 'avif'
+    
+    Returns:
+        bytes|None: Atlas oder None bei unbekanntem Hash
+    """
+    key = f'atlas:{atlas_hash}'
+    variant = f'atlas.{fmt}'
+    data = thumbnail_memory_get(key, variant)
+    if data:
+        return data
+    
+    data = thumbnail_store_get_by_key(get_thumbnail_key(key, variant))
+    if not data:
+        with thumbnail_atlas_lock:
+            entries = thumbnail_atlas_layouts.get(atlas_hash)
+        if not entries:
+            return None
+        start_time = time.time()
+        data = render_thumbnail_atlas(entries, fmt)
+        thumbnail_store_put(key, data, variant)
+        print(f"🧩 Thumbnail-Atlas erstellt: {len(entries)} Kacheln, {len(data) // 1024} KB, "
+              f"{time.time() - start_time:.2f}s")
+    
+    thumbnail_memory_put(key, data, variant)
+    return data
+
+# -----------------------------------------------------------------------------
+# GETEILTE COVER-ART (ALBEN + STAFFELN)
+# -----------------------------------------------------------------------------
+
+# Alle Tracks eines Albums haben meist dasselbe Cover. Statt pro Track zu
+# dekodieren und zu speichern, wird jedes Bild einmal abgelegt (Ordner-Cover
+# nach Pfad+mtime, eingebettete Bilder nach Inhalts-Hash) und die Tracks
+# verweisen darauf.
+COVER_EXTENSIONS = (".mp3", ".flac", ".ogg", ".m4a", ".aac", ".wav", ".wma")
+COVER_FILENAMES = ('cover.jpg', 'folder.jpg', 'front.jpg', 'cover.png', 'folder.png', 'albumart.jpg')
+FOLDER_COVER_CACHE_MAX = 5000
+COVER_LOCK_STRIPES = 16
+
+folder_cover_cache = {}  # {ordner: cover_pfad oder None}
+cover_locks = [threading.Lock() for _ in range(COVER_LOCK_STRIPES)]
+
+def find_folder_cover(folder):
+    """
+    Sucht ein Ordner-Cover (cover.jpg, folder.jpg, ...) - ein listdir pro Ordner.
+    
+    Args:
+        folder (str): Album-/Staffel-Ordner
+    
+    Returns:
+        str|None: Pfad zum Cover oder None
+    """
+    if folder in folder_cover_cache:
+        return folder_cover_cache[folder]
+    
+    cover_path = None
+    try:
+        names = {name.lower(): name for name in os.listdir(folder)}
+        for candidate in COVER_FILENAMES:
+            if candidate in names:
+                cover_path = os.path.join(folder, names[candidate])
+                break
+    except OSError:
+        pass
+    
+    if len(folder_cover_cache) >= FOLDER_COVER_CACHE_MAX:
+        folder_cover_cache.clear()
+    folder_cover_cache[folder] = cover_path
+    return cover_path
+
+def get_shared_cover(filepath):
+    """
+    Liefert das geteilte Cover einer Audio-Datei und legt es bei Bedarf an.
+    Ordner-Cover haben Vorrang vor eingebetteten Bildern.
+    
+    Args:
+        filepath (str): Pfad zur Audio-Datei
+    
+    Returns:
+        tuple: (cover_hash, bytes) oder (None, None)
+    """
+    raw = None
+    folder_cover = find_folder_cover(os.path.dirname(filepath))
+    if folder_cover:
+        try:
+            st = os.stat(folder_cover)
+            identity = f'{folder_cover}|{st.st_size}|{st.st_mtime}'
+            cover_hash = 'folder-' + hashlib.md5(identity.encode('utf-8')).hexdigest()
+        except OSError:
+            folder_cover = None
+    
+    if not folder_cover:
+        raw = read_embedded_cover(filepath)
+        if not raw:
+            return None, None
+        cover_hash = hashlib.sha1(raw).hexdigest()
+    
+    # Parallele Tracks desselben Albums warten auf die erste Dekodierung
+    with cover_locks[int(cover_hash[-2:], 16) % COVER_LOCK_STRIPES]:
+        data = cover_store_get(cover_hash)
+        if data is None:
+            try:
+                if raw is None:
+                    with open(folder_cover, 'rb') as f:
+                        raw = f.read()
+                data = encode_cover_image(raw)
+            except OSError as e:
+                print(f"⚠️ Ordner-Cover nicht lesbar: {e}")
+                return None, None
+            cover_store_put(cover_hash, data)
+            print(f"🎨 Neues Cover gespeichert für: {os.path.basename(os.path.dirname(filepath))}")
+    
+    return cover_hash, data
+
+# -----------------------------------------------------------------------------
+# TRICKPLAY (SPRITE-SHEETS + WEBVTT)
+# -----------------------------------------------------------------------------
+
+# Vorschaubilder für die Zeitleiste: ein Sprite-Sheet mit kleinen Frames in
+# festem Abstand plus WebVTT-Spur mit #xywh-Koordinaten. Beides entsteht in
+# einem ffmpeg-Durchlauf (nur Keyframes dekodiert) im Hintergrund und liegt
+# als Variante im Thumbnail-Speicher. Die Thumbnail-Vorgenerierung reiht jedes
+# Video ein; ein Abruf im Player zieht das Video nach vorne.
+TRICKPLAY_TILE_WIDTH = 160
+TRICKPLAY_TILE_HEIGHT = 90
+TRICKPLAY_COLUMNS = 10
+TRICKPLAY_MAX_TILES = 200      # Ein Sheet, max. 20 Zeilen
+TRICKPLAY_MIN_INTERVAL = 10    # Sekunden zwischen zwei Frames (mindestens)
+TRICKPLAY_TIMEOUT = 600
+TRICKPLAY_SPRITE = 'trickplay.jpg'
+TRICKPLAY_VTT = 'trickplay.vtt'
+
+trickplay_queue = deque()
+trickplay_queued = set()
+trickplay_urgent = set()       # Im Player angefragt (warten nicht auf Live-Streams)
+trickplay_stats = {'done': 0, 'failed': 0}
+trickplay_condition = threading.Condition()
+trickplay_thread = None
+
+def get_trickplay_layout(duration):
+    """
+    Frame-Abstand und Raster für eine Videodauer.
+    
+    Args:
+        duration (float): Dauer in Sekunden
+    
+    Returns:
+        tuple: (interval, tiles, rows)
+    """
+    interval = max(TRICKPLAY_MIN_INTERVAL, duration / TRICKPLAY_MAX_TILES)
+    tiles = max(1, min(TRICKPLAY_MAX_TILES, int(-(-duration // interval))))
+    rows = -(-tiles // TRICKPLAY_COLUMNS)
+    return interval, tiles, rows
+
+def format_vtt_timestamp(seconds):
+    """Formatiert Sekunden als WebVTT-Zeitstempel (hh:mm:ss.mmm)."""
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}'
+
+def build_trickplay_vtt(sprite_url, duration, interval, tiles):
+    """
+    Erzeugt die WebVTT-Spur zum Sprite-Sheet.
+    
+    Args:
+        sprite_url (str): URL des Sprite-Sheets
+        duration (float): Videodauer
+        interval (float): Abstand der Frames
+        tiles (int): Anzahl Frames
+    
+    Returns:
+        str: WebVTT-Text
+    """
+    lines = ['WEBVTT', '']
+    for index in range(tiles):
+        start = index * interval
+        end = min(duration, start + interval)
+        x = (index % TRICKPLAY_COLUMNS) * TRICKPLAY_TILE_WIDTH
+        y = (index // TRICKPLAY_COLUMNS) * TRICKPLAY_TILE_HEIGHT
+        lines.append(f'{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}')
+        lines.append(f'{sprite_url}#xywh={x},{y},{TRICKPLAY_TILE_WIDTH},{TRICKPLAY_TILE_HEIGHT}')
+        lines.append('')
+    return '\n'.join(lines)
+
+def generate_trickplay(filepath):
+    """
+    Erzeugt Sprite-Sheet und WebVTT für ein Video (ein ffmpeg-Durchlauf).
+    
+    Args:
+        filepath (str): Pfad zum Video
+    
+    Returns:
+        bool: Erfolg
+    """
+    version = get_file_thumbnail_version(filepath)
+    duration = get_media_duration(filepath)
+    if not version or duration <= 0:
+        print(f"⚠️ Trickplay: Dauer unbekannt für {os.path.basename(filepath)}")
+        return False
+    
+    interval, tiles, rows = get_trickplay_layout(duration)
+    video_filter = (
+        f"fps=1/{interval:.3f},"
+        f"scale={TRICKPLAY_TILE_WIDTH}:{TRICKPLAY_TILE_HEIGHT}:force_original_aspect_ratio=decrease,"
+        f"pad={TRICKPLAY_TILE_WIDTH}:{TRICKPLAY_TILE_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+        f"tile={TRICKPLAY_COLUMNS}x{rows}"
+    )
+    cmd = [
+        FFMPEG_EXECUTABLE,
+        "-hide_banner", "-loglevel", "error",
+        "-skip_frame", "nokey",
+        "-i", filepath,
+        "-an", "-sn", "-dn",
+        "-vf", video_filter,
+        "-frames:v", "1",
+        "-q:v", "5",
+        "-c:v", "mjpeg",
+        "-f", "image2pipe",
+        "pipe:1"
+    ]
+    
+    start_time = time.time()
+    try:
+        with FFmpegProcess(cmd, timeout=TRICKPLAY_TIMEOUT, background=True) as process:
+            sprite = process.stdout.read()
+    except Exception as e:
+        print(f"⚠️ Trickplay fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+        return False
+    
+    if len(sprite) < 100 or get_image_mime_type(sprite) != 'image/jpeg':
+        print(f"⚠️ Trickplay: kein Sprite-Sheet für {os.path.basename(filepath)}")
+        return False
+    
+    sprite_url = f'/trickplay.jpg?filepath={urllib.parse.quote(filepath, safe="")}&v={version}'
+    vtt = build_trickplay_vtt(sprite_url, duration, interval, tiles)
+    thumbnail_store_put(filepath, sprite, TRICKPLAY_SPRITE, version)
+    thumbnail_store_put(filepath, vtt.encode('utf-8'), TRICKPLAY_VTT, version)
+    print(f"🎞️ Trickplay erstellt: {os.path.basename(filepath)} "
+          f"({tiles} Frames à {interval:.0f}s, {len(sprite) / 1024:.0f} KB, {time.time() - start_time:.1f}s)")
+    return True
+
+def queue_trickplay(filepath, urgent=False):
+    """
+    Reiht ein Video für die Trickplay-Erzeugung ein (startet den Worker bei Bedarf).
+    
+    Args:
+        filepath (str): Pfad zum Video
+        urgent (bool): Im Player angefragt - vor die Vorgenerierung stellen
+    """
+    global trickplay_thread
+    
+    with trickplay_condition:
+        if filepath in trickplay_queued:
+            # Läuft gerade oder steht schon vorne
+            if not urgent or filepath in trickplay_urgent or filepath not in trickplay_queue:
+                return
+            trickplay_queue.remove(filepath)
+        trickplay_queued.add(filepath)
+        if urgent:
+            trickplay_urgent.add(filepath)
+            trickplay_queue.appendleft(filepath)
+        else:
+            trickplay_queue.append(filepath)
+        if trickplay_thread is None:
+            trickplay_thread = threading.Thread(target=trickplay_worker, daemon=True,
+                                                name='trickplay')
+            trickplay_thread.start()
+        trickplay_condition.notify()
+
+def trickplay_worker():
+    """Erzeugt Trickplay-Sheets nacheinander (ffmpeg mit niedriger Priorität)."""
+    while True:
+        with trickplay_condition:
+            while not trickplay_queue:
+                trickplay_condition.wait()
+            filepath = trickplay_queue[0]
+        
+        # Live-Streams haben Vorrang vor der Vorgenerierung (FFmpeg läuft ohnehin
+        # mit niedriger Priorität; angefragte Videos warten nicht)
+        if filepath not in trickplay_urgent and get_active_live_transcodes() > 0:
+            time.sleep(1)
+            continue
+        with trickplay_condition:
+            # Inzwischen kann ein dringenderes Video vorne stehen
+            if trickplay_queue and trickplay_queue[0] == filepath:
+                trickplay_queue.popleft()
+            else:
+                continue
+        
+        try:
+            success = generate_trickplay(filepath)
+        except Exception as e:
+            print(f"⚠️ Trickplay-Worker Fehler: {e}")
+            success = False
+        
+        with trickplay_condition:
+            trickplay_queued.discard(filepath)
+            trickplay_urgent.discard(filepath)
+        trickplay_stats['done' if success else 'failed'] += 1
+
+# -----------------------------------------------------------------------------
+# THUMBNAIL-VORGENERIERUNG (HINTERGRUND)
+# -----------------------------------------------------------------------------
+
+# Priorität der Vorgenerierung (kleiner = früher)
+THUMBNAIL_PRIORITY_PAGE = 0     # Aktuell angezeigte Seite
+THUMBNAIL_PRIORITY_RECENT = 1   # Zuletzt hinzugefügt
+THUMBNAIL_PRIORITY_LIBRARY = 2  # Restliche Bibliothek
+THUMBNAIL_PREGEN_RECENT = 500   # Anzahl "zuletzt hinzugefügt"
+THUMBNAIL_IMAGE_BATCH = THUMBNAIL_PREGEN_WORKERS  # Bilder gebündelt: je Worker eines, nichts wartet im Pool
+
+thumbnail_pregen_queue = []      # Heap: (priorität, nummer, filepath)
+thumbnail_pregen_queued = {}     # {filepath: priorität} - aktueller Eintrag pro Datei
+thumbnail_pregen_stats = {'done': 0, 'failed': 0, 'skipped': 0}
+thumbnail_pregen_condition = threading.Condition()
+thumbnail_pregen_counter = 0
+thumbnail_pregen_thread = None
+thumbnail_pregen_paused = False
+
+def queue_thumbnail_pregeneration(filepaths, priority=THUMBNAIL_PRIORITY_LIBRARY):
+    """
+    Reiht Dateien für die Vorgenerierung ein (bessere Priorität gewinnt).
+    
+    Args:
+        filepaths (iterable): Original-Dateipfade
+        priority (int): THUMBNAIL_PRIORITY_*
+    """
+    global thumbnail_pregen_counter
+    
+    with thumbnail_pregen_condition:
+        for filepath in filepaths:
+            current = thumbnail_pregen_queued.get(filepath)
+            if current is not None and current <= priority:
+                continue
+            thumbnail_pregen_queued[filepath] = priority
+            thumbnail_pregen_counter += 1
+            heapq.heappush(thumbnail_pregen_queue, (priority, thumbnail_pregen_counter, filepath))
+        thumbnail_pregen_condition.notify()
+
+def next_thumbnail_pregeneration():
+    """Wartet auf den nächsten Eintrag der Warteschlange (veraltete werden übersprungen)."""
+    with thumbnail_pregen_condition:
+        while True:
+            while not thumbnail_pregen_queue:
+                thumbnail_pregen_condition.wait()
+            priority, _, filepath = heapq.heappop(thumbnail_pregen_queue)
+            if thumbnail_pregen_queued.get(filepath) == priority:
+                del thumbnail_pregen_queued[filepath]
+                return filepath
+
+def take_image_pregeneration_batch(limit):
+    """
+    Entnimmt weitere Bild-Dateien, solange sie vorne in der Warteschlange
+    stehen (Priorität bleibt erhalten).
+    
+    Args:
+        limit (int): Max. Anzahl
+    
+    Returns:
+        list: Original-Dateipfade
+    """
+    batch = []
+    with thumbnail_pregen_condition:
+        while thumbnail_pregen_queue and len(batch) < limit:
+            priority, _, filepath = thumbnail_pregen_queue[0]
+            if thumbnail_pregen_queued.get(filepath) != priority:
+                heapq.heappop(thumbnail_pregen_queue)  # veraltet
+                continue
+            if os.path.splitext(filepath)[1].lower() not in IMAGE_THUMBNAIL_EXTENSIONS:
+                break
+            heapq.heappop(thumbnail_pregen_queue)
+            del thumbnail_pregen_queued[filepath]
+            batch.append(filepath)
+    return batch
+
+def thumbnail_pregeneration_worker():
+    """
+    Erzeugt Thumbnails im Hintergrund im eigenen Pool (Videos/Audio einzeln,
+    Bilder gebündelt - höchstens ein Bild je Pool-Worker). Der Request-Pool
+    des Grids bleibt dabei frei.
+    Hält ein CPU/IO-Budget ein (Anteil der Zeit mit aktiver Generierung,
+    je parallelem Job) und pausiert solange Live-Transcodes laufen.
+    """
+    global thumbnail_pregen_paused
+    
+    budget = min(1.0, max(0.05, get_setting('thumbnail_pregen_budget', 0.5)))
+    
+    while True:
+        filepath = next_thumbnail_pregeneration()
+        
+        # Live-Streams haben Vorrang
+        while get_active_live_transcodes() > 0:
+            thumbnail_pregen_paused = True
+            time.sleep(1)
+        thumbnail_pregen_paused = False
+        
+        # Zeitleisten-Vorschau gleich mit einreihen (eigener Worker)
+        if (os.path.splitext(filepath)[1].lower() in VIDEO_EXTENSIONS
+                and not thumbnail_store_contains(filepath, TRICKPLAY_VTT)):
+            queue_trickplay(filepath)
+        
+        filepaths = [filepath]
+        if os.path.splitext(filepath)[1].lower() in IMAGE_THUMBNAIL_EXTENSIONS:
+            filepaths += take_image_pregeneration_batch(THUMBNAIL_IMAGE_BATCH - 1)
+        
+        pending = []
+        for filepath in filepaths:
+            if thumbnail_store_contains(filepath):
+                thumbnail_pregen_stats['skipped'] += 1
+            else:
+                pending.append(filepath)
+        if not pending:
+            continue
+        
+        start_time = time.time()
+        futures = [(filepath, submit_thumbnail(filepath, background=True)) for filepath in pending]
+        for filepath, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"⚠️ Vorgenerierung fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+                result = None
+            
+            if result:
+                thumbnail_pregen_stats['done'] += 1
+            else:
+                thumbnail_pregen_stats['failed'] += 1
+        
+        # Budget: nach t Sekunden Arbeit mit n parallelen Jobs n * t * (1 - budget) / budget Sekunden Pause
+        elapsed = time.time() - start_time
+        time.sleep(len(pending) * elapsed * (1 - budget) / budget)
+
+def start_thumbnail_pregeneration():
+    """
+    Startet die Vorgenerierung für die gesamte Bibliothek:
+    zuerst zuletzt hinzugefügte Medien, dann der Rest.
+    """
+    global thumbnail_pregen_thread
+    
+    if thumbnail_pregen_thread is not None or not get_setting('thumbnail_pregen_enabled', True):
+        return
+    
+    try:
+        with MainDBConnection() as cursor:
+            cursor.execute("SELECT filepath FROM media_files WHERE filepath != '' ORDER BY last_modified DESC")
+            filepaths = [row[0] for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"⚠️ Thumbnail-Vorgenerierung konnte nicht starten: {e}")
+        return
+    
+    queue_thumbnail_pregeneration(filepaths[:THUMBNAIL_PREGEN_RECENT], THUMBNAIL_PRIORITY_RECENT)
+    queue_thumbnail_pregeneration(filepaths[THUMBNAIL_PREGEN_RECENT:], THUMBNAIL_PRIORITY_LIBRARY)
+    
+    thumbnail_pregen_thread = threading.Thread(target=thumbnail_pregeneration_worker, daemon=True)
+    thumbnail_pregen_thread.start()
+    print(f"🖼️ Thumbnail-Vorgenerierung gestartet: {len(filepaths)} Medien eingereiht")
+
+def get_thumbnail_pregeneration_status():
+    """
+    Status der Vorgenerierung für /api/thumbnails/status.
+    
+    Returns:
+        dict: queued, done, failed, skipped, paused, running, active_transcodes, memory_cache, trickplay
+    """
+    with thumbnail_pregen_condition:
+        queued = len(thumbnail_pregen_queued)
+    
+    return {
+        'queued': queued,
+        'done': thumbnail_pregen_stats['done'],
+        'failed': thumbnail_pregen_stats['failed'],
+        'skipped': thumbnail_pregen_stats['skipped'],
+        'paused': thumbnail_pregen_paused,
+        'running': thumbnail_pregen_thread is not None,
+        'active_transcodes': get_active_live_transcodes(),
+        'transcode_sessions': len(transcode_sessions_all),
+        'hls_encoders': hls_encoders_active,
+        'memory_cache': get_thumbnail_memory_stats(),
+        'trickplay': {'queued': len(trickplay_queued), **trickplay_stats}
+    }
+
+# -----------------------------------------------------------------------------
+# FFMPEG PROCESS MANAGEMENT - Zombie-Prozess Prevention
+# -----------------------------------------------------------------------------
+
+import signal
+import contextlib
+import struct
+import select
+import selectors
+
+try:
+    import resource     # RLIMIT_CPU (nur POSIX)
+except ImportError:
+    resource = None
+
+try:
+    import fcntl as fcntl_module    # F_SETPIPE_SZ (nur POSIX)
+except ImportError:
+    fcntl_module = None
+
+# Laufende Live-Transcodes (Streaming an Clients) - Hintergrundjobs pausieren solange
+active_live_transcodes = 0
+active_live_transcodes_lock = threading.Lock()
+
+def get_active_live_transcodes():
+    """Anzahl laufender Live-Transcodes/Remuxes."""
+    return active_live_transcodes
+
+# Alle FFmpeg-/FFprobe-Kindprozesse gehören einem einzigen Supervisor-Thread:
+# er liest ihre stderr-Pipes über einen Selector (Fehler, -progress), sammelt
+# beendete Prozesse per wait4 ein (Exit-Code + rusage), beendet Jobs nach ihrem
+# Zeitlimit und eskaliert SIGTERM → SIGKILL, ohne dass ein Request-Thread dafür
+# schläft. Die Thread-Zahl bleibt damit unabhängig von der Zahl der Jobs.
+# Windows kann Pipes nicht per select() abfragen - dort liest weiterhin ein
+# Thread je Prozess stderr, Einsammeln und Limits übernimmt der Supervisor.
+SUPERVISOR_TICK = 0.25              # Sekunden zwischen zwei Prüfungen
+FFMPEG_KILL_GRACE = 3               # Sekunden zwischen SIGTERM und SIGKILL
+FFMPEG_NICE = {'live': 0, 'foreground': 5, 'background': 10}
+FFMPEG_YIELD_NICE = 19              # Hintergrundjobs, solange Live-Streams laufen
+FFMPEG_BACKGROUND_CPU_FACTOR = 4    # RLIMIT_CPU = Zeitlimit x Faktor (≈ 4 Kerne durchgehend)
+SUPERVISOR_USES_SELECTOR = platform.system() != "Windows"
+
+class FFmpegSupervisor:
+    """Überwacht alle laufenden FFmpegProcess-Jobs aus einem Thread."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = set()           # Laufende (noch nicht eingesammelte) Jobs
+        self.pending = deque()      # Neue stderr-Pipes, registriert im Supervisor-Thread
+        self.selector = selectors.DefaultSelector() if SUPERVISOR_USES_SELECTOR else None
+        self.thread = None
+        self.stats = {'started': 0, 'reaped': 0, 'timeouts': 0, 'killed': 0, 'yielded': 0}
+    
+    def add(self, job):
+        """Übernimmt einen gestarteten Job (Priorität, CPU-Limit, stderr, Einsammeln)."""
+        pid = job.process.pid
+        with contextlib.suppress(OSError, AttributeError):
+            if job.nice:
+                os.setpriority(os.PRIO_PROCESS, pid, job.nice)
+        if job.cpu_limit and hasattr(resource, 'prlimit'):
+            with contextlib.suppress(OSError, ValueError):
+                resource.prlimit(pid, resource.RLIMIT_CPU, (job.cpu_limit, job.cpu_limit + FFMPEG_KILL_GRACE))
+        
+        with self.lock:
+            self.jobs.add(job)
+            self.stats['started'] += 1
+            if self.selector:
+                self.pending.append(job)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        if not self.selector:
+            threading.Thread(target=self.read_stderr_blocking, args=(job,), daemon=True).start()
+    
+    def run(self):
+        """Supervisor-Schleife: stderr lesen, einsammeln, Limits durchsetzen."""
+        while True:
+            try:
+                if self.selector:
+                    with self.lock:
+                        pending = list(self.pending)
+                        self.pending.clear()
+                    for job in pending:
+                        with contextlib.suppress(ValueError, KeyError, OSError):
+                            self.selector.register(job.process.stderr, selectors.EVENT_READ, job)
+                    events = self.selector.select(timeout=SUPERVISOR_TICK) if self.selector.get_map() else None
+                    if events is None:
+                        time.sleep(SUPERVISOR_TICK)
+                    for key, _ in events or ():
+                        self.read_stderr(key)
+                else:
+                    time.sleep(SUPERVISOR_TICK)
+                self.reap()
+                self.enforce_limits()
+            except Exception as e:
+                print(f"⚠️ FFmpeg-Supervisor: {e}")
+                time.sleep(SUPERVISOR_TICK)
+    
+    def read_stderr(self, key):
+        """Liest verfügbare stderr-Daten eines Jobs (blockiert nicht)."""
+        job = key.data
+        try:
+            data = os.read(key.fd, 65536)
+        except OSError:
+            data = b''
+        if data:
+            job.feed_stderr(data)
+            return
+        # EOF: Pipe schließen
+        with contextlib.suppress(KeyError, ValueError):
+            self.selector.unregister(key.fileobj)
+        with contextlib.suppress(OSError):
+            key.fileobj.close()
+        job.feed_stderr(b'\n')
+    
+    def read_stderr_blocking(self, job):
+        """Windows-Fallback: stderr in einem eigenen Thread lesen."""
+        try:
+            for line in iter(job.process.stderr.readline, b''):
+                job.feed_stderr(line)
+        except (OSError, ValueError):
+            pass
+    
+    def reap(self):
+        """Sammelt beendete Prozesse ein (unter POSIX per wait4 mit rusage)."""
+        with self.lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            process = job.process
+            if hasattr(os, 'wait4'):
+                try:
+                    pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+                except ChildProcessError:
+                    pid, status, rusage = process.pid, None, None   # Anderweitig eingesammelt
+                if not pid:
+                    continue
+                if status is not None:
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                job.rusage = rusage
+            elif process.poll() is None:
+                continue
+            with self.lock:
+                self.jobs.discard(job)
+                self.stats['reaped'] += 1
+            job.exited.set()
+    
+    def enforce_limits(self):
+        """Zeitlimits, SIGKILL-Eskalation und Vorrang für Live-Streams."""
+        now = time.time()
+        live_running = get_active_live_transcodes() > 0
+        with self.lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            if job.exited.is_set():
+                continue
+            if job.deadline and now >= job.deadline and job.kill_at is None:
+                print(f"⏱️ FFmpeg-Zeitlimit ({job.timeout}s) überschritten - beende Prozess {job.process.pid}")
+                self.stats['timeouts'] += 1
+                job.terminate()
+            elif job.kill_at and now >= job.kill_at:
+                print(f"⚠️ FFmpeg reagiert nicht, erzwinge Beendigung ({job.process.pid})...")
+                self.stats['killed'] += 1
+                job.kill_at = float('inf')
+                job.kill()
+            if live_running and job.priority == 'background' and not job.yielded:
+                # Einmalig: Niceness kann ohne Rechte nicht wieder gesenkt werden
+                job.yielded = True
+                self.stats['yielded'] += 1
+                with contextlib.suppress(OSError, AttributeError):
+                    os.setpriority(os.PRIO_PROCESS, job.process.pid, FFMPEG_YIELD_NICE)
+    
+    def get_status(self):
+        """Kurzinfo für /api/transcodes und /metrics."""
+        with self.lock:
+            jobs = list(self.jobs)
+            stats = dict(self.stats)
+        by_priority = {}
+        for job in jobs:
+            by_priority[job.priority] = by_priority.get(job.priority, 0) + 1
+        return {'running': len(jobs), 'by_priority': by_priority, **stats,
+                'threads': threading.active_count()}
+
+ffmpeg_supervisor = FFmpegSupervisor()
+
+class FFmpegProcess:
+    """
+    Context Manager für sichere FFmpeg-Prozess-Verwaltung.
+    Garantiert Prozess-Cleanup auch bei Exceptions oder Client-Disconnect;
+    Überwachung und Einsammeln übernimmt der FFmpegSupervisor.
+    """
+    def __init__(self, cmd, timeout=300, live=False, background=False, on_progress=None, quiet=False,
+                 pipe_size=None):
+        self.cmd = cmd
+        self.pipe_size = pipe_size  # Größe der stdout-Pipe in Bytes (nur Linux, None = Standard 64 KB)
+        self.timeout = timeout  # Zeitlimit in Sekunden (None = unbegrenzt, z.B. Live-Streams)
+        self.live = live  # Live-Stream an einen Client (zählt als aktiver Transcode)
+        self.priority = 'live' if live else 'background' if background else 'foreground'
+        self.nice = FFMPEG_NICE[self.priority]
+        # Hintergrundjobs zusätzlich mit CPU-Zeit-Limit (RLIMIT_CPU, nur Linux)
+        self.cpu_limit = int(timeout * FFMPEG_BACKGROUND_CPU_FACTOR) if background and timeout else None
+        self.quiet = quiet  # Kein Start-Log (z.B. ffprobe)
+        # Callback für -progress-Blöcke ({'fps': ..., 'speed': ..., 'out_time_us': ...})
+        self.on_progress = on_progress
+        self.rusage = None  # Ressourcenverbrauch nach Prozessende (nur POSIX)
+        self.exited = threading.Event()
+        self.deadline = None
+        self.kill_at = None
+        self.yielded = False
+        self.stderr_pending = b''
+        self.progress = {}
+        self.process = None
+        self.startupinfo = None
+        self.creationflags = 0
+        
+        # Windows-spezifische Konfiguration
+        if platform.system() == "Windows":
+            self.startupinfo = subprocess.STARTUPINFO()
+            self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            self.startupinfo.wShowWindow = subprocess.SW_HIDE
+            self.creationflags = subprocess.CREATE_NO_WINDOW
+            if background:
+                self.creationflags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    
+    def __enter__(self):
+        """Startet den Prozess und übergibt ihn dem Supervisor."""
+        # Konvertiere alle Argumente zu Strings
+        cmd_strs = [str(arg) for arg in self.cmd]
+        if self.on_progress:
+            # Maschinenlesbarer Fortschritt (key=value, Block endet mit progress=)
+            cmd_strs[1:1] = ['-progress', 'pipe:2', '-nostats']
+        
+        if not self.quiet:
+            print(f"🚀 Starte FFmpeg für Transcoding...")
+            # Nur für Debugging: Zeige ersten Teil des Befehls
+            cmd_display = ' '.join(cmd_strs[:10]) + ('...' if len(cmd_strs) > 10 else '')
+            print(f"   FFmpeg Befehl: {cmd_display}")
+        
+        # WICHTIG: stderr=PIPE für Fehlererkennung
+        self.process = subprocess.Popen(
+            cmd_strs,  # Liste von Strings ohne extra Anführungszeichen
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,  # Liest der Supervisor
+            stdin=subprocess.DEVNULL,
+            startupinfo=self.startupinfo,
+            creationflags=self.creationflags,
+            bufsize=8192,
+            shell=False  # KEIN shell=True!
+        )
+        if self.pipe_size and fcntl_module and sys.platform.startswith('linux'):
+            # Größere Pipe: weniger Aufwachen von FFmpeg und Leser pro MB
+            with contextlib.suppress(OSError):
+                fcntl_module.fcntl(self.process.stdout.fileno(),
+                                   getattr(fcntl_module, 'F_SETPIPE_SZ', 1031), self.pipe_size)
+        if self.timeout:
+            self.deadline = time.time() + self.timeout
+        ffmpeg_supervisor.add(self)
+        
+        if self.live:
+            global active_live_transcodes
+            with active_live_transcodes_lock:
+                active_live_transcodes += 1
+        
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+        if self.live:
+            global active_live_transcodes
+            with active_live_transcodes_lock:
+                active_live_transcodes -= 1
+        return False
+    
+    @property
+    def stdout(self):
+        return self.process.stdout
+    
+    @property
+    def pid(self):
+        return self.process.pid
+    
+    def feed_stderr(self, data):
+        """Verarbeitet stderr-Daten (vom Supervisor): Fehler loggen, -progress auswerten."""
+        *lines, self.stderr_pending = (self.stderr_pending + data).split(b'\n')
+        for line in lines:
+            line_str = line.decode('utf-8', errors='ignore').strip()
+            if not line_str:
+                continue
+            key, sep, value = line_str.partition('=')
+            if self.on_progress and sep and re.fullmatch(r'[a-z0-9_]+', key):
+                self.progress[key] = value
+                if key == 'progress':
+                    progress, self.progress = self.progress, {}
+                    try:
+                        self.on_progress(progress)
+                    except Exception as e:
+                        print(f"⚠️ Fortschritts-Auswertung fehlgeschlagen: {e}")
+            elif 'error' in line_str.lower():
+                print(f"   ⚠️ FFmpeg Fehler: {line_str[:100]}")
+    
+    def wait(self, timeout=None):
+        """
+        Wartet auf das Prozessende (der Supervisor sammelt ein, unter POSIX
+        inkl. CPU-Zeit und Spitzen-RSS in self.rusage).
+        
+        Returns:
+            int: Exit-Code
+        """
+        if not self.exited.wait(timeout):
+            raise subprocess.TimeoutExpired(self.cmd, timeout)
+        return self.process.returncode
+    
+    def poll(self):
+        """Exit-Code oder None solange der Prozess läuft."""
+        return self.process.returncode if self.exited.is_set() else None
+    
+    def send_signal(self, sig):
+        """
+        Signal per os.kill senden. Popen.terminate/kill rufen seit Python 3.9
+        vorher poll() (waitpid) auf und würden einen gerade beendeten Prozess
+        am Supervisor vorbei einsammeln - ohne rusage.
+        """
+        if self.exited.is_set():
+            return
+        with contextlib.suppress(OSError):
+            if platform.system() == "Windows":
+                self.process.terminate()    # TerminateProcess, kein waitpid
+            else:
+                os.kill(self.process.pid, sig)
+    
+    def terminate(self):
+        """SIGTERM senden; der Supervisor eskaliert nach FFMPEG_KILL_GRACE zu SIGKILL."""
+        if self.exited.is_set():
+            return
+        if self.kill_at is None:
+            self.kill_at = time.time() + FFMPEG_KILL_GRACE
+        self.send_signal(signal.SIGTERM)
+    
+    def kill(self):
+        """Sofort beenden (SIGKILL)."""
+        self.send_signal(getattr(signal, 'SIGKILL', signal.SIGTERM))
+    
+    def cleanup(self):
+        """Beendet einen noch laufenden Prozess, ohne auf ihn zu warten."""
+        if not self.process or self.exited.is_set():
+            return
+        
+        try:
+            with contextlib.suppress(OSError, ValueError):
+                self.process.stdout.close()
+            self.terminate()
+        except Exception as e:
+            print(f"⚠️ Fehler beim FFmpeg-Cleanup: {e}")
+
+def run_ffmpeg_capture(cmd, timeout, background=False):
+    """
+    Führt FFmpeg/FFprobe unter dem Supervisor aus und liest stdout komplett.
+    
+    Returns:
+        tuple: (Exit-Code oder None bei Zeitüberschreitung, stdout als bytes)
+    """
+    with FFmpegProcess(cmd, timeout=timeout, background=background, quiet=True) as process:
+        data = process.stdout.read()
+        try:
+            return process.wait(timeout=timeout), data
+        except subprocess.TimeoutExpired:
+            return None, data
+
+def get_ffmpeg_supervisor_status():
+    """Zustand des FFmpeg-Supervisors."""
+    return ffmpeg_supervisor.get_status()
+
+# -----------------------------------------------------------------------------
+# TRANSCODE-SITZUNGEN (EIN FFMPEG, MEHRERE CLIENTS)
+# -----------------------------------------------------------------------------
+
+# Browser öffnen dieselbe Quelle beim Laden oft zwei- bis dreimal, und zwei
+# Zuschauer desselben Films würden die CPU-Last verdoppeln. Eine Sitzung je
+# (Datei, Profil, Startposition) liest die FFmpeg-Ausgabe in einen begrenzten
+# Ringpuffer, aus dem alle Clients lesen. Späte Clients erhalten das
+# Init-Segment (ftyp+moov) und steigen an einer moof-Fragmentgrenze ein.
+TRANSCODE_BUFFER_BYTES = 16 * 1024 * 1024   # Ringpuffer je Sitzung
+TRANSCODE_READ_SIZE = 1024 * 1024      # Max. Bytes pro os.read() aus der FFmpeg-Pipe
+TRANSCODE_SEND_SIZE = 1024 * 1024      # Max. Bytes pro sendmsg() an einen Client
+TRANSCODE_SEND_PARTS = 64             # Max. Puffer pro sendmsg() (IOV_MAX ist oft 1024)
+TRANSCODE_PIPE_SIZE = 1024 * 1024      # stdout-Pipe von Live-FFmpeg (Linux, F_SETPIPE_SZ)
+SPLICE_AVAILABLE = hasattr(os, 'splice') and sys.platform.startswith('linux')
+TRANSCODE_IDLE_TIMEOUT = 20     # Sekunden ohne Client bis FFmpeg beendet wird
+TRANSCODE_STALL_TIMEOUT = 30    # Max. Wartezeit auf einen hängenden Client
+TRANSCODE_RETRY_AFTER = 10
+TRANSCODE_WARN_SECONDS = 20     # Warnen, wenn der Client-Puffer absehbar früher leer ist
+TRANSCODE_BACKPRESSURE = 0.25   # Solo: Anteil der Zeit im select() auf den Socket, ab dem der Client bremst
+TRANSCODE_HISTORY_MAX = 20      # Beendete Sitzungen in /api/transcodes (mit CPU/RSS)
+
+transcode_sessions = {}         # {(filepath, profile, start): TranscodeSession} - beitretbar
+transcode_sessions_all = set()  # Alle laufenden Sitzungen (für das Limit)
+hls_encoders_active = 0         # Laufende HLS-Segment-Encoder (zählen ebenfalls zum Limit)
+transcode_sessions_lock = threading.Lock()
+transcode_reaper_thread = None
+transcode_history = deque(maxlen=TRANSCODE_HISTORY_MAX)
+
+def get_transcode_limit():
+    """Max. Anzahl gleichzeitig laufender Encoder aus den Einstellungen."""
+    return max(1, int(get_setting('max_transcodes', 2)))
+
+def count_active_encoders():
+    """Laufende Encoder: Live-Sitzungen plus HLS-Segmente (Lock muss gehalten sein)."""
+    running = sum(1 for session in transcode_sessions_all if not session.finished)
+    return running + hls_encoders_active
+
+class TranscodeSession:
+    """
+    Ein FFmpeg-Prozess, dessen Ausgabe über einen Ringpuffer an beliebig
+    viele Clients verteilt wird. Der Puffer wird nur freigegeben, wenn alle
+    Clients die Daten gelesen haben; ohne Clients pausiert das Einlesen,
+    damit ein kurz darauf neu verbindender Browser noch bei 0 beginnt.
+    """
+    def __init__(self, key, cmd, cache_path=None):
+        self.key = key
+        self.cmd = cmd
+        self.cache_path = cache_path    # Vollständige Ausgabe wird hierhin mitgeschrieben
+        self.condition = threading.Condition()
+        self.chunks = deque()       # [(offset, bytes)]
+        self.start_offset = 0       # Offset des ältesten gepufferten Bytes
+        self.end_offset = 0
+        self.buffered = 0
+        self.consumers = {}         # {consumer_id: offset}
+        self.needs_init = set()     # Späte Clients, die noch das Init-Segment brauchen
+        self.next_consumer = 0
+        self.idle_since = time.time()
+        self.created = time.time()
+        self.finished = False
+        self.stopped = False
+        self.ffmpeg = None
+        # Telemetrie aus -progress (Encoder-Geschwindigkeit x Echtzeit usw.)
+        self.encoder_speed = None
+        self.speed_sample = None    # (Wanduhr, Medienzeit) der letzten Messung
+        self.slow_since = None
+        self.progress = {}          # fps, out_time, bitrate, frames, dropped
+        self.bytes_sent = 0         # An alle Clients geschrieben
+        self.warning = None         # Gesetzt, wenn ein Puffer-Leerlauf droht
+        self.rusage = None          # (CPU-Sekunden, Spitzen-RSS in Bytes) nach Prozessende
+        # MP4-Box-Scanner: Init-Segment und moof-Offsets für späte Clients
+        self.init_segment = None
+        self.fragments = deque()
+        self.next_box = 0
+        self.box_header = bytearray()
+        self.init_buffer = bytearray()
+        self.solo = False           # splice direkt in einen Socket, ohne Puffer/Beitritt
+        self.blocked_time = 0.0     # Solo: Sekunden, die splice auf Platz im Socket gewartet hat
+        self.blocked_sample = 0.0   # blocked_time bei der letzten Geschwindigkeitsmessung
+        self.backpressure = 0.0     # Solo: Anteil davon im letzten Messintervall
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+    
+    def start(self):
+        self.thread.start()
+    
+    def pump(self):
+        """Liest die FFmpeg-Ausgabe in den Ringpuffer (eigener Thread)."""
+        print(f"🎬 Transcode-Sitzung gestartet: {os.path.basename(self.key[0])} ({self.key[1]})")
+        cache_file = None
+        returncode = None
+        try:
+            if self.cache_path:
+                cache_file = open_transcode_cache_file(self.cache_path)
+            self.ffmpeg = FFmpegProcess(self.cmd, timeout=None, live=True, on_progress=self.record_progress,
+                                        pipe_size=TRANSCODE_PIPE_SIZE)
+            with self.ffmpeg as process:
+                fd = process.stdout.fileno()
+                while not self.stopped:
+                    try:
+                        # Roh lesen: liefert was da ist, statt auf volle Blöcke zu warten
+                        data = os.read(fd, TRANSCODE_READ_SIZE)
+                    except (OSError, ValueError):
+                        break
+                    if not data:
+                        break
+                    with self.condition:
+                        self.scan_boxes(data)
+                        self.chunks.append((self.end_offset, data))
+                        self.end_offset += len(data)
+                        self.buffered += len(data)
+                        self.condition.notify_all()
+                    if cache_file:
+                        try:
+                            cache_file.write(data)
+                        except OSError as e:
+                            print(f"⚠️ Transcode-Cache nicht beschreibbar: {e}")
+                            cache_file = discard_transcode_cache_file(cache_file)
+                    with self.condition:
+                        self.trim()
+                if not self.stopped:
+                    with contextlib.suppress(subprocess.TimeoutExpired):
+                        returncode = self.ffmpeg.wait(timeout=10)
+        except Exception as e:
+            print(f"❌ Transcode-Sitzung fehlgeschlagen: {e}")
+        finally:
+            self.finish()
+            if cache_file:
+                # Nur vollständige Ausgaben übernehmen
+                if returncode == 0 and not self.stopped and self.end_offset > 0:
+                    cache_file.close()
+                    finalize_transcode_cache(cache_file.name, self.cache_path)
+                else:
+                    discard_transcode_cache_file(cache_file)
+            with transcode_sessions_lock:
+                if transcode_sessions.get(self.key) is self and not self.consumers:
+                    del transcode_sessions[self.key]
+            self.log_finished()
+    
+    def splice_to(self, sock):
+        """
+        Solo-Sitzung: leitet die FFmpeg-Ausgabe per splice() direkt von der
+        Pipe in den Client-Socket (Linux). Die Daten passieren Python nicht;
+        läuft im Request-Thread statt in einem Pump-Thread.
+        
+        Returns:
+            int: Gesendete Bytes
+        """
+        print(f"🎬 Transcode-Sitzung gestartet: {os.path.basename(self.key[0])} ({self.key[1]}, splice)")
+        dst = sock.fileno()
+        flags = os.SPLICE_F_MOVE | os.SPLICE_F_MORE
+        try:
+            self.ffmpeg = FFmpegProcess(self.cmd, timeout=None, live=True, on_progress=self.record_progress,
+                                        pipe_size=TRANSCODE_PIPE_SIZE)
+            with self.ffmpeg as process:
+                src = process.stdout.fileno()
+                while not self.stopped:
+                    try:
+                        sent = os.splice(src, dst, TRANSCODE_PIPE_SIZE, flags=flags)
+                    except BlockingIOError:
+                        # Socket mit Timeout ist intern nicht-blockierend: auf Platz warten
+                        # (Wartezeit = Gegendruck des Clients, ersetzt den Pufferfüllstand)
+                        waited = time.monotonic()
+                        writable = select.select([], [dst], [], TRANSCODE_STALL_TIMEOUT)[1]
+                        self.blocked_time += time.monotonic() - waited
+                        if not writable:
+                            print(f"⏩ Transcode-Client nimmt seit {TRANSCODE_STALL_TIMEOUT}s nichts an")
+                            break
+                        continue
+                    except OSError:
+                        print(f"ℹ️ Client hat Verbindung getrennt nach {self.bytes_sent / (1024*1024):.1f} MB")
+                        break
+                    if not sent:
+                        break   # FFmpeg fertig
+                    self.end_offset += sent
+                    self.bytes_sent += sent
+        except Exception as e:
+            print(f"❌ Transcode-Sitzung fehlgeschlagen: {e}")
+        finally:
+            self.finish()
+            with transcode_sessions_lock:
+                transcode_sessions_all.discard(self)    # Slot sofort frei, nicht erst beim Reaper
+            self.log_finished()
+        return self.bytes_sent
+    
+    def finish(self):
+        """Markiert die Sitzung als beendet (nach dem Einsammeln von FFmpeg, für rusage)."""
+        if self.ffmpeg:
+            # Der Supervisor sammelt den Prozess ein (liefert rusage)
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                self.ffmpeg.wait(timeout=FFMPEG_KILL_GRACE + 2)
+        self.rusage = get_process_rusage(self.ffmpeg)
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+    
+    def log_finished(self):
+        """Abschluss-Log und Eintrag im Sitzungsverlauf."""
+        usage = (f", CPU {self.rusage[0]:.1f}s, RSS {self.rusage[1] / (1024*1024):.0f} MB"
+                 if self.rusage else "")
+        print(f"🏁 Transcode-Sitzung beendet: {os.path.basename(self.key[0])} "
+              f"({self.end_offset / (1024*1024):.1f} MB{usage})")
+        transcode_history.append(self.get_status())
+    
+    def record_progress(self, progress):
+        """Übernimmt einen -progress-Block und misst die aktuelle Encoder-Geschwindigkeit."""
+        media_time = parse_ffmpeg_progress(progress, self.progress)
+        if media_time is None:
+            return
+        now = time.time()
+        if self.speed_sample is None:
+            self.speed_sample = (now, media_time)
+            return
+        # FFmpegs speed= ist ein Mittel seit Start; hier zählt die aktuelle Rate
+        last_wall, last_media = self.speed_sample
+        if now - last_wall < ENCODER_SPEED_INTERVAL:
+            return
+        self.speed_sample = (now, media_time)
+        speed = (media_time - last_media) / (now - last_wall)
+        blocked_time = self.blocked_time
+        self.backpressure = (blocked_time - self.blocked_sample) / (now - last_wall)
+        self.blocked_sample = blocked_time
+        record_encoder_speed(self, speed)
+        self.check_stall_risk(speed, media_time, now)
+    
+    def is_client_bound(self):
+        """
+        True, wenn der Client bremst statt der Encoder: Puffer zu einem Viertel
+        gefüllt, bzw. bei Solo-Sitzungen (ohne Puffer) splice wartet spürbar auf den Socket.
+        """
+        if self.solo:
+            return self.backpressure >= TRANSCODE_BACKPRESSURE
+        return self.buffered >= TRANSCODE_BUFFER_BYTES // 4
+    
+    def check_stall_risk(self, speed, media_time, now):
+        """
+        Warnt, bevor der Client ins Stocken gerät: der Vorsprung der Ausgabe
+        vor der (ab Sitzungsstart in Echtzeit laufenden) Wiedergabe schrumpft
+        bei speed < 1 um (1 - speed) Sekunden pro Sekunde.
+        """
+        if speed >= 1.0 or self.is_client_bound():
+            self.warning = None   # Schnell genug oder Client bremst selbst
+            return
+        lead = max(0.0, media_time - (now - self.created))
+        seconds_left = lead / (1.0 - speed)
+        if seconds_left >= TRANSCODE_WARN_SECONDS:
+            return
+        if self.warning is None:
+            print(f"⚠️ Transcode zu langsam: {os.path.basename(self.key[0])} läuft mit {speed:.2f}x, "
+                  f"Puffer des Clients reicht noch ~{seconds_left:.0f}s")
+        self.warning = f'{speed:.2f}x - Puffer leer in ~{seconds_left:.0f}s'
+    
+    def scan_boxes(self, data):
+        """Verfolgt die MP4-Top-Level-Boxen (Init-Segment + moof-Offsets)."""
+        if self.init_segment is None and self.next_box is not None:
+            self.init_buffer += data
+            if len(self.init_buffer) > TRANSCODE_BUFFER_BYTES:
+                # Kein fragmentiertes MP4: späte Clients nur ab Offset 0
+                self.next_box = None
+                self.init_buffer = bytearray()
+        offset = self.end_offset
+        pos = 0
+        while self.next_box is not None:
+            pos = max(pos, self.next_box - offset)
+            if pos >= len(data):
+                break
+            piece = data[pos:pos + 8 - len(self.box_header)]
+            self.box_header += piece
+            pos += len(piece)
+            if len(self.box_header) < 8:
+                break
+            size, box_type = struct.unpack('>I4s', self.box_header)
+            box_start = self.next_box
+            self.box_header.clear()
+            if size < 8:
+                # Unbekannte Struktur (size 0/1): kein Einstieg für späte Clients
+                self.next_box = None
+                self.init_buffer = bytearray()
+                break
+            if box_type == b'moof':
+                if self.init_segment is None:
+                    self.init_segment = bytes(self.init_buffer[:box_start])
+                    self.init_buffer = bytearray()
+                self.fragments.append(box_start)
+            self.next_box = box_start + size
+    
+    def trim(self):
+        """
+        Gibt Puffer frei, den alle Clients gelesen haben. Muss mit gehaltener
+        condition aufgerufen werden; blockiert FFmpeg solange der Puffer voll ist.
+        """
+        stall_start = None
+        while self.buffered > TRANSCODE_BUFFER_BYTES and not self.stopped:
+            first_offset, first = self.chunks[0]
+            slowest = min(self.consumers.values(), default=None)
+            if slowest is not None and slowest >= first_offset + len(first):
+                self.chunks.popleft()
+                self.buffered -= len(first)
+                self.start_offset = first_offset + len(first)
+                while self.fragments and self.fragments[0] < self.start_offset:
+                    self.fragments.popleft()
+                continue
+            
+            if slowest is not None:
+                # Hängender Client (z.B. pausiert): nicht alle anderen blockieren
+                stall_start = stall_start or time.time()
+                if time.time() - stall_start > TRANSCODE_STALL_TIMEOUT:
+                    print(f"⏩ Transcode-Client hängt seit {TRANSCODE_STALL_TIMEOUT}s - Puffer wird überschrieben")
+                    for consumer, offset in self.consumers.items():
+                        if offset < first_offset + len(first):
+                            self.consumers[consumer] = first_offset + len(first)
+                    continue
+            self.condition.wait(timeout=1)
+    
+    def join_offset(self):
+        """Einstiegspunkt für einen neuen Client (None = nicht mehr möglich)."""
+        if self.start_offset == 0:
+            return 0
+        if self.init_segment is not None and self.fragments:
+            return self.fragments[0]
+        return None
+    
+    def is_joinable(self):
+        """Kann ein neuer Client noch einsteigen? (condition muss gehalten sein)"""
+        if self.stopped or (self.finished and self.start_offset > 0):
+            return False
+        return self.join_offset() is not None
+    
+    def attach(self):
+        """Meldet einen Client an und liefert seine ID (None = kein Einstieg möglich)."""
+        with self.condition:
+            if not self.is_joinable():
+                return None
+            offset = self.join_offset()
+            consumer = self.next_consumer
+            self.next_consumer += 1
+            self.consumers[consumer] = offset
+            if offset > 0:
+                # Init-Segment vorab senden, danach ab Fragmentgrenze
+                self.needs_init.add(consumer)
+            return consumer
+    
+    def detach(self, consumer):
+        """Meldet einen Client ab; die Sitzung läuft bis zum Leerlauf-Timeout weiter."""
+        with self.condition:
+            self.consumers.pop(consumer, None)
+            self.needs_init.discard(consumer)
+            if not self.consumers:
+                self.idle_since = time.time()
+            self.condition.notify_all()
+    
+    def read(self, consumer, max_bytes=TRANSCODE_SEND_SIZE):
+        """
+        Liefert die nächsten Daten für einen Client (blockierend), ohne sie zu
+        kopieren: Ausschnitte der Puffer-Chunks für ein einzelnes sendmsg().
+        
+        Returns:
+            list: memoryviews, leer wenn die Sitzung beendet ist
+        """
+        with self.condition:
+            while True:
+                offset = self.consumers.get(consumer)
+                if offset is None or self.stopped:
+                    return []
+                if consumer in self.needs_init:
+                    # Später Einstieg: erst Init-Segment
+                    self.needs_init.discard(consumer)
+                    return [memoryview(self.init_segment)]
+                if offset < self.start_offset:
+                    # Überholt: an der ältesten Fragmentgrenze weiterlesen
+                    if not self.fragments:
+                        return []
+                    offset = self.consumers[consumer] = self.fragments[0]
+                if offset < self.end_offset:
+                    # Clients hängen meist nah am Ende: von hinten suchen
+                    parts = []
+                    for chunk_offset, chunk in reversed(self.chunks):
+                        if chunk_offset + len(chunk) <= offset:
+                            break
+                        parts.append(memoryview(chunk)[max(0, offset - chunk_offset):])
+                    parts.reverse()
+                    size = 0
+                    for count, part in enumerate(parts):
+                        size += len(part)
+                        if size >= max_bytes or count + 1 >= TRANSCODE_SEND_PARTS:
+                            del parts[count + 1:]
+                            break
+                    self.consumers[consumer] = offset + size
+                    self.condition.notify_all()
+                    return parts
+                if self.finished:
+                    return []
+                self.condition.wait(timeout=1)
+    
+    def stop(self):
+        """Beendet FFmpeg; der Pump-Thread räumt den Prozess auf."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.ffmpeg and self.ffmpeg.process:
+            self.ffmpeg.terminate()
+    
+    def get_status(self):
+        """Kurzinfo für /api/transcodes."""
+        with self.condition:
+            return {
+                'file': os.path.basename(self.key[0]),
+                'profile': self.key[1],
+                'start': self.key[2],
+                'mode': 'splice' if self.solo else 'shared',
+                'clients': len(self.consumers),
+                'bytes': self.end_offset,
+                'buffered': self.buffered,
+                'finished': self.finished,
+                'speed': round(self.encoder_speed, 2) if self.encoder_speed is not None else None,
+                **self.progress,
+                'bytes_sent': self.bytes_sent,
+                'warning': self.warning,
+                'backpressure': round(self.backpressure, 2) if self.solo else None,
+                'cpu_seconds': round(self.rusage[0], 2) if self.rusage else None,
+                'peak_rss': self.rusage[1] if self.rusage else None,
+                'age': round(time.time() - self.created, 1)
+            }
+
+def acquire_transcode_session(filepath, profile, start, build_command, cache=True, solo=False, cache_profile=None):
+    """
+    Tritt einer laufenden Sitzung bei oder startet eine neue.
+    
+    Args:
+        filepath (str): Quelldatei
+        profile (str): Transcode-Profil
+        start (float): Startposition in Sekunden
+        build_command (callable): build_command(filepath, start) → FFmpeg-Befehl
+        cache (bool): Ausgabe ab Position 0 in den Transcode-Cache mitschreiben
+        solo (bool): Eigene, nicht teilbare Sitzung (splice direkt in den Socket),
+                     falls keine beitretbare und keine Solo-Sitzung derselben Position läuft
+        cache_profile (str): Profil des Cache-Eintrags (None = profile)
+    
+    Returns:
+        tuple: (TranscodeSession, consumer_id) oder (None, None) beim Limit
+    """
+    key = (filepath, profile, start)
+    
+    session, consumer = join_transcode_session(key)
+    if session is not None:
+        return session, consumer
+    
+    # Befehl außerhalb des Locks bauen (kann ffprobe aufrufen)
+    cmd = build_command(filepath, start)
+    
+    with transcode_sessions_lock:
+        session, consumer = join_transcode_session(key, locked=True)
+        if session is not None:
+            return session, consumer
+        
+        if count_active_encoders() >= get_transcode_limit():
+            # Zuerst Sitzungen ohne Clients freigeben
+            for idle in [s for s in transcode_sessions_all if not s.consumers]:
+                stop_transcode_session(idle)
+            if count_active_encoders() >= get_transcode_limit():
+                return None, None
+        
+        if solo and any(s.solo and s.key == key and not s.finished for s in transcode_sessions_all):
+            # Wiederholte Anfrage (Browser): geteilt starten, damit weitere beitreten können
+            solo = False
+        
+        cache_path = (get_transcode_cache_path(filepath, cache_profile or profile)
+                      if start == 0 and cache and not solo else None)
+        session = TranscodeSession(key, cmd, cache_path)
+        session.solo = solo
+        consumer = session.attach()
+        if not solo:
+            transcode_sessions[key] = session
+        transcode_sessions_all.add(session)
+        start_transcode_reaper()
+    
+    if not solo:
+        session.start()     # Solo: der Request-Thread ruft splice_to()
+    return session, consumer
+
+def join_transcode_session(key, locked=False):
+    """Tritt einer laufenden Sitzung bei, falls möglich (→ (session, consumer) oder (None, None))."""
+    with (contextlib.nullcontext() if locked else transcode_sessions_lock):
+        session = transcode_sessions.get(key)
+        consumer = session.attach() if session is not None else None
+    if consumer is None:
+        return None, None
+    print(f"🔗 Client tritt laufender Transcode-Sitzung bei: {os.path.basename(key[0])}")
+    return session, consumer
+
+def has_joinable_transcode_session(key):
+    """True, wenn für key eine Sitzung läuft, der ein neuer Client beitreten kann."""
+    with transcode_sessions_lock:
+        session = transcode_sessions.get(key)
+    if session is None:
+        return False
+    with session.condition:
+        return session.is_joinable()
+
+def stop_transcode_session(session):
+    """Beendet eine Sitzung und entfernt sie aus der Verwaltung (Lock muss gehalten sein)."""
+    session.stop()
+    transcode_sessions_all.discard(session)
+    if transcode_sessions.get(session.key) is session:
+        del transcode_sessions[session.key]
+
+def transcode_reaper():
+    """Beendet Sitzungen ohne Clients nach TRANSCODE_IDLE_TIMEOUT."""
+    while True:
+        time.sleep(5)
+        now = time.time()
+        with transcode_sessions_lock:
+            for session in list(transcode_sessions_all):
+                if session.consumers:
+                    continue
+                if session.finished or now - session.idle_since > TRANSCODE_IDLE_TIMEOUT:
+                    if not session.finished:
+                        print(f"💤 Transcode-Sitzung ohne Clients beendet: {os.path.basename(session.key[0])}")
+                    stop_transcode_session(session)
+
+def start_transcode_reaper():
+    """Startet den Aufräum-Thread beim ersten Transcode (Lock muss gehalten sein)."""
+    global transcode_reaper_thread
+    
+    if transcode_reaper_thread is None:
+        transcode_reaper_thread = threading.Thread(target=transcode_reaper, daemon=True)
+        transcode_reaper_thread.start()
+
+def get_transcode_sessions_status():
+    """Liefert Limit und Zustand aller laufenden Sitzungen."""
+    with transcode_sessions_lock:
+        sessions = list(transcode_sessions_all)
+    return {
+        'limit': get_transcode_limit(),
+        'hls_encoders': hls_encoders_active,
+        'encoder': get_encoder_status(),
+        'sessions': [session.get_status() for session in sessions],
+        'recent': list(transcode_history),
+        'processes': get_ffmpeg_supervisor_status()
+    }
+
+# -----------------------------------------------------------------------------
+# ENCODER-PROFILE (LASTABHÄNGIG)
+# -----------------------------------------------------------------------------
+
+# Statt fest ultrafast/baseline wählt jeder Live-Transcode aus einer Leiter von
+# Profilen das beste, das die Maschine bei der aktuellen Last noch mit Reserve
+# über Echtzeit schafft. Grundlage ist ein einmaliger Benchmark beim Start
+# (x264 veryfast, 720p); andere Profile werden über Pixelzahl und Preset-Kosten
+# hochgerechnet. Fallen laufende Encoder unter Echtzeit, obwohl ihr Client auf
+# Daten wartet, rückt die Obergrenze für neue Sitzungen eine Stufe nach unten.
+ENCODER_PROFILES = (
+    # (Name, max. Höhe, Preset, CRF, maxrate kbit/s)
+    ('1080p', 1080, 'veryfast', 23, 8000),
+    ('720p', 720, 'veryfast', 23, 4000),
+    ('720p-schnell', 720, 'superfast', 24, 3000),
+    ('540p', 540, 'superfast', 25, 2000),
+    ('480p', 480, 'ultrafast', 26, 1200),
+    ('360p', 360, 'ultrafast', 28, 700),
+)
+ENCODER_PRESET_COST = {'ultrafast': 0.35, 'superfast': 0.6, 'veryfast': 1.0}  # relativ zu veryfast
+ENCODER_DECODE_COST = 0.15       # Dekodieren eines Quellbilds im Verhältnis zu veryfast
+ENCODER_BENCHMARK_SIZE = (1280, 720)
+ENCODER_BENCHMARK_FRAMES = 150
+ENCODER_BENCHMARK_TIMEOUT = 60
+ENCODER_DEFAULT_FPS = 60.0       # Annahme bis der Benchmark fertig ist (Bilder/s bei 720p veryfast)
+ENCODER_SOURCE_FPS = 30.0        # Falls die Bildrate der Quelle unbekannt ist
+ENCODER_AUDIO_KBPS = 128
+ENCODER_HEADROOM = 1.3           # Geforderte Reserve über Echtzeit
+ENCODER_SPEED_INTERVAL = 2.0     # Sekunden zwischen zwei Geschwindigkeitsmessungen
+ENCODER_SLOW_SPEED = 1.0         # Darunter gilt ein Encoder als zu langsam ...
+ENCODER_SLOW_SECONDS = 10        # ... wenn das so lange anhält
+ENCODER_RECOVER_SPEED = 1.8      # Alle Encoder darüber: eine Stufe zurück nach oben
+ENCODER_RECOVER_SECONDS = 60
+
+encoder_benchmark_fps = None     # Messwert, None = noch nicht gemessen
+encoder_benchmark_thread = None
+encoder_step_down = 0            # Durch Echtzeit-Unterschreitungen erzwungene Stufen
+encoder_step_changed = 0.0
+encoder_lock = threading.Lock()
+
+def run_encoder_benchmark():
+    """Misst einmalig die x264-Geschwindigkeit (Bilder/s bei 720p veryfast)."""
+    global encoder_benchmark_fps
+    width, height = ENCODER_BENCHMARK_SIZE
+    cmd = [
+        FFMPEG_EXECUTABLE,
+        '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=30',
+        '-frames:v', str(ENCODER_BENCHMARK_FRAMES),
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+        '-f', 'null', '-'
+    ]
+    started = time.perf_counter()
+    try:
+        returncode, _ = run_ffmpeg_capture(cmd, ENCODER_BENCHMARK_TIMEOUT)
+    except OSError as e:
+        print(f"⚠️ Encoder-Benchmark fehlgeschlagen: {e}")
+        return
+    elapsed = time.perf_counter() - started
+    if returncode != 0 or elapsed <= 0:
+        print(f"⚠️ Encoder-Benchmark fehlgeschlagen (Exit-Code {returncode}) - "
+              f"nehme {ENCODER_DEFAULT_FPS:.0f} Bilder/s an")
+        return
+    encoder_benchmark_fps = ENCODER_BENCHMARK_FRAMES / elapsed
+    print(f"⏱️ Encoder-Benchmark: {encoder_benchmark_fps:.0f} Bilder/s bei {height}p veryfast")
+
+def start_encoder_benchmark():
+    """Startet den Benchmark einmalig im Hintergrund."""
+    global encoder_benchmark_thread
+    if encoder_benchmark_thread is None:
+        encoder_benchmark_thread = threading.Thread(target=run_encoder_benchmark, daemon=True)
+        encoder_benchmark_thread.start()
+
+def estimate_encoder_speed(profile, width, height, fps, encoders):
+    """
+    Geschätzte Geschwindigkeit (x Echtzeit) eines Profils.
+    
+    Args:
+        profile (tuple): Eintrag aus ENCODER_PROFILES
+        width, height (int): Quellauflösung (0 = unbekannt)
+        fps (float): Bildrate der Quelle
+        encoders (int): Gleichzeitig laufende Encoder (inkl. diesem)
+    
+    Returns:
+        float: Vielfaches der Echtzeit
+    """
+    max_height = profile[1]
+    out_height = min(height, max_height) if height else max_height
+    aspect = width / height if width and height else 16 / 9
+    bench_pixels = ENCODER_BENCHMARK_SIZE[0] * ENCODER_BENCHMARK_SIZE[1]
+    cost = (out_height * out_height * aspect / bench_pixels) * ENCODER_PRESET_COST[profile[2]]
+    cost += (width * height or out_height * out_height * aspect) / bench_pixels * ENCODER_DECODE_COST
+    capacity = (encoder_benchmark_fps or ENCODER_DEFAULT_FPS) / cost
+    return capacity / max(1, encoders) / (fps or ENCODER_SOURCE_FPS)
+
+def pick_encoder_profile(width, height, fps, encoders, step_down, bandwidth):
+    """Erstes Profil der Leiter, das Bandbreite und Echtzeit-Reserve einhält."""
+    candidates = ENCODER_PROFILES[min(step_down, len(ENCODER_PROFILES) - 1):]
+    for profile in candidates:
+        if bandwidth and profile[4] + ENCODER_AUDIO_KBPS > bandwidth:
+            continue
+        if estimate_encoder_speed(profile, width, height, fps, encoders) >= ENCODER_HEADROOM:
+            return profile
+    return candidates[-1]
+
+def relax_encoder_step_down():
+    """Nimmt eine Stufe zurück, wenn alle Encoder lange genug deutlich über Echtzeit liefen."""
+    global encoder_step_down, encoder_step_changed
+    with transcode_sessions_lock:
+        # Vom Client gebremste Sitzungen sagen nichts über die Encoder-Reserve
+        speeds = [s.encoder_speed for s in transcode_sessions_all
+                  if is_encoder_session_profile(s.key[1]) and not s.finished and not s.is_client_bound()]
+    with encoder_lock:
+        if not encoder_step_down or time.time() - encoder_step_changed < ENCODER_RECOVER_SECONDS:
+            return
+        if all(speed is not None and speed >= ENCODER_RECOVER_SPEED for speed in speeds):
+            encoder_step_down -= 1
+            encoder_step_changed = time.time()
+            print(f"📈 Encoder-Last gesunken - Profil-Obergrenze: {ENCODER_PROFILES[encoder_step_down][0]}")
+
+def select_encoder_profile(filepath, bandwidth=None, joining=False):
+    """
+    Wählt das Encoder-Profil für einen neuen Live-Transcode.
+    
+    Args:
+        filepath (str): Quelldatei (Auflösung und Bildrate aus probe_media)
+        bandwidth (int): Bandbreiten-Hinweis des Clients in kbit/s (None = unbekannt)
+        joining (bool): Nur prüfen, welches Profil ein beitretender Client bekäme
+                        (kein zusätzlicher Encoder, kein Log, keine Stufenänderung)
+    
+    Returns:
+        dict: name, height, scale, preset, crf, maxrate, speed (Schätzung) und
+              full_quality (True = Profil wäre auch ohne Last gewählt worden)
+    """
+    if not joining:
+        relax_encoder_step_down()
+    info = probe_media(filepath)
+    width, height = info.get('width') or 0, info.get('height') or 0
+    fps = info.get('fps') or ENCODER_SOURCE_FPS
+    with transcode_sessions_lock:
+        # Neue Sitzung zählt mit; ein Beitritt startet keinen Encoder
+        encoders = max(1, count_active_encoders()) if joining else count_active_encoders() + 1
+    
+    profile = pick_encoder_profile(width, height, fps, encoders, encoder_step_down, bandwidth)
+    unloaded = pick_encoder_profile(width, height, fps, 1, 0, None)
+    out_height = min(height, profile[1]) if height else profile[1]
+    encoder = {
+        'name': profile[0],
+        'height': out_height - out_height % 2,
+        'scale': not height or height > profile[1],
+        'preset': profile[2],
+        'crf': profile[3],
+        'maxrate': profile[4],
+        'speed': round(estimate_encoder_speed(profile, width, height, fps, encoders), 2),
+        'full_quality': profile is unloaded,
+    }
+    if joining:
+        return encoder
+    print(f"   🎛️ Encoder-Profil {encoder['name']} ({encoder['preset']}, CRF {encoder['crf']}, "
+          f"≤{encoder['maxrate']} kbit/s) - {encoders} Encoder, geschätzt {encoder['speed']:.1f}x"
+          + (f", Client {bandwidth} kbit/s" if bandwidth else ""))
+    return encoder
+
+def parse_ffmpeg_progress(progress, target):
+    """
+    Übernimmt die relevanten Felder eines -progress-Blocks.
+    
+    Args:
+        progress (dict): Rohwerte (fps, bitrate, out_time_us, frame, drop_frames, ...)
+        target (dict): Wird mit fps, bitrate (kbit/s), out_time (s), frames, dropped aktualisiert
+    
+    Returns:
+        float|None: Medienzeit der Ausgabe in Sekunden
+    """
+    def number(key):
+        value = progress.get(key, '').strip()
+        try:
+            return float(re.match(r'[-\d.]+', value).group()) if value else None
+        except (AttributeError, ValueError):
+            return None   # 'N/A'
+    
+    # out_time_ms ist trotz des Namens in Mikrosekunden (ältere FFmpeg-Versionen)
+    out_time_us = number('out_time_us')
+    if out_time_us is None:
+        out_time_us = number('out_time_ms')
+    media_time = out_time_us / 1e6 if out_time_us is not None and out_time_us >= 0 else None
+    for field, key in (('fps', 'fps'), ('bitrate', 'bitrate'), ('frames', 'frame'), ('dropped', 'drop_frames')):
+        value = number(key)
+        if value is not None:
+            target[field] = int(value) if field in ('frames', 'dropped') else round(value, 1)
+    if media_time is not None:
+        target['out_time'] = round(media_time, 1)
+    return media_time
+
+def get_process_rusage(ffmpeg):
+    """(CPU-Sekunden, Spitzen-RSS in Bytes) eines beendeten FFmpegProcess oder None."""
+    rusage = ffmpeg.rusage if ffmpeg else None
+    if rusage is None:
+        return None
+    # ru_maxrss: Linux in KB, macOS in Bytes
+    peak_rss = rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+    return rusage.ru_utime + rusage.ru_stime, peak_rss
+
+def get_transcode_metrics():
+    """Transcode-Kennzahlen im Prometheus-Textformat (für /metrics)."""
+    status = get_transcode_sessions_status()
+    sessions = status['sessions']
+    
+    def label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    lines = [
+        '# TYPE mediaindexer_transcode_sessions gauge',
+        f'mediaindexer_transcode_sessions {len(sessions)}',
+        '# TYPE mediaindexer_transcode_limit gauge',
+        f'mediaindexer_transcode_limit {status["limit"]}',
+        '# TYPE mediaindexer_encoder_step_down gauge',
+        f'mediaindexer_encoder_step_down {status["encoder"]["step_down"]}',
+        '# TYPE mediaindexer_encoder_benchmark_fps gauge',
+        f'mediaindexer_encoder_benchmark_fps {status["encoder"]["benchmark_fps"] or 0}',
+        '# TYPE mediaindexer_transcode_slow_sessions gauge',
+        f'mediaindexer_transcode_slow_sessions {sum(1 for s in sessions if s["warning"])}',
+    ]
+    per_session = (
+        ('speed', 'mediaindexer_transcode_speed', 'gauge'),
+        ('fps', 'mediaindexer_transcode_fps', 'gauge'),
+        ('out_time', 'mediaindexer_transcode_out_time_seconds', 'gauge'),
+        ('bitrate', 'mediaindexer_transcode_bitrate_kbps', 'gauge'),
+        ('clients', 'mediaindexer_transcode_clients', 'gauge'),
+        ('bytes_sent', 'mediaindexer_transcode_sent_bytes', 'counter'),
+    )
+    for field, name, kind in per_session:
+        lines.append(f'# TYPE {name} {kind}')
+        for session in sessions:
+            if session.get(field) is not None:
+                lines.append(f'{name}{{file="{label(session["file"])}",profile="{label(session["profile"])}",'
+                             f'start="{session["start"]}"}} {session[field]}')
+    processes = status['processes']
+    lines.extend([
+        '# TYPE mediaindexer_ffmpeg_processes gauge',
+        f'mediaindexer_ffmpeg_processes {processes["running"]}',
+        '# TYPE mediaindexer_ffmpeg_started_total counter',
+        f'mediaindexer_ffmpeg_started_total {processes["started"]}',
+        '# TYPE mediaindexer_ffmpeg_timeouts_total counter',
+        f'mediaindexer_ffmpeg_timeouts_total {processes["timeouts"]}',
+        '# TYPE mediaindexer_threads gauge',
+        f'mediaindexer_threads {processes["threads"]}',
+    ])
+    finished = list(transcode_history)
+    lines.extend([
+        '# TYPE mediaindexer_transcode_recent_cpu_seconds gauge',
+        f'mediaindexer_transcode_recent_cpu_seconds {sum(s["cpu_seconds"] or 0 for s in finished):.2f}',
+        '# TYPE mediaindexer_transcode_recent_peak_rss_bytes gauge',
+        f'mediaindexer_transcode_recent_peak_rss_bytes {max((s["peak_rss"] or 0 for s in finished), default=0)}',
+    ])
+    return '\n'.join(lines) + '\n'
+
+def record_encoder_speed(session, speed):
+    """
+    Wertet eine Geschwindigkeitsmessung einer Live-Sitzung aus. Zu langsam ist
+    ein Encoder nur, wenn er unter Echtzeit liegt und der Puffer fast leer ist -
+    bei vollem Puffer (Solo: splice wartet auf den Socket) bremst der Client, nicht die CPU.
+    """
+    global encoder_step_down, encoder_step_changed
+    now = time.time()
+    session.encoder_speed = speed
+    if not is_encoder_session_profile(session.key[1]):
+        return   # Remux/Audio: langsam heißt hier I/O, nicht Encoder-Last
+    if speed >= ENCODER_SLOW_SPEED or session.is_client_bound():
+        session.slow_since = None
+        return
+    session.slow_since = session.slow_since or now
+    if now - session.slow_since < ENCODER_SLOW_SECONDS:
+        return
+    session.slow_since = now   # Nächste Stufe frühestens nach weiteren ENCODER_SLOW_SECONDS
+    with encoder_lock:
+        if encoder_step_down >= len(ENCODER_PROFILES) - 1:
+            return
+        encoder_step_down += 1
+        encoder_step_changed = now
+    print(f"📉 Encoder unter Echtzeit ({speed:.2f}x, {os.path.basename(session.key[0])}) - "
+          f"Profil-Obergrenze: {ENCODER_PROFILES[encoder_step_down][0]}")
+
+def get_encoder_status():
+    """Benchmark-Ergebnis und aktuelle Profil-Obergrenze für /api/transcodes."""
+    return {
+        'benchmark_fps': round(encoder_benchmark_fps, 1) if encoder_benchmark_fps else None,
+        'step_down': encoder_step_down,
+        'max_profile': ENCODER_PROFILES[encoder_step_down][0],
+    }
+
+# -----------------------------------------------------------------------------
+# TRANSCODE-CACHE (FERTIGE AUSGABEN AUF PLATTE)
+# -----------------------------------------------------------------------------
+
+# Eine Sitzung ab Position 0 schreibt ihre Ausgabe mit. Läuft FFmpeg bis zum
+# Ende durch, wird die Datei per -c copy mit +faststart (moov vorne, normaler
+# Index) abgelegt; spätere Wiedergaben laufen dann ohne Encoder über
+# handle_range_request. Abgebrochene Sitzungen hinterlassen nichts; Reste
+# (*.tmp) eines abgestürzten Laufs werden beim Start gelöscht.
+# Schlüssel: Pfad-Hash + Dateiversion + Profil. Verdrängung nach mtime (LRU),
+# nur fertige *.mp4 zählen - Zwischendateien enden immer auf .tmp.
+TRANSCODE_CACHE_DIR = os.path.join(PROGRAM_DIR, '.transcode_cache')
+
+def get_transcode_cache_budget():
+    """Byte-Budget des Transcode-Caches aus den Einstellungen."""
+    return max(256, int(get_setting('transcode_cache_mb', 20480))) * 1024 * 1024
+
+def get_transcode_cache_path(filepath, profile):
+    """Cache-Datei der vollständigen Ausgabe (None wenn die Datei fehlt)."""
+    version = get_file_thumbnail_version(filepath)
+    if not version:
+        return None
+    key = hashlib.md5(filepath.encode('utf-8')).hexdigest()
+    return os.path.join(TRANSCODE_CACHE_DIR, f'{key}_{version}_{profile}.mp4')
+
+def get_cached_transcode(filepath, profile):
+    """
+    Liefert die fertige Ausgabe aus dem Cache und markiert sie als benutzt.
+    
+    Returns:
+        str|None: Pfad der Cache-Datei
+    """
+    path = get_transcode_cache_path(filepath, profile)
+    if not path or not os.path.isfile(path):
+        return None
+    with contextlib.suppress(OSError):
+        os.utime(path)  # LRU: mtime = letzte Wiedergabe
+    return path
+
+def cleanup_transcode_cache():
+    """Löscht Zwischendateien (*.tmp) abgebrochener oder abgestürzter Läufe (beim Start)."""
+    if not os.path.isdir(TRANSCODE_CACHE_DIR):
+        return
+    removed = 0
+    for entry in os.scandir(TRANSCODE_CACHE_DIR):
+        if entry.name.endswith('.tmp'):
+            with contextlib.suppress(OSError):
+                os.remove(entry.path)
+                removed += 1
+    if removed:
+        print(f"🧹 Transcode-Cache: {removed} verwaiste Zwischendateien gelöscht")
+
+def open_transcode_cache_file(cache_path):
+    """Öffnet die temporäre Mitschrift einer Sitzung (None bei Fehler)."""
+    try:
+        os.makedirs(TRANSCODE_CACHE_DIR, exist_ok=True)
+        return open(f'{cache_path}.{threading.get_ident()}.tmp', 'wb')
+    except OSError as e:
+        print(f"⚠️ Transcode-Cache nicht verfügbar: {e}")
+        return None
+
+def discard_transcode_cache_file(cache_file):
+    """Schließt und löscht eine unvollständige Mitschrift."""
+    with contextlib.suppress(OSError):
+        cache_file.close()
+    with contextlib.suppress(OSError):
+        os.remove(cache_file.name)
+    return None
+
+def finalize_transcode_cache(tmp_path, cache_path):
+    """
+    Übernimmt eine vollständige Ausgabe in den Cache. Das fragmentierte MP4
+    wird dabei ohne Rekodierung mit +faststart neu geschrieben, damit der
+    Browser Dauer und Index sofort kennt.
+    
+    Args:
+        tmp_path (str): Vollständige fMP4-Mitschrift
+        cache_path (str): Ziel im Cache
+    """
+    start_time = time.time()
+    # Endung .tmp: zählt nicht als Cache-Eintrag (Verdrängung, Status)
+    faststart_path = f'{tmp_path[:-len(".tmp")]}.faststart.tmp'
+    cmd = [
+        FFMPEG_EXECUTABLE,
+        "-hide_banner", "-loglevel", "error",
+        "-i", tmp_path,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        "-f", "mp4",
+        "-y", faststart_path
+    ]
+    try:
+        with FFmpegProcess(cmd, timeout=600, background=True) as process:
+            returncode = process.wait(timeout=600)
+        if returncode == 0 and os.path.isfile(faststart_path) and os.path.getsize(faststart_path) > 0:
+            os.replace(faststart_path, cache_path)
+            os.remove(tmp_path)
+        else:
+            # Fragmentiertes MP4 ist über Range-Requests ebenfalls abspielbar
+            os.replace(tmp_path, cache_path)
+        print(f"💾 Transcode gespeichert: {os.path.basename(cache_path)} "
+              f"({os.path.getsize(cache_path) / (1024*1024):.1f} MB, {time.time() - start_time:.1f}s)")
+    except Exception as e:
+        print(f"⚠️ Transcode-Cache fehlgeschlagen: {e}")
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    finally:
+        with contextlib.suppress(OSError):
+            os.remove(faststart_path)
+    
+    evict_cache_directory(TRANSCODE_CACHE_DIR, get_transcode_cache_budget(), '.mp4')
+
+def evict_cache_directory(directory, budget, suffix):
+    """
+    Löscht die am längsten nicht benutzten Dateien (mtime) eines Cache-
+    Verzeichnisses, sobald das Budget überschritten ist, bis 90% erreicht sind.
+    
+    Args:
+        directory (str): Cache-Verzeichnis
+        budget (int): Byte-Budget
+        suffix (str): Nur Dateien mit dieser Endung
+    
+    Returns:
+        tuple: (belegte Bytes danach, Anzahl gelöschter Dateien)
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            with contextlib.suppress(OSError):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    if total <= budget:
+        return total, 0
+    
+    entries.sort()
+    target = int(budget * THUMBNAIL_EVICT_TARGET)
+    evicted = 0
+    for _, size, path in entries:
+        if total <= target:
+            break
+        with contextlib.suppress(OSError):
+            os.remove(path)
+            total -= size
+            evicted += 1
+    if evicted:
+        print(f"🗑️ {os.path.basename(directory)}: {evicted} alte Dateien verdrängt")
+    return total, evicted
+
+def get_transcode_cache_status():
+    """Anzahl und Belegung der fertig transcodierten Videos."""
+    files = 0
+    total = 0
+    if os.path.isdir(TRANSCODE_CACHE_DIR):
+        for entry in os.scandir(TRANSCODE_CACHE_DIR):
+            if entry.name.endswith('.mp4'):
+                with contextlib.suppress(OSError):
+                    total += entry.stat().st_size
+                    files += 1
+    return {'files': files, 'bytes': total, 'budget': get_transcode_cache_budget()}
+
+def get_playback_method(filepath):
+    """
+    Entscheidet, wie der Player ein Video lädt.
+    
+    Returns:
+        tuple: ('direct' | 'live' | 'hls', Begründung). 'live' ist der
+               fMP4-Stream von /media - nicht spulbar, Start über start=
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in HLS_EXTENSIONS:
+        return 'direct', 'Browser-Format'
+    for profile, _ in STREAM_METHOD_PROFILES.values():
+        if get_cached_transcode(filepath, profile):
+            return 'direct', f'fertig im Transcode-Cache ({profile})'
+    method, reason = choose_stream_method(filepath)
+    if method == 'direct':
+        return 'direct', reason
+    if method != 'transcode':
+        # Remux über /media - kaum CPU, HLS würde voll transcodieren
+        return 'live', f'{method}: {reason}'
+    return 'hls', reason
+
+# -----------------------------------------------------------------------------
+# HLS (SEGMENTE AUF ABRUF - SPULEN IN TRANSCODIERTEN VIDEOS)
+# -----------------------------------------------------------------------------
+
+# Der Live-Stream als fMP4-Pipe kann nicht gespult werden. Im HLS-Modus
+# beschreibt eine Playlist das ganze Video (Dauer aus probe_media) in festen
+# Segmenten; jedes Segment wird erst beim Abruf mit -ss ab seiner Startzeit
+# transcodiert. Ein Sprung in die Mitte kostet damit nur ein Segment.
+# Fertige Segmente liegen in HLS_CACHE_DIR (LRU nach mtime), die nächsten
+# HLS_PREFETCH_SEGMENTS werden im Hintergrund vorbereitet. Jeder Segment-
+# Encoder belegt einen Platz im gemeinsamen Limit (max_transcodes); Abrufe
+# warten kurz auf einen freien Platz, Vorab-Segmente nur bei freiem Platz.
+HLS_SEGMENT_SECONDS = 6
+HLS_PREFETCH_SEGMENTS = 3
+HLS_SEGMENT_TIMEOUT = 120
+HLS_SLOT_WAIT = 15              # Sekunden, die ein Abruf auf einen freien Encoder wartet
+HLS_CACHE_DIR = os.path.join(PROGRAM_DIR, '.hls_cache')
+HLS_EXTENSIONS = INCOMPATIBLE_VIDEO_EXTENSIONS + POTENTIALLY_PROBLEMATIC_MP4   # Server wählt direkt/HLS
+
+hls_cache_bytes = None          # Lazy beim ersten Zugriff ermittelt
+hls_cache_lock = threading.Lock()
+hls_inflight = {}               # {segment_path: threading.Event}
+hls_prefetch_queue = deque()    # [(filepath, version, index)]
+hls_prefetch_condition = threading.Condition()
+hls_prefetch_thread = None
+hls_stats = {'hits': 0, 'encoded': 0, 'prefetched': 0, 'failed': 0, 'evicted': 0, 'busy': 0}
+
+def get_hls_cache_budget():
+    """Byte-Budget des Segment-Caches aus den Einstellungen."""
+    return max(64, int(get_setting('hls_cache_mb', 2048))) * 1024 * 1024
+
+def get_hls_segment_count(duration):
+    """Anzahl Segmente für eine Dauer in Sekunden."""
+    return max(1, int(-(-duration // HLS_SEGMENT_SECONDS)))
+
+def get_hls_segment_path(filepath, version, index):
+    """Cache-Datei eines Segments (Dateiversion im Namen, ersetzte Dateien verfallen)."""
+    key = hashlib.md5(filepath.encode('utf-8')).hexdigest()
+    return os.path.join(HLS_CACHE_DIR, f'{key}_{version}_{index:05d}.ts')
+
+def build_hls_playlist(filepath, version, duration):
+    """
+    Erzeugt die VOD-Playlist eines Videos.
+    
+    Args:
+        filepath (str): Original-Dateipfad
+        version (str): Dateiversion (in den Segment-URLs)
+        duration (float): Dauer in Sekunden
+    
+    Returns:
+        str: M3U8-Inhalt
+    """
+    safe_path = urllib.parse.quote(filepath, safe='')
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{HLS_SEGMENT_SECONDS}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+    ]
+    for index in range(get_hls_segment_count(duration)):
+        length = min(HLS_SEGMENT_SECONDS, duration - index * HLS_SEGMENT_SECONDS)
+        lines.append(f'#EXTINF:{length:.3f},')
+        lines.append(f'segment.ts?filepath={safe_path}&v={version}&i={index}')
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+def build_hls_segment_command(filepath, index, duration):
+    """
+    FFmpeg-Befehl für ein einzelnes Segment (MPEG-TS mit fortlaufenden Zeitstempeln).
+    
+    Args:
+        filepath (str): Quelldatei
+        index (int): Segment-Nummer
+        duration (float): Gesamtdauer in Sekunden
+    
+    Returns:
+        list: FFmpeg-Argumente (Ausgabe auf pipe:1)
+    """
+    start = index * HLS_SEGMENT_SECONDS
+    length = min(HLS_SEGMENT_SECONDS, duration - start)
+    cmd = [
+        FFMPEG_EXECUTABLE,
+        "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}",
+        "-i", filepath,
+        "-t", f"{length:.3f}",
+    ]
+    cmd.extend(get_transcode_stream_maps(filepath))
+    cmd.extend([
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-pix_fmt", "yuv420p",
+        "-profile:v", "main",
+        "-force_key_frames", "expr:eq(n,0)",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-ar", "48000",
+        "-ac", "2",
+        "-output_ts_offset", f"{start:.3f}",
+        "-muxdelay", "0",
+        "-f", "mpegts",
+        "pipe:1"
+    ])
+    return cmd
+
+def init_hls_cache():
+    """Legt das Cache-Verzeichnis an und ermittelt die belegten Bytes (einmalig)."""
+    global hls_cache_bytes
+    
+    with hls_cache_lock:
+        if hls_cache_bytes is not None:
+            return
+        os.makedirs(HLS_CACHE_DIR, exist_ok=True)
+        total = 0
+        for entry in os.scandir(HLS_CACHE_DIR):
+            if entry.name.endswith('.tmp'):
+                # Abgebrochene Segmente vom letzten Lauf
+                with contextlib.suppress(OSError):
+                    os.remove(entry.path)
+            elif entry.is_file():
+                total += entry.stat().st_size
+        hls_cache_bytes = total
+
+def evict_hls_segments():
+    """Löscht die am längsten nicht abgerufenen Segmente bis 90% des Budgets."""
+    global hls_cache_bytes
+    
+    budget = get_hls_cache_budget()
+    with hls_cache_lock:
+        if hls_cache_bytes <= budget:
+            return
+        hls_cache_bytes, evicted = evict_cache_directory(HLS_CACHE_DIR, budget, '.ts')
+        hls_stats['evicted'] += evicted
+
+def acquire_hls_encoder_slot(wait):
+    """
+    Belegt einen Encoder-Platz für ein Segment (gemeinsames Limit mit
+    Live-Transcodes, Sitzungen ohne Clients werden wie dort freigegeben).
+    
+    Args:
+        wait (float): Max. Wartezeit in Sekunden (0 = nur wenn sofort frei)
+    
+    Returns:
+        bool: True wenn belegt (mit release_hls_encoder_slot freigeben)
+    """
+    global hls_encoders_active
+    
+    deadline = time.time() + wait
+    while True:
+        with transcode_sessions_lock:
+            if count_active_encoders() >= get_transcode_limit():
+                for idle in [s for s in transcode_sessions_all if not s.consumers]:
+                    stop_transcode_session(idle)
+            if count_active_encoders() < get_transcode_limit():
+                hls_encoders_active += 1
+                return True
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.25)
+
+def release_hls_encoder_slot():
+    """Gibt einen mit acquire_hls_encoder_slot belegten Platz frei."""
+    global hls_encoders_active
+    with transcode_sessions_lock:
+        hls_encoders_active -= 1
+
+def encode_hls_segment(filepath, version, index, duration, prefetch=False):
+    """
+    Transcodiert ein Segment in den Cache. Gleichzeitige Anfragen für dasselbe
+    Segment warten auf den ersten Encoder.
+    
+    Args:
+        filepath (str): Quelldatei
+        version (str): Dateiversion
+        index (int): Segment-Nummer
+        duration (float): Gesamtdauer in Sekunden
+        prefetch (bool): Aufruf aus dem Vorab-Worker
+    
+    Returns:
+        str|None|bool: Pfad der Segment-Datei, None bei Fehler oder False wenn
+                       kein Encoder-Platz frei wurde
+    """
+    global hls_cache_bytes
+    
+    init_hls_cache()
+    path = get_hls_segment_path(filepath, version, index)
+    
+    with hls_cache_lock:
+        if os.path.isfile(path):
+            return path
+        event = hls_inflight.get(path)
+        owner = event is None
+        if owner:
+            event = hls_inflight[path] = threading.Event()
+    
+    if not owner:
+        event.wait(HLS_SEGMENT_TIMEOUT)
+        return path if os.path.isfile(path) else None
+    
+    if not acquire_hls_encoder_slot(0 if prefetch else HLS_SLOT_WAIT):
+        with hls_cache_lock:
+            hls_inflight.pop(path, None)
+        event.set()
+        hls_stats['busy'] += 1
+        if not prefetch:
+            print(f"⛔ HLS-Segment {index}: Transcode-Limit erreicht ({get_transcode_limit()})")
+        return False
+    
+    start_time = time.time()
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    try:
+        cmd = build_hls_segment_command(filepath, index, duration)
+        with FFmpegProcess(cmd, timeout=HLS_SEGMENT_TIMEOUT, live=True) as process:
+            data = process.stdout.read()
+        
+        # MPEG-TS besteht aus 188-Byte-Paketen mit Sync-Byte 0x47
+        if len(data) < 188 or data[0] != 0x47:
+            hls_stats['failed'] += 1
+            print(f"⚠️ HLS-Segment {index} leer für {os.path.basename(filepath)}")
+            return None
+        
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with hls_cache_lock:
+            hls_cache_bytes += len(data)
+        hls_stats['prefetched' if prefetch else 'encoded'] += 1
+        print(f"🧩 HLS-Segment {index} {'vorab ' if prefetch else ''}erstellt: "
+              f"{os.path.basename(filepath)} ({len(data) / 1024:.0f} KB, {time.time() - start_time:.1f}s)")
+    except Exception as e:
+        hls_stats['failed'] += 1
+        print(f"⚠️ HLS-Segment {index} fehlgeschlagen für {os.path.basename(filepath)}: {e}")
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return None
+    finally:
+        release_hls_encoder_slot()
+        with hls_cache_lock:
+            hls_inflight.pop(path, None)
+        event.set()
+    
+    evict_hls_segments()
+    return path
+
+def get_hls_segment(filepath, version, index, duration):
+    """
+    Liefert die Cache-Datei eines Segments (erzeugt sie bei Bedarf) und
+    reiht die folgenden Segmente zur Vorab-Erzeugung ein.
+    
+    Returns:
+        str|None|bool: Pfad der Segment-Datei (None/False wie encode_hls_segment)
+    """
+    init_hls_cache()
+    path = get_hls_segment_path(filepath, version, index)
+    if os.path.isfile(path):
+        hls_stats['hits'] += 1
+        with contextlib.suppress(OSError):
+            os.utime(path)  # LRU: mtime = letzter Abruf
+    else:
+        path = encode_hls_segment(filepath, version, index, duration)
+        if path is False:
+            return path
+    
+    count = get_hls_segment_count(duration)
+    queue_hls_prefetch(filepath, version,
+                       range(index + 1, min(count, index + 1 + HLS_PREFETCH_SEGMENTS)))
+    return path
+
+def queue_hls_prefetch(filepath, version, indexes):
+    """
+    Reiht Segmente zur Vorab-Erzeugung ein. Nach einem Sprung verfallen die
+    alten Einträge derselben Datei, damit der Worker nicht veraltet arbeitet.
+    """
+    global hls_prefetch_thread
+    
+    indexes = list(indexes)
+    with hls_prefetch_condition:
+        stale = [item for item in hls_prefetch_queue if item[0] == filepath and item[2] not in indexes]
+        for item in stale:
+            hls_prefetch_queue.remove(item)
+        for index in indexes:
+            item = (filepath, version, index)
+            if item not in hls_prefetch_queue:
+                hls_prefetch_queue.append(item)
+        if hls_prefetch_thread is None:
+            hls_prefetch_thread = threading.Thread(target=hls_prefetch_worker, daemon=True)
+            hls_prefetch_thread.start()
+        hls_prefetch_condition.notify()
+
+def hls_prefetch_worker():
+    """Erzeugt eingereihte Segmente nacheinander."""
+    while True:
+        with hls_prefetch_condition:
+            while not hls_prefetch_queue:
+                hls_prefetch_condition.wait()
+            filepath, version, index = hls_prefetch_queue.popleft()
+        
+        if os.path.isfile(get_hls_segment_path(filepath, version, index)):
+            continue
+        duration = get_media_duration(filepath)
+        if duration > 0:
+            encode_hls_segment(filepath, version, index, duration, prefetch=True)
+
+def get_hls_status():
+    """Zähler und Belegung des Segment-Caches."""
+    with hls_prefetch_condition:
+        queued = len(hls_prefetch_queue)
+    return {
+        'queued': queued,
+        'cache_bytes': hls_cache_bytes or 0,
+        'budget': get_hls_cache_budget(),
+        **hls_stats
+    }
 
 # -----------------------------------------------------------------------------
 # ERWEITERTE HTTP REQUEST HANDLER (REST API + FILE SERVING)
@@ -3541,6 +7846,10 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
             self.handle_thumbnail_request(query_params)
             return
 
+        elif path == '/thumbnail_atlas':
+            self.handle_thumbnail_atlas_request(query_params)
+            return
+        
         elif path == '/media':
             self.handle_media_request(query_params)
             return
@@ -3550,7 +7859,7 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
             return
 
         elif path == '/clear_cache':
-            self.clear_thumbnail_cache()
+            self.clear_thumbnail_cache(query_params)
             return
 
         elif path == '/api/media':
@@ -3589,6 +7898,44 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
         elif path == '/api/resume':
             self.handle_api_resume(query_params)
             return
+        
+        elif path in ('/trickplay.vtt', '/trickplay.jpg'):
+            self.handle_trickplay_request(query_params, path.endswith('.vtt'))
+            return
+        
+        elif path == '/api/playback':
+            self.handle_api_playback(query_params)
+            return
+        
+        elif path == '/hls/playlist.m3u8':
+            self.handle_hls_playlist(query_params)
+            return
+        
+        elif path == '/hls/segment.ts':
+            self.handle_hls_segment(query_params)
+            return
+        
+        elif path == '/api/transcodes':
+            self.send_json_response({
+                'success': True,
+                **get_transcode_sessions_status(),
+                'hls': get_hls_status(),
+                'cache': get_transcode_cache_status()
+            })
+            return
+        
+        elif path == '/metrics':
+            data = get_transcode_metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        
+        elif path == '/api/thumbnails/status':
+            self.send_json_response({'success': True, **get_thumbnail_pregeneration_status()})
+            return
 
         else:
             self.send_error(404, "Nicht gefunden")
@@ -3639,13 +7986,28 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
         from html import unescape
         filepath = unescape(filepath)
 
+        # Variante aus ?w= und Accept-Header
+        width = snap_thumbnail_width(query_params.get('w', [None])[0])
+        fmt = negotiate_thumbnail_format(self.headers.get('Accept'))
+        variant = get_thumbnail_variant_name(width, fmt)
+        url_version = query_params.get('v', [None])[0]
+        
+        # Kürzlich geprüft und im RAM: ohne Pfad-, stat- und DB-Prüfung ausliefern
+        cached = thumbnail_memory_get_validated(filepath, variant, url_version)
+        if cached:
+            data, version = cached
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
+            return
+        
         # Sicherheitsprüfung
         real_path = os.path.realpath(filepath)
         if not os.path.isfile(real_path):
             self.send_error(403, "Ungültiger Pfad")
             return
+        version = get_file_thumbnail_version(real_path)
 
-        # In Datenbank prüfen
+        # In Datenbank prüfen (Katalogversion vorher lesen: gilt für das Prüfergebnis)
+        catalog_version = get_catalog_source_version()
         try:
             conn = sqlite3.connect(DB_PATH)
             cursor = conn.cursor()
@@ -3662,14 +8024,23 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
                 return
         except Exception as e:
             print(f"⚠️ Datenbankfehler bei Thumbnail-Prüfung: {e}")
+            catalog_version = None   # Nicht geprüft: nicht als Prüfergebnis merken
 
+        # Geprüft und im RAM (gleiche Dateiversion): ohne Neuberechnung ausliefern
+        data = thumbnail_memory_get(filepath, variant, version, checked=catalog_version)
+        if data:
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
+            return
+        
         # Thumbnail generieren oder holen
-        thumb_path = generate_or_get_thumbnail(filepath)
+        data = get_thumbnail_variant(filepath, width, fmt, version=version)
 
-        if thumb_path and os.path.exists(thumb_path):
-            self.serve_file(thumb_path, 'image/jpeg')
+        if data:
+            thumbnail_memory_put(filepath, data, variant, version, checked=catalog_version)
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
         else:
-            self.serve_color_thumbnail(filepath)
+            # Noch in Arbeit: Platzhalter nicht cachen, damit der Browser erneut fragt
+            self.serve_color_thumbnail(filepath, cacheable=not is_thumbnail_pending(filepath))
 
     def handle_range_request(self, filepath, content_type, range_header):
         """Handle HTTP Range Requests für effizientes Video-Seeking mit adaptiven Chunks."""
@@ -3814,10 +8185,12 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
         except Exception as e:
             print(f"⚠️ Datenbankfehler bei Medien-Prüfung: {e}")
 
-        # Datei existiert?
+        # Datei existiert? (Rebuild prüft nicht mehr jede Datei)
         if not os.path.isfile(filepath):
+            mark_file_missing(filepath)
             self.send_error(404, "Datei nicht gefunden")
             return
+        clear_file_missing(filepath)
 
         # MIME-Type frühzeitig bestimmen
         ext = os.path.splitext(filepath)[1].lower()
@@ -3848,109 +8221,31 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
         # Range-Header frühzeitig prüfen (für alle anderen Dateien)
         range_header = self.headers.get('Range')
         
-        # SPEZIALBEHANDLUNG FÜR FLV: Prüfe ob Transcoding wirklich nötig ist
-        if ext == '.flv' and FFPROBE_EXECUTABLE:
-            try:
-                # Prüfe Video-Codec
-                video_cmd = [
-                    FFPROBE_EXECUTABLE,
-                    '-v', 'error',
-                    '-select_streams', 'v:0',
-                    '-show_entries', 'stream=codec_name',
-                    '-of', 'default=noprint_wrappers=1:nokey=1',
-                    filepath
-                ]
-                video_result = subprocess.run(video_cmd, capture_output=True, text=True, timeout=3)
-                video_codec = video_result.stdout.strip().lower()
-                
-                # Prüfe Audio-Codec
-                audio_cmd = [
-                    FFPROBE_EXECUTABLE,
-                    '-v', 'error',
-                    '-select_streams', 'a:0',
-                    '-show_entries', 'stream=codec_name',
-                    '-of', 'default=noprint_wrappers=1:nokey=1',
-                    filepath
-                ]
-                audio_result = subprocess.run(audio_cmd, capture_output=True, text=True, timeout=3)
-                audio_codec = audio_result.stdout.strip().lower()
-                
-                print(f"   🔍 FLV Codec-Analyse: Video={video_codec}, Audio={audio_codec}")
-                
-                # Wenn bereits kompatible Codecs: Nur Remuxing, kein Transcoding
-                if video_codec == 'h264' and audio_codec in ['aac', 'mp3']:
-                    print(f"   ✅ FLV mit kompatiblen Codecs - Remuxing statt Transcoding")
-                    
-                    # Range-Request für remuxtes FLV
-                    if range_header:
-                        print(f"🎯 Range-Request für FLV-Remux: {range_header}")
-                        # Temporäre Remuxing-Funktion aufrufen
-                        self.stream_flv_remuxed(filepath, range_header)
-                        return
-                    
-                    # Direktes Remuxing
-                    self.stream_flv_remuxed(filepath)
-                    return
-                    
-            except Exception as e:
-                print(f"⚠️ FLV-Codec-Prüfung fehlgeschlagen: {e}")
-                # Fallback: Normales Transcoding
-                pass
-        
-        # Immer transcodieren: MKV, AVI, WMV, etc. (außer FLV mit kompatiblen Codecs)
-        if ext in INCOMPATIBLE_VIDEO_EXTENSIONS:
-            print(f"🔁 Live-Transcoding gestartet für: {os.path.basename(filepath)}")
-            stream_video_transcoded(self, filepath)
-            return
-
-        # MP4: Intelligente Entscheidung basierend auf Browser-Kompatibilität
-        if ext in POTENTIALLY_PROBLEMATIC_MP4:
-            # Range-Request für MP4s direkt behandeln
-            if range_header:
-                print(f"🎯 Range-Request für MP4: {range_header}")
-                self.handle_range_request(filepath, mime_type, range_header)
-                return
-                
-            # Prüfe ob es ein natives Browser-MP4 ist (H.264 + AAC)
-            try:
-                if not FFPROBE_EXECUTABLE:
-                    print(f"⚠️ FFprobe nicht verfügbar, transcodiere zur Sicherheit")
-                    stream_video_transcoded(self, filepath)
-                    return
-                    
-                # Schnelle FFprobe-Prüfung der Codecs
-                probe_cmd = [
-                    FFPROBE_EXECUTABLE,
-                    '-v', 'error',
-                    '-select_streams', 'v:0',
-                    '-show_entries', 'stream=codec_name',
-                    '-of', 'default=noprint_wrappers=1:nokey=1',
-                    filepath
-                ]
-                
-                video_codec = subprocess.run(
-                    probe_cmd, 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=3
-                ).stdout.strip()
-                
-                # Wenn nicht H.264, transcodieren
-                if video_codec != 'h264':
-                    print(f"🔄 MP4-Transcoding (Codec: {video_codec}): {os.path.basename(filepath)}")
-                    stream_video_transcoded(self, filepath)
-                    return
+        # Codec-basierte Entscheidung: direkt, Container-Wechsel, nur Audio oder volles Transcoding
+        if ext in INCOMPATIBLE_VIDEO_EXTENSIONS or ext in POTENTIALLY_PROBLEMATIC_MP4:
+            method, reason = choose_stream_method(filepath)
+            print(f"   🧭 Wiedergabe-Weg: {method} ({reason})")
+            
+            if method == 'direct':
+                if ext == '.webm':
+                    mime_type = 'video/webm'
+                if range_header:
+                    print(f"🎯 Range-Request (direkt): {range_header}")
+                    self.handle_range_request(filepath, mime_type, range_header)
                 else:
-                    print(f"✅ Native MP4 (H.264): {os.path.basename(filepath)}")
-                    # Direktes Streaming für natives MP4
+                    print(f"📤 Direktes Streaming: {os.path.basename(filepath)}")
                     self.serve_file(filepath, mime_type)
-                    return
-                    
-            except Exception as e:
-                # Bei Fehler: Sicherheitshalber transcodieren
-                print(f"⚠️ Codec-Prüfung fehlgeschlagen, transcodiere zur Sicherheit: {e}")
-                stream_video_transcoded(self, filepath)
                 return
+            
+            start = get_stream_start(filepath, query_params)
+            if method == 'transcode':
+                stream_video_transcoded(self, filepath, start, get_bandwidth_hint(query_params))
+                return
+            profile, build_command = STREAM_METHOD_PROFILES[method]
+            print(f"🔁 Live-{method} gestartet für: {os.path.basename(filepath)}"
+                  + (f" ab {start:.1f}s" if start else ""))
+            stream_transcode_session(self, filepath, profile, build_command, start=start)
+            return
         
         # Direktes Streaming für native Browser-Formate (MP4, WebM)
         if ext in NATIVE_BROWSER_EXTENSIONS:
@@ -3968,95 +8263,221 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
         print(f"📁 Allgemeine Datei: {os.path.basename(filepath)}")
         self.serve_file(filepath, mime_type)
 
-    def stream_flv_remuxed(self, filepath, range_header=None):
+    def handle_static_thumbnail(self, path):
+        """Liefert statische Thumbnails (/thumbnails/<md5>.jpg) aus dem Thumbnail-Speicher."""
+        thumb_name = os.path.basename(path)
+        key = os.path.splitext(thumb_name)[0]
+        if not re.fullmatch(r'[0-9a-f]{32}', key):
+            self.send_error(403, "Ungültiger Thumbnail-Name")
+            return
+
+        data = thumbnail_store_get_by_key(key)
+        if data:
+            self.send_thumbnail_data(data)
+        else:
+            self.send_error(404, "Thumbnail nicht gefunden")
+    
+    def resolve_video_request(self, query_params):
         """
-        Remuxt FLV-Dateien mit kompatiblen Codecs (H.264 + AAC/MP3) zu MP4.
-        Kein Transcoding, nur Container-Wechsel.
+        Prüft den filepath-Parameter einer Video-Anfrage (Endung, Existenz, DB).
+        Sendet bei Fehlern selbst die Antwort.
+        
+        Returns:
+            str|None: Dateipfad oder None
         """
-        print(f"🔄 FLV-Remuxing für: {os.path.basename(filepath)}")
+        filepath = query_params.get('filepath', [None])[0]
+        if not filepath:
+            self.send_error(400, "Kein Dateipfad angegeben")
+            return None
+        filepath = html.unescape(urllib.parse.unquote(filepath))
+        
+        if os.path.splitext(filepath)[1].lower() not in VIDEO_EXTENSIONS:
+            self.send_error(404, "Kein Video")
+            return None
+        if not os.path.isfile(os.path.realpath(filepath)):
+            self.send_error(403, "Ungültiger Pfad")
+            return None
+        try:
+            with MainDBConnection() as cursor:
+                cursor.execute("SELECT COUNT(*) FROM media_files WHERE filepath = ?", (filepath,))
+                if cursor.fetchone()[0] == 0:
+                    self.send_error(403, "Datei nicht in der Datenbank")
+                    return None
+        except Exception as e:
+            print(f"⚠️ Datenbankfehler bei Video-Prüfung: {e}")
+        return filepath
+    
+    def handle_trickplay_request(self, query_params, is_vtt):
+        """
+        Liefert WebVTT-Spur oder Sprite-Sheet der Zeitleisten-Vorschau.
+        Fehlt beides, wird die Erzeugung eingereiht und 202 gesendet.
+        """
+        filepath = self.resolve_video_request(query_params)
+        if not filepath:
+            return
+        
+        version = get_file_thumbnail_version(os.path.realpath(filepath))
+        data = thumbnail_store_get(filepath, TRICKPLAY_VTT if is_vtt else TRICKPLAY_SPRITE, version)
+        if not data:
+            queue_trickplay(filepath, urgent=True)
+            self.send_response(202)
+            self.send_header('Content-Length', '0')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            return
+        
+        etag = f'"{version}"'
+        if is_vtt and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
         
         try:
-            if not os.path.exists(filepath):
-                self.send_error(404, "Datei nicht gefunden")
-                return
-            
-            # FFmpeg Remuxing-Befehl (schnell, ohne Qualitätsverlust)
-            cmd = [
-                FFMPEG_EXECUTABLE,
-                '-i', filepath,
-                '-c', 'copy',          # Keine Rekodierung
-                '-movflags', 'frag_keyframe+empty_moov+default_base_moof',
-                '-f', 'mp4',
-                'pipe:1'
-            ]
-            
-            print(f"   🚀 FFmpeg Remuxing: {' '.join(cmd[:5])}...")
-            
             self.send_response(200)
-            self.send_header("Content-Type", "video/mp4")
-            self.send_header("Cache-Control", "no-cache")
-            self.send_header("X-Content-Type-Options", "nosniff")
-            self.send_header("Accept-Ranges", "none")
+            self.send_header('Content-Type', 'text/vtt; charset=utf-8' if is_vtt else 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            if is_vtt:
+                # URL ohne Version: immer nachfragen (neu erzeugte Sheets sofort sichtbar)
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('ETag', etag)
+            elif query_params.get('v', [None])[0]:
+                self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            else:
+                self.send_header('Cache-Control', 'public, max-age=86400')
             self.end_headers()
-            
-            with FFmpegProcess(cmd, timeout=300) as process:
-                bytes_sent = 0
-                
-                try:
-                    while True:
-                        data = process.stdout.read(65536)
-                        if not data:
-                            break
-                        
-                        try:
-                            self.wfile.write(data)
-                            self.wfile.flush()
-                            bytes_sent += len(data)
-                            
-                            if bytes_sent % (10 * 1024 * 1024) < 65536:
-                                print(f"   📊 Gesendet: {bytes_sent / (1024*1024):.1f} MB")
-                                
-                        except (ConnectionResetError, BrokenPipeError, OSError) as e:
-                            print(f"ℹ️ Client hat Verbindung getrennt nach {bytes_sent / (1024*1024):.1f} MB")
-                            break
-                
-                except Exception as e:
-                    print(f"❌ FLV-Remuxing-Fehler: {e}")
-            
-            print(f"✅ FLV-Remuxing beendet: {os.path.basename(filepath)} ({bytes_sent / (1024*1024):.1f} MB)")
-            
+            self.wfile.write(data)
+        except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError, OSError):
+            print(f"ℹ️ Client-Abbruch bei Trickplay")
+    
+    def handle_api_playback(self, query_params):
+        """Teilt dem Player mit, ob er /media direkt oder die HLS-Playlist laden soll."""
+        filepath = self.resolve_video_request(query_params)
+        if not filepath:
+            return
+        method, reason = get_playback_method(filepath)
+        # Live-Streams starten am Keyframe (auch der /media-Fallback bei HLS);
+        # direkte Dateien spult der Player selbst
+        start = get_stream_start(filepath, query_params) if method != 'direct' else 0.0
+        print(f"▶️ Wiedergabe {os.path.basename(filepath)}: {method} ({reason})"
+              + (f" ab {start:.1f}s" if start else ""))
+        self.send_json_response({'success': True, 'method': method, 'reason': reason,
+                                 'start': start, 'duration': get_media_duration(filepath)})
+    
+    def handle_hls_playlist(self, query_params):
+        """Liefert die HLS-Playlist eines Videos (Segmente entstehen erst beim Abruf)."""
+        filepath = self.resolve_video_request(query_params)
+        if not filepath:
+            return
+        
+        duration = get_media_duration(filepath)
+        if duration <= 0:
+            # Ohne Dauer keine Playlist - Client fällt auf /media zurück
+            self.send_error(404, "Dauer unbekannt")
+            return
+        
+        version = get_file_thumbnail_version(filepath)
+        data = build_hls_playlist(filepath, version, duration).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(data)
+        except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError, OSError):
+            print(f"ℹ️ Client-Abbruch bei HLS-Playlist")
+    
+    def handle_hls_segment(self, query_params):
+        """Liefert ein HLS-Segment aus dem Cache oder transcodiert es auf Abruf."""
+        filepath = self.resolve_video_request(query_params)
+        if not filepath:
+            return
+        
+        try:
+            index = int(query_params.get('i', [''])[0])
+        except ValueError:
+            self.send_error(400, "Ungültige Segment-Nummer")
+            return
+        duration = get_media_duration(filepath)
+        if index < 0 or index >= get_hls_segment_count(duration):
+            self.send_error(404, "Segment nicht vorhanden")
+            return
+        
+        version = get_file_thumbnail_version(filepath)
+        path = get_hls_segment(filepath, version, index, duration)
+        if path is False:
+            # Alle Encoder belegt - hls.js wiederholt den Abruf
+            self.send_response(503)
+            self.send_header("Retry-After", str(TRANSCODE_RETRY_AFTER))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if not path:
+            self.send_error(500, "Segment konnte nicht erstellt werden")
+            return
+        
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp2t')
+            self.send_header('Content-Length', str(len(data)))
+            if query_params.get('v', [None])[0] == version:
+                self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+            else:
+                self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(data)
+        except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError):
+            print(f"ℹ️ Client-Abbruch bei HLS-Segment {index}")
+        except OSError as e:
+            print(f"⚠️ HLS-Segment {index} nicht lesbar: {e}")
+    
+    def handle_thumbnail_atlas_request(self, query_params):
+        """
+        Liefert das Sammelbild einer Grid-Seite. Der Hash beschreibt den
+        Seiteninhalt vollständig, die Antwort ist daher unbegrenzt cachebar.
+        """
+        atlas_hash = query_params.get('h', [''])[0]
+        if not re.fullmatch(r'[0-9a-f]{20}', atlas_hash):
+            self.send_error(400, "Ungültiger Atlas-Hash")
+            return
+        
+        fmt = negotiate_thumbnail_format(self.headers.get('Accept', ''))
+        try:
+            data = get_thumbnail_atlas(atlas_hash, fmt)
         except Exception as e:
-            print(f"❌ Kritischer FLV-Remuxing-Fehler: {e}")
-            import traceback
-            traceback.print_exc()
-
-    def handle_static_thumbnail(self, path):
-        """Liefert statische Thumbnails aus Cache."""
-        thumb_name = os.path.basename(path)
-        if not thumb_name:
-            self.send_error(403, "Ungültiger Thumbnail-Name")
+            print(f"❌ Atlas-Fehler: {e}")
+            data = None
+        if not data:
+            # Unbekannt (z.B. nach Neustart) - Client lädt Einzel-Thumbnails
+            self.send_error(404, "Atlas nicht gefunden")
             return
-
-        thumb_path = os.path.join(THUMBNAIL_DIR, thumb_name)
-        if os.path.isfile(thumb_path):
-            try:
-                with open(thumb_path, 'rb') as f:
-                    data = f.read()
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'image/jpeg')
-                    self.send_header('Content-Length', str(len(data)))
-                    self.send_header('Cache-Control', 'public, max-age=31536000')  # 1 Jahr Cache
-                    self.send_header('Expires', 'Fri, 01 Jan 2026 00:00:00 GMT')
-                    self.end_headers()
-                    self.wfile.write(data)
-                    print(f"✅ Statisches Thumbnail: {thumb_name}")
-            except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError, OSError):
-                # Client-Abbruch ignorieren
-                print(f"ℹ️ Client-Abbruch bei statischem Thumbnail")
-            except Exception as e:
-                print(f"⚠️ Statisches Thumbnail-Fehler: {e}")
-        else:
-            self.send_error(404, "Thumbnail nicht gefunden")
+        self.send_thumbnail_data(data, versioned=True)
+    
+    def send_thumbnail_data(self, data, versioned=False):
+        """
+        Sendet Thumbnail-Bytes aus dem Speicher.
+        Versionierte URLs (?v=) ändern sich mit der Datei und dürfen daher
+        unbegrenzt gecacht werden, alle anderen nur einen Tag.
+        """
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', get_image_mime_type(data))
+            self.send_header('Content-Length', str(len(data)))
+            if versioned:
+                self.send_header('Cache-Control', 'public, max-age=31536000, immutable')  # 1 Jahr Cache
+            else:
+                self.send_header('Cache-Control', 'public, max-age=86400')
+            self.send_header('Vary', 'Accept')  # Format hängt vom Accept-Header ab
+            self.end_headers()
+            self.wfile.write(data)
+        except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError, OSError):
+            # Client-Abbruch ignorieren
+            print(f"ℹ️ Client-Abbruch bei Thumbnail")
+        except Exception as e:
+            print(f"⚠️ Thumbnail-Sendefehler: {e}")
 
     def handle_api_media_request(self, query_params):
         """API-Endpoint für Medien-Listen mit Filtern."""
@@ -4090,10 +8511,17 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
                 cursor, category, genre, subgenre, series, season, year, search, page, 50
             )
             
-            # Medien anreichern
+            # Thumbnails der angezeigten Seite zuerst vorgenerieren
+            add_thumbnail_versions(media_list)
+            page_paths = [media.get('filepath', '') for media in media_list]
+            if thumbnail_pregen_thread is not None:
+                queue_thumbnail_pregeneration(page_paths, THUMBNAIL_PRIORITY_PAGE)
+            
+            # Medien anreichern (eine Cache-Abfrage für die ganze Seite)
+            hierarchies = load_cached_hierarchies(page_paths)
             enriched_media = []
             for media in media_list:
-                enriched = enrich_media_data(media, use_cache=True)
+                enriched = enrich_media_data(media, use_cache=True, hierarchies=hierarchies)
                 enriched_media.append(enriched)
             
             conn.close()
@@ -4105,7 +8533,8 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
                 'total_pages': total_pages,
                 'total_count': total_count,
                 'media': enriched_media,
-                'page_size': 50
+                'page_size': 50,
+                'atlas': get_thumbnail_atlas_layout(media_list)
             }
             
             print(f"   ✅ Response: {total_count} Medien, {total_pages} Seiten")
@@ -4607,6 +9036,8 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
                 'volume_level': get_setting('volume_level', 0.7),
                 'audio_language': get_setting('audio_language', 'ger'),
                 'autoplay_enabled': get_setting('autoplay_enabled', False),
+                'rebuild_existence_check': get_existence_check_mode(),
+                'stat_workers_per_volume': get_setting('stat_workers_per_volume', 4),
                 'active_clients': len(active_clients),
                 'local_ip': get_local_ip() if get_setting('network_mode') == 'network' else None,
                 'server_host': get_server_host(),
@@ -5029,8 +9460,8 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
             except:
                 pass
 
-    def serve_color_thumbnail(self, filepath):
-        """Liefert farbiges Fallback-Thumbnail als SVG."""
+    def serve_color_thumbnail(self, filepath, cacheable=True):
+        """Liefert farbiges Fallback-Thumbnail als SVG (cacheable=False: kein Browser-Cache)."""
         try:
             color = get_thumbnail_color(filepath)
             icon = get_file_extension_icon(filepath)
@@ -5048,7 +9479,10 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-Type', 'image/svg+xml')
             self.send_header('Content-Length', str(len(svg_bytes)))
-            self.send_header('Cache-Control', 'public, max-age=86400')
+            if cacheable:
+                self.send_header('Cache-Control', 'public, max-age=86400')
+            else:
+                self.send_header('Cache-Control', 'no-store')
             self.end_headers()
 
             self.wfile.write(svg_bytes)
@@ -5064,14 +9498,13 @@ class ExtendedMediaHTTPRequestHandler(BaseHTTPRequestHandler):
             except:
                 pass
 
-    def clear_thumbnail_cache(self):
-        """Löscht den Thumbnail-Cache."""
+    def clear_thumbnail_cache(self, query_params=None):
+        """Löscht den Thumbnail-Cache (optional nur ?prefix=<pfad> oder ?category=<kategorie>)."""
         try:
-            count = 0
-            for filename in os.listdir(THUMBNAIL_DIR):
-                if filename.endswith('.jpg'):
-                    os.remove(os.path.join(THUMBNAIL_DIR, filename))
-                    count += 1
+            query_params = query_params or {}
+            prefix = query_params.get('prefix', [''])[0] or None
+            category = query_params.get('category', [''])[0] or None
+            count = invalidate_thumbnails(prefix=prefix, category=category)
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
@@ -5118,7 +9551,9 @@ def generate_media_cards(media_list, is_latest=False, use_grid=False):
         icon = get_category_icon(category)
         bg_style = 'background: linear-gradient(45deg, #e74c3c, #c0392b);' if is_latest else ''
         safe_path = urllib.parse.quote(filepath, safe='')
-        thumbnail_url = f'/thumbnail?filepath={safe_path}'
+        thumbnail_version = media.get('thumbnail_version') or get_file_thumbnail_version(filepath)
+        thumbnail_url = f'/thumbnail?filepath={safe_path}' + (f'&amp;v={thumbnail_version}' if thumbnail_version else '')
+        thumbnail_srcset = ', '.join(f'{thumbnail_url}&amp;w={w} {w}w' for w in THUMBNAIL_WIDTHS)
         
         # Resume-Point prüfen
         resume_info = ''
@@ -5130,7 +9565,7 @@ def generate_media_cards(media_list, is_latest=False, use_grid=False):
         card = f'''
         <div class="media-card" data-filepath="{escape_html(safe_path)}" data-filename="{filename_js}" data-category="{category_js}" {resume_info} onclick="playMediaFromCard(this)">
             <div class="media-thumbnail" style="{bg_style}">
-                <img src="{thumbnail_url}" alt="{filename}" style="width:100%;height:100%;object-fit:cover;">
+                <img src="{thumbnail_url}&amp;w=320" srcset="{thumbnail_srcset}" sizes="{THUMBNAIL_SIZES}" alt="{filename}" loading="lazy" style="width:100%;height:100%;object-fit:cover;">
                 {f'<div class="resume-badge" title="Fortsetzen bei {resume_point["timestamp"]}"><i class="fas fa-play-circle"></i></div>' if resume_point else ''}
             </div>
             <div class="media-info-overlay">
@@ -5785,6 +10220,15 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
         .media-card:hover .media-thumbnail img {{
             transform: scale(1.1);
         }}
+        .atlas-thumb {{
+            width: 100%;
+            height: 100%;
+            background-repeat: no-repeat;
+            transition: transform 0.3s;
+        }}
+        .media-card:hover .media-thumbnail .atlas-thumb {{
+            transform: scale(1.1);
+        }}
         .resume-badge {{
             position: absolute;
             top: 10px;
@@ -6090,6 +10534,17 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             background: #000;
             border-radius: 10px;
             overflow: hidden;
+            position: relative;
+        }}
+        .trickplay-preview {{
+            position: absolute;
+            display: none;
+            pointer-events: none;
+            background-repeat: no-repeat;
+            border: 2px solid #fff;
+            border-radius: 4px;
+            box-shadow: var(--shadow);
+            z-index: 5;
         }}
         .video-player {{
             width: 100%;
@@ -6774,6 +11229,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             <video class="video-player" id="videoPlayer" controls>
                 Ihr Browser unterstützt das Video-Tag nicht.
             </video>
+            <div class="trickplay-preview" id="trickplayPreview"></div>
             <div class="video-info">
                 <h3 id="videoTitle">Video</h3>
                 <div id="videoInfo"></div>
@@ -6821,6 +11277,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
         </div>
     </footer>
     <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/hls.js@1.5.7/dist/hls.min.js"></script>
     <script>
         const allMedia = {all_media_json_str};
         const categoryData = {category_data_json};
@@ -6856,6 +11313,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
         let currentMediaQueue = [];
         let currentMediaIndex = -1;
         let currentMediaInfo = null;
+        let currentAtlas = null;
         let volumeLevel = 0.7;
         let sessionVolume = null;
         let history = [];
@@ -7146,7 +11604,9 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                         }} else {{
                             const videoPlayer = document.getElementById('videoPlayer');
                             if (videoPlayer) {{
-                                videoPlayer.currentTime = resume.position;
+                                // Quelle neu setzen: transcodierte Streams starten serverseitig ab Position
+                                setVideoSource(videoPlayer, filepath, encodeURIComponent(filepath), resume.position)
+                                    .then(() => videoPlayer.play().catch(() => {{}}));
                             }}
                         }}
                     }}
@@ -8017,11 +12477,80 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
         // Nach 3 Sekunden debug ausführen (nur für Test)
         setTimeout(debugPluginStatus, 3000);
         
+        // Zeitleisten-Vorschau (Trickplay): ein Sprite-Sheet + WebVTT pro Video
+        let trickplayCues = [];
+        let trickplayTimer = null;
+        let currentHls = null;
+        let videoSourceToken = 0;
+        let videoStreamOffset = 0;     // Startpunkt eines Live-Streams (/media?start=)
+        let videoStreamDuration = 0;   // Dauer der Quelle (Live-Stream kennt sie nicht)
+        
+        function loadTrickplay(safePath, attempt = 0) {{
+            clearTimeout(trickplayTimer);
+            if (attempt === 0) trickplayCues = [];
+            fetch(`/trickplay.vtt?filepath=${{safePath}}`).then(response => {{
+                // 202: wird im Hintergrund erzeugt - später erneut fragen
+                if (response.status === 202 && attempt < 20) {{
+                    trickplayTimer = setTimeout(() => loadTrickplay(safePath, attempt + 1), 15000);
+                    return '';
+                }}
+                return response.ok ? response.text() : '';
+            }}).then(text => {{
+                if (text) trickplayCues = parseTrickplayVtt(text);
+            }}).catch(() => {{}});
+        }}
+        
+        function parseTrickplayVtt(text) {{
+            const cues = [];
+            const lines = text.split('\\n');
+            const toSeconds = (h, m, s) => Number(h) * 3600 + Number(m) * 60 + parseFloat(s);
+            for (let i = 0; i < lines.length - 1; i++) {{
+                const match = lines[i].match(/^(\d+):(\d+):([\d.]+) --> (\d+):(\d+):([\d.]+)/);
+                if (!match || lines[i + 1].indexOf('#xywh=') < 0) continue;
+                const [url, xywh] = lines[i + 1].split('#xywh=');
+                const [x, y, w, h] = xywh.split(',').map(Number);
+                cues.push({{start: toSeconds(match[1], match[2], match[3]),
+                            end: toSeconds(match[4], match[5], match[6]), url, x, y, w, h}});
+            }}
+            return cues;
+        }}
+        
+        function showTrickplayPreview(event) {{
+            const preview = document.getElementById('trickplayPreview');
+            const rect = this.getBoundingClientRect();
+            // Nur über der Steuerleiste am unteren Rand des Videos
+            if (!trickplayCues.length || event.clientY < rect.bottom - 50) {{
+                preview.style.display = 'none';
+                return;
+            }}
+            const ratio = Math.min(1, Math.max(0, (event.clientX - rect.left) / rect.width));
+            const time = ratio * trickplayCues[trickplayCues.length - 1].end;
+            const cue = trickplayCues.find(c => time >= c.start && time < c.end) || trickplayCues[trickplayCues.length - 1];
+            preview.style.backgroundImage = `url("${{cue.url}}")`;
+            preview.style.backgroundPosition = `-${{cue.x}}px -${{cue.y}}px`;
+            preview.style.width = `${{cue.w}}px`;
+            preview.style.height = `${{cue.h}}px`;
+            preview.style.left = `${{Math.min(rect.width - cue.w, Math.max(0, event.clientX - rect.left - cue.w / 2))}}px`;
+            preview.style.top = `${{rect.height - 60 - cue.h}}px`;
+            preview.style.display = 'block';
+        }}
+        
+        function hideTrickplayPreview() {{
+            document.getElementById('trickplayPreview').style.display = 'none';
+        }}
+        
         function playVideo(filepath, title) {{
             const videoPlayer = document.getElementById('videoPlayer');
             const videoOverlay = document.getElementById('videoOverlay');
             const safePath = encodeURIComponent(filepath);
             
+            if (!videoPlayer.trickplayBound) {{
+                videoPlayer.addEventListener('mousemove', showTrickplayPreview);
+                videoPlayer.addEventListener('mouseleave', hideTrickplayPreview);
+                videoPlayer.trickplayBound = true;
+            }}
+            loadTrickplay(safePath);
+            
             videoPlayer.pause();
             videoPlayer.removeAttribute('src');
             
@@ -8036,7 +12565,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             videoPlayer.onloadedmetadata = function() {{
                 this.volume = actualVolume;
                 
-                const duration = parseFloat(this.duration);
+                const duration = getVideoClock(this).duration;
                 if (currentMediaInfo && !isNaN(duration) && duration > 0) {{
                     console.log(`🎬 Video geladen: ${{title}}, Dauer: ${{duration.toFixed(2)}}s`);
                     addToHistory(currentMediaInfo.filepath, currentMediaInfo.filename,
@@ -8045,8 +12574,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             }};
             
             videoPlayer.onended = function() {{
-                const duration = parseFloat(this.duration);
-                const position = parseFloat(this.currentTime);
+                const {{ position, duration }} = getVideoClock(this);
                 
                 if (currentMediaInfo && !isNaN(duration) && !isNaN(position) && duration > 0) {{
                     console.log(`✅ Video beendet: ${{currentMediaInfo.filename}}`);
@@ -8078,15 +12606,13 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             document.getElementById('videoInfo').innerHTML = infoHTML;
             document.getElementById('videoTitle').textContent = title;
             
-            videoPlayer.innerHTML = `
-                <source src="/media?filepath=${{safePath}}" type="video/mp4">
-            `;
             videoOverlay.style.display = 'flex';
             
-            videoPlayer.load();
-            videoPlayer.play().catch(e => {{
-                console.error('Video-Abspielfehler:', e);
-                alert('Fehler beim Laden des Videos.');
+            setVideoSource(videoPlayer, filepath, safePath).then(() => {{
+                videoPlayer.play().catch(e => {{
+                    console.error('Video-Abspielfehler:', e);
+                    alert('Fehler beim Laden des Videos.');
+                }});
             }});
         }}
         
@@ -8140,8 +12666,118 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             isPlaying = false;
         }}
         
+        function getVideoClock(videoPlayer) {{
+            // Position/Dauer bezogen auf die Quelldatei (Live-Streams beginnen bei 0)
+            const duration = videoStreamDuration || parseFloat(videoPlayer.duration);
+            return {{ position: parseFloat(videoPlayer.currentTime) + videoStreamOffset, duration }};
+        }}
+        
+        function seekAfterLoad(videoPlayer, position) {{
+            if (!position) return;
+            if (videoPlayer.readyState >= 1) {{
+                videoPlayer.currentTime = position;
+            }} else {{
+                videoPlayer.addEventListener('loadedmetadata', () => {{
+                    videoPlayer.currentTime = position;
+                }}, {{ once: true }});
+            }}
+        }}
+        
+        function setVideoSource(videoPlayer, filepath, safePath, start = 0) {{
+            // Transcodierte Formate über HLS: spulbar, Segmente entstehen auf Abruf
+            if (currentHls) {{
+                currentHls.destroy();
+                currentHls = null;
+            }}
+            const token = ++videoSourceToken;
+            const ext = '.' + filepath.toLowerCase().split('.').pop();
+            const mediaUrl = `/media?filepath=${{safePath}}`;
+            const playlistUrl = `/hls/playlist.m3u8?filepath=${{safePath}}`;
+            videoStreamOffset = 0;
+            videoStreamDuration = 0;
+            const useMedia = () => {{
+                videoPlayer.innerHTML = `
+                    <source src="${{mediaUrl}}" type="video/mp4">
+                `;
+                videoPlayer.load();
+                seekAfterLoad(videoPlayer, start);
+            }};
+            // Live-Stream ab Startpunkt: FFmpeg springt per -ss, der Player zählt ab 0
+            const useLiveMedia = (offset, duration) => {{
+                videoStreamOffset = offset || 0;
+                videoStreamDuration = offset ? duration || 0 : 0;
+                // Bandbreiten-Hinweis für die Wahl des Encoder-Profils (kbit/s)
+                const downlink = navigator.connection && navigator.connection.downlink;
+                let url = offset ? `${{mediaUrl}}&start=${{offset}}` : mediaUrl;
+                if (downlink) url += `&bw=${{Math.round(downlink * 1000)}}`;
+                videoPlayer.innerHTML = `
+                    <source src="${{url}}" type="video/mp4">
+                `;
+                videoPlayer.load();
+            }};
+            
+            if (!{hls_extensions_json}.includes(ext)) {{
+                useMedia();
+                return Promise.resolve();
+            }}
+            // Server entscheidet (z.B. fertig transcodiert → direkt mit Range-Support)
+            return fetch(`/api/playback?filepath=${{safePath}}&start=${{start}}`)
+                .then(response => response.json())
+                .catch(() => ({{ method: 'hls' }}))
+                .then(data => {{
+                    if (token !== videoSourceToken) return;  // Inzwischen anderes Video gewählt
+                    const liveFallback = () => useLiveMedia(data.start !== undefined ? data.start : start, data.duration);
+                    if (data.method === 'live') {{
+                        useLiveMedia(data.start, data.duration);
+                    }} else if (data.method !== 'hls') {{
+                        useMedia();
+                    }} else if (window.Hls && Hls.isSupported()) {{
+                        return startHlsPlayback(videoPlayer, playlistUrl, liveFallback, start);
+                    }} else if (videoPlayer.canPlayType('application/vnd.apple.mpegurl')) {{
+                        videoPlayer.innerHTML = `
+                            <source src="${{playlistUrl}}" type="application/vnd.apple.mpegurl">
+                            <source src="${{mediaUrl}}" type="video/mp4">
+                        `;
+                        videoPlayer.load();
+                        seekAfterLoad(videoPlayer, start);
+                    }} else {{
+                        liveFallback();
+                    }}
+                }});
+        }}
+        
+        function startHlsPlayback(videoPlayer, playlistUrl, useMedia, start = 0) {{
+            videoPlayer.innerHTML = '';
+            const hls = new Hls({{ maxBufferLength: 30, startPosition: start > 0 ? start : -1 }});
+            currentHls = hls;
+            return new Promise(resolve => {{
+                hls.on(Hls.Events.MANIFEST_PARSED, () => resolve());
+                hls.on(Hls.Events.ERROR, (event, data) => {{
+                    if (!data.fatal || currentHls !== hls) return;
+                    console.warn('HLS-Fehler, nutze Live-Stream:', data.details);
+                    hls.destroy();
+                    currentHls = null;
+                    useMedia();
+                    videoPlayer.play().catch(() => {{}});
+                    resolve();
+                }});
+                hls.loadSource(playlistUrl);
+                hls.attachMedia(videoPlayer);
+            }});
+        }}
+        
         function closeVideoPlayer() {{
             const videoPlayer = document.getElementById('videoPlayer');
+            if (currentHls) {{
+                currentHls.destroy();
+                currentHls = null;
+            }}
+            videoSourceToken++;
+            videoStreamOffset = 0;
+            videoStreamDuration = 0;
+            clearTimeout(trickplayTimer);
+            trickplayCues = [];
+            hideTrickplayPreview();
             videoPlayer.pause();
             videoPlayer.src = '';
             videoPlayer.onended = null;
@@ -8199,7 +12835,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                 .then(response => response.json())
                 .then(data => {{
                     if (data.success) {{
-                        showSearchResults(data.media, data.total_count, page, data.total_pages);
+                        showSearchResults(data.media, data.total_count, page, data.total_pages, data.atlas);
                         currentSearchResults = data.media;
                     }} else {{
                         showNoResults();
@@ -8213,7 +12849,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                 }});
         }}
         
-        function showSearchResults(results, totalCount, page, totalPages) {{
+        function showSearchResults(results, totalCount, page, totalPages, atlas) {{
             document.getElementById('homeSection').style.display = 'none';
             document.getElementById('allMediaSection').style.display = 'none';
             document.getElementById('searchResultsSection').style.display = 'block';
@@ -8229,7 +12865,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                 return;
             }}
             
-            row.innerHTML = results.map(m => createMediaCardHTML(m)).join('');
+            renderMediaCards(row, results, atlas);
             currentMediaQueue = getMediaQueueFromCurrentContext();
             
             const paginationHTML = generatePaginationHTML(page, totalPages, 'search');
@@ -8250,7 +12886,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                 .then(response => response.json())
                 .then(data => {{
                     if (data.success) {{
-                        displayFilteredMedia(data.media, data.total_count, page, data.total_pages);
+                        displayFilteredMedia(data.media, data.total_count, page, data.total_pages, data.atlas);
                     }} else {{
                         showNoResults();
                     }}
@@ -8263,7 +12899,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
                 }});
         }}
         
-        function displayFilteredMedia(mediaList, totalCount, page, totalPages) {{
+        function displayFilteredMedia(mediaList, totalCount, page, totalPages, atlas) {{
             const row = document.getElementById('allMediaRow');
             const noRes = document.getElementById('noResults');
             
@@ -8275,7 +12911,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             }} else {{
                 noRes.style.display = 'none';
                 row.style.display = 'grid';
-                row.innerHTML = mediaList.map(m => createMediaCardHTML(m)).join('');
+                renderMediaCards(row, mediaList, atlas);
                 currentMediaQueue = getMediaQueueFromCurrentContext();
                 
                 const paginationHTML = generatePaginationHTML(page, totalPages, 'main');
@@ -8393,6 +13029,34 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             applyFilters();
         }}
         
+        function renderMediaCards(row, mediaList, atlas) {{
+            // Ein Sammelbild für alle gespeicherten Thumbnails der Seite
+            currentAtlas = atlas || null;
+            row.dataset.atlas = atlas ? atlas.url : '';
+            row.innerHTML = mediaList.map(m => createMediaCardHTML(m)).join('');
+            currentAtlas = null;
+            if (!atlas) return;
+            
+            // Atlas nicht (mehr) verfügbar: Einzel-Thumbnails laden
+            const probe = new Image();
+            probe.onerror = () => {{
+                if (row.dataset.atlas !== atlas.url) return;
+                row.dataset.atlas = '';
+                row.innerHTML = mediaList.map(m => createMediaCardHTML(m)).join('');
+            }};
+            probe.src = atlas.url;
+        }}
+        
+        function getAtlasTileHTML(media, filename) {{
+            if (!currentAtlas || !(media.filepath in currentAtlas.tiles)) return '';
+            const index = currentAtlas.tiles[media.filepath];
+            const cols = currentAtlas.columns;
+            const rows = currentAtlas.rows;
+            const x = cols > 1 ? (index % cols) / (cols - 1) * 100 : 0;
+            const y = rows > 1 ? Math.floor(index / cols) / (rows - 1) * 100 : 0;
+            return `<div class="atlas-thumb" role="img" aria-label="${{filename}}" style="background-image:url('${{currentAtlas.url}}');background-size:${{cols * 100}}% ${{rows * 100}}%;background-position:${{x}}% ${{y}}%;"></div>`;
+        }}
+        
         function createMediaCardHTML(media) {{
             const filename = escapeHtml(media.filename || 'Unbekannt');
             const category = escapeHtml(media.normalized_category || media.category || 'Unbekannt');
@@ -8400,7 +13064,10 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             const genre = escapeHtml(media.genre || '');
             const filepath = escapeHtml(media.filepath || '');
             const safePath = encodeURIComponent(filepath);
-            const thumbnailUrl = `/thumbnail?filepath=${{safePath}}`;
+            // Version vom Server (stat-basiert); ohne Version keine Dauer-Caching-URL
+            const thumbnailUrl = `/thumbnail?filepath=${{safePath}}` + (media.thumbnail_version ? `&v=${{encodeURIComponent(media.thumbnail_version)}}` : '');
+            const thumbnailSrcset = {thumbnail_widths_json}.map(w => `${{thumbnailUrl}}&w=${{w}} ${{w}}w`).join(', ');
+            const atlasTile = getAtlasTileHTML(media, filename);
             
             // Resume-Point prüfen
             const hasResume = media.hasResume || false;
@@ -8409,7 +13076,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             return `
                 <div class="media-card" onclick="playMediaFromCard(this)" data-filepath="${{safePath}}" data-filename="${{filename}}" data-category="${{category}}">
                     <div class="media-thumbnail">
-                        <img src="${{thumbnailUrl}}" alt="${{filename}}" style="width:100%;height:100%;object-fit:cover;">
+                        ${{atlasTile || `<img src="${{thumbnailUrl}}&w=320" srcset="${{thumbnailSrcset}}" sizes="{thumbnail_sizes}" alt="${{filename}}" loading="lazy" style="width:100%;height:100%;object-fit:cover;">`}}
                         ${{hasResume ? `<div class="resume-badge" title="Fortsetzen bei ${{resumeTimestamp}}"><i class="fas fa-play-circle"></i></div>` : ''}}
                     </div>
                     <div class="media-info-overlay">
@@ -8570,8 +13237,9 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             let lastSavedTime = 0;
             
             videoPlayer.addEventListener('timeupdate', function() {{
-                const currentTime = Math.floor(this.currentTime);
-                const duration = parseFloat(this.duration);
+                const clock = getVideoClock(this);
+                const currentTime = Math.floor(clock.position);
+                const duration = clock.duration;
                 
                 // Speichere alle 30 Sekunden
                 if (currentMediaInfo && !isNaN(duration) && duration > 0 && 
@@ -8584,8 +13252,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             }});
             
             videoPlayer.addEventListener('pause', function() {{
-                const duration = parseFloat(this.duration);
-                const position = parseFloat(this.currentTime);
+                const {{ position, duration }} = getVideoClock(this);
                 
                 if (currentMediaInfo && !isNaN(duration) && !isNaN(position) && duration > 0 && position > 0) {{
                     console.log(`⏸️ Video pausiert bei: ${{position.toFixed(2)}}s`);
@@ -8595,8 +13262,7 @@ def generate_html_with_subgenres(categories, category_data, genres, years,
             }});
             
             videoPlayer.addEventListener('seeking', function() {{
-                const duration = parseFloat(this.duration);
-                const position = parseFloat(this.currentTime);
+                const {{ position, duration }} = getVideoClock(this);
                 
                 if (currentMediaInfo && !isNaN(duration) && !isNaN(position) && duration > 0 && position > 0) {{
                     console.log(`⏩ Video gesprungen zu: ${{position.toFixed(2)}}s`);
@@ -8660,7 +13326,10 @@ window.applyPluginSettings = function(settings) {{
         total_categories=total_categories,
         total_genres=total_genres,
         initial_filter_state_json=initial_filter_state_json,
-        cache_version=get_cache_version()
+        cache_version=get_cache_version(),
+        thumbnail_widths_json=json.dumps(list(THUMBNAIL_WIDTHS)),
+        thumbnail_sizes=THUMBNAIL_SIZES,
+        hls_extensions_json=json.dumps(list(HLS_EXTENSIONS))
     )
 
 def generate_web_interface():
@@ -8698,10 +13367,11 @@ def generate_web_interface():
     print(f"   Reichere {len(all_media_raw)} Medien für Startseite an...")
 
     # Medien anreichern
+    hierarchies = load_cached_hierarchies([media.get('filepath', '') for media in all_media_raw])
     all_media = []
     for media in all_media_raw:
         try:
-            enriched = enrich_media_data(media, use_cache=True)
+            enriched = enrich_media_data(media, use_cache=True, hierarchies=hierarchies)
             
             # Resume-Point prüfen
             resume_point = get_resume_point(media.get('filepath', ''))
@@ -8817,7 +13487,7 @@ def generate_web_interface():
         latest_media = []
         for row in cursor_main.fetchall():
             try:
-                enriched = enrich_media_data(dict(row), use_cache=True)
+                enriched = enrich_media_data(dict(row), use_cache=True, hierarchies=hierarchies)
                 latest_media.append(enriched)
             except Exception as e:
                 print(f"⚠️ Fehler beim Anreichern (latest): {e}")
@@ -8828,7 +13498,7 @@ def generate_web_interface():
         featured_media = []
         for row in cursor_main.fetchall():
             try:
-                enriched = enrich_media_data(dict(row), use_cache=True)
+                enriched = enrich_media_data(dict(row), use_cache=True, hierarchies=hierarchies)
                 featured_media.append(enriched)
             except Exception as e:
                 print(f"⚠️ Fehler beim Anreichern (featured): {e}")
@@ -8895,6 +13565,7 @@ def ensure_hierarchy_cache():
 
     # Neue DB initialisieren
     init_hierarchy_database()
+    clear_directory_parse_cache()
     time.sleep(0.5)
 
     # Hauptdatenbank öffnen
@@ -8921,6 +13592,8 @@ def ensure_hierarchy_cache():
         return False
 
     print(f"📊 Verarbeite {total_count} Medien MIT KATEGORIE-KORREKTUR...")
+    existence_check = get_existence_check_mode()
+    store_json = get_setting('store_hierarchy_json', False)
     processed = 0
     errors = 0
 
@@ -8939,7 +13612,8 @@ def ensure_hierarchy_cache():
             for media in batch:
                 try:
                     filepath = media.get('filepath', '')
-                    if not filepath or not os.path.exists(filepath):
+                    if not filepath or (existence_check == 'sequential'
+                                        and not os.path.exists(filepath)):
                         errors += 1
                         continue
 
@@ -8952,27 +13626,11 @@ def ensure_hierarchy_cache():
                     hierarchy = parse_filepath_hierarchy_multipass(filepath, corrected_category)
 
                     # In Cache schreiben
-                    cursor_hierarchy.execute('''
-                    INSERT OR REPLACE INTO hierarchy_cache
-                    (filepath, normalized_category, hierarchy_json, genre, subgenre,
-                     franchise, sub_franchise, series, season, season_number,
-                     episode_number, artist, album)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        filepath,
-                        corrected_category,
-                        json.dumps(hierarchy, ensure_ascii=False),
-                        hierarchy.get('genre'),
-                        hierarchy.get('subgenre'),
-                        hierarchy.get('franchise'),
-                        hierarchy.get('sub_franchise'),
-                        hierarchy.get('series'),
-                        hierarchy.get('season'),
-                        hierarchy.get('season_number'),
-                        hierarchy.get('episode_number'),
-                        hierarchy.get('artist'),
-                        hierarchy.get('album')
-                    ))
+                    cursor_hierarchy.execute(
+                        HIERARCHY_CACHE_INSERT_SQL,
+                        hierarchy_cache_values(filepath, corrected_category, hierarchy,
+                                               store_json=store_json)
+                    )
                 except Exception as e:
                     errors += 1
                     print(f"⚠️ Fehler bei Medium {media.get('filename', 'Unbekannt')}: {e}")
@@ -8994,10 +13652,14 @@ def ensure_hierarchy_cache():
         update_category_stats()
     except Exception as e:
         print(f"⚠️ Fehler beim Aktualisieren der Statistiken: {e}")
+    
+    if existence_check == 'parallel':
+        start_existence_check()
 
     print(f"\n✅ Hierarchie-Cache erfolgreich initialisiert")
     print(f"   📈 Verarbeitet: {processed} Medien")
     print(f"   ⚠️ Fehler: {errors}")
+    print_category_cache_stats()
     return True
 
 def migrate_history_durations():
@@ -9084,13 +13746,28 @@ class MediaHTTPRequestHandler(ExtendedMediaHTTPRequestHandler):
         filepath = urllib.parse.unquote(filepath)
         filepath = html.unescape(filepath)
 
+        # Variante aus ?w= und Accept-Header
+        width = snap_thumbnail_width(query_params.get('w', [None])[0])
+        fmt = negotiate_thumbnail_format(self.headers.get('Accept'))
+        variant = get_thumbnail_variant_name(width, fmt)
+        url_version = query_params.get('v', [None])[0]
+        
+        # Kürzlich geprüft und im RAM: ohne Pfad-, stat- und DB-Prüfung ausliefern
+        cached = thumbnail_memory_get_validated(filepath, variant, url_version)
+        if cached:
+            data, version = cached
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
+            return
+        
         # Sicherheitsprüfung
         real_path = os.path.realpath(filepath)
         if not os.path.isfile(real_path):
             self.send_error(403, "Ungültiger Pfad")
             return
+        version = get_file_thumbnail_version(real_path)
 
-        # In Datenbank prüfen
+        # In Datenbank prüfen (Katalogversion vorher lesen: gilt für das Prüfergebnis)
+        catalog_version = get_catalog_source_version()
         try:
             conn = sqlite3.connect(DB_PATH)
             cursor = conn.cursor()
@@ -9107,30 +13784,23 @@ class MediaHTTPRequestHandler(ExtendedMediaHTTPRequestHandler):
                 return
         except Exception as e:
             print(f"⚠️ Datenbankfehler: {e}")
+            catalog_version = None   # Nicht geprüft: nicht als Prüfergebnis merken
 
+        # Geprüft und im RAM (gleiche Dateiversion): ohne Neuberechnung ausliefern
+        data = thumbnail_memory_get(filepath, variant, version, checked=catalog_version)
+        if data:
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
+            return
+        
         # Thumbnail generieren oder holen
-        thumb_path = generate_or_get_thumbnail(filepath)
+        data = get_thumbnail_variant(filepath, width, fmt, version=version)
 
-        if thumb_path and os.path.exists(thumb_path):
-            # WICHTIG: Bessere Cache-Header für Thumbnails
-            try:
-                with open(thumb_path, 'rb') as f:
-                    data = f.read()
-                    self.send_response(200)
-                    self.send_header('Content-Type', 'image/jpeg')
-                    self.send_header('Content-Length', str(len(data)))
-                    self.send_header('Cache-Control', 'public, max-age=31536000')  # 1 Jahr
-                    self.send_header('Expires', 'Fri, 01 Jan 2026 00:00:00 GMT')
-                    self.end_headers()
-                    self.wfile.write(data)
-                    print(f"✅ Thumbnail gesendet: {os.path.basename(filepath)}")
-            except (ConnectionAbortedError, BrokenPipeError, ConnectionResetError, OSError):
-                # Client-Abbruch ignorieren
-                print(f"ℹ️ Client-Abbruch bei Thumbnail: {os.path.basename(filepath)}")
-            except Exception as e:
-                print(f"⚠️ Thumbnail-Sendefehler: {e}")
+        if data:
+            thumbnail_memory_put(filepath, data, variant, version, checked=catalog_version)
+            self.send_thumbnail_data(data, versioned=bool(url_version) and url_version == version)
         else:
-            self.serve_color_thumbnail(filepath)
+            # Noch in Arbeit: Platzhalter nicht cachen, damit der Browser erneut fragt
+            self.serve_color_thumbnail(filepath, cacheable=not is_thumbnail_pending(filepath))
 
     def handle_one_request(self):
         """Überschreibe handle_one_request um Socket-Fehler abzufangen."""
@@ -9199,6 +13869,7 @@ def start_http_server():
         print("   ℹ️ Hierarchie-DB nicht gefunden, baue neu auf...")
         rebuild_hierarchy_cache()
     else:
+        init_hierarchy_database()  # Ergänzt neue Tabellen (z.B. missing_files)
         print("   ✅ Hierarchie-DB: OK")
     
     # 3. HTML generieren - SO WIE ES IN IHRER DATEI BEREITS FUNKTIONIERT
@@ -9342,6 +14013,7 @@ def start_http_server():
     # 6. Server starten
     try:
         server = RobustHTTPServer((host, SERVER_PORT), ExtendedMediaHTTPRequestHandler)
+        start_thumbnail_pregeneration()
         
         # Browser öffnen (nur bei localhost)
         if host == 'localhost':
@@ -9442,13 +14114,19 @@ def main():
     except Exception as e:
         print(f"   ⚠️ Process-Cleanup nicht verfügbar: {e}")
     
+    # Encoder-Geschwindigkeit einmalig messen (Grundlage der Encoder-Profile)
+    start_encoder_benchmark()
+    start_missing_files_recheck()
+    cleanup_transcode_cache()
+    
     # Thumbnail-Status
-    print("\n📊 Thumbnail-Verzeichnis Status:")
-    if os.path.exists(THUMBNAIL_DIR):
-        thumb_count = len([f for f in os.listdir(THUMBNAIL_DIR) if f.endswith('.jpg')])
-        print(f"   {thumb_count} Thumbnails vorhanden")
-    else:
-        print("   Verzeichnis existiert noch nicht")
+    print("\n📊 Thumbnail-Speicher Status:")
+    try:
+        thumb_stats = get_thumbnail_store_stats()
+        print(f"   {thumb_stats['count']} Thumbnails vorhanden "
+              f"({thumb_stats['bytes'] / 1024 / 1024:.1f} / {thumb_stats['budget'] / 1024 / 1024:.0f} MB)")
+    except Exception as e:
+        print(f"   ⚠️ Thumbnail-Speicher nicht verfügbar: {e}")
     
     # Settings laden
     print("\n⚙️ Aktuelle Einstellungen:")
@@ -9561,8 +14239,12 @@ def main():
         print("✅ Server sauber beendet.")
         print("=" * 70)
 
-class RobustHTTPServer(HTTPServer):
-    """HTTP-Server mit verbessertem Error-Handling."""
+class RobustHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP-Server mit verbessertem Error-Handling.
+    Ein Thread pro Request: Thumbnail-Anfragen warten parallel auf den Worker-Pool.
+    """
+    daemon_threads = True
     
     def handle_error(self, request, client_address):
         """Überschreibe Error-Handling um Socket-Fehler zu ignorieren."""